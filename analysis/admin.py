@@ -1,3 +1,29 @@
 from django.contrib import admin
 
-# Register your models here.
+from .analysis_store import delete_analyses
+from .models import Analysis, LLMResponse, ReportJob
+
+
+@admin.register(LLMResponse)
+class LLMResponseAdmin(admin.ModelAdmin):
+    list_display = ('model', 'max_tokens', 'temperature', 'hits', 'created_at', 'last_used_at')
+    search_fields = ('prompt',)
+
+
+@admin.register(Analysis)
+class AnalysisAdmin(admin.ModelAdmin):
+    list_display = ('id', 'rows', 'market_returns', 'risk_free_rate', 'created_at', 'last_used_at')
+    readonly_fields = [field.name for field in Analysis._meta.fields]
+
+    # Deleting a row must also drop its series files
+    def delete_model(self, request, obj):
+        delete_analyses([obj.pk])
+
+    def delete_queryset(self, request, queryset):
+        delete_analyses(queryset.values_list('pk', flat=True))
+
+
+@admin.register(ReportJob)
+class ReportJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'status', 'attempts', 'created_at', 'finished_at')
+    list_filter = ('kind', 'status')
@@ -0,0 +1,175 @@
+import math
+import os
+import shutil
+import tempfile
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Analysis
+
+# Datetime axis of an analysis directory; every series file has one value per entry
+DATETIME_FILE = 'datetime.npy'
+
+# Optional dashboard tables a record may carry, kept in Analysis.tables
+TABLE_KEYS = ('instrument_count', 'instruments', 'trade_stats', 'portfolio')
+
+# JSON has no NaN/infinity and SQLite's JSON_VALID check rejects them, so they
+# are stored as these strings and turned back into floats on load
+_NON_FINITE = {'nan': math.nan, 'inf': math.inf, '-inf': -math.inf}
+
+
+def store_dir() -> Path:
+    return Path(getattr(settings, 'ANALYSIS_STORE_DIR', Path(settings.BASE_DIR) / 'analysis_store'))
+
+
+def _encode(value):
+    if isinstance(value, dict):
+        return {key: _encode(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_encode(item) for item in value]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return repr(value)
+    return value
+
+
+def _decode(value):
+    if isinstance(value, dict):
+        return {key: _decode(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_decode(item) for item in value]
+    if isinstance(value, str) and value in _NON_FINITE:
+        return _NON_FINITE[value]
+    return value
+
+
+class SeriesColumns(Mapping):
+    """
+    Metric series of a stored analysis by name
+
+    Each series is memory-mapped from its .npy file the first time it is
+    looked up, so a view only reads the columns it touches.
+    """
+
+    def __init__(self, directory: Path, names: Iterable[str]):
+        self._directory = directory
+        self._names = list(names)
+        self._loaded = {}
+
+    def __getitem__(self, name):
+        if name not in self._names:
+            raise KeyError(name)
+        if name not in self._loaded:
+            self._loaded[name] = np.load(self._directory / f'{name}.npy', mmap_mode='r')
+        return self._loaded[name]
+
+    def __iter__(self):
+        return iter(self._names)
+
+    def __len__(self):
+        return len(self._names)
+
+
+def save_analysis(analysis_id: str, record: Dict, market_returns: float, risk_free_rate: float):
+    """
+    Persist an analysis record (see dashboard.build_analysis) under its id
+
+    The series are written to a staging directory that is renamed into place,
+    then the row is saved, so a row always has its complete set of files.
+    """
+    root = store_dir()
+    root.mkdir(parents=True, exist_ok=True)
+    directory = root / analysis_id
+    staging = Path(tempfile.mkdtemp(prefix=f'.{analysis_id}-', dir=root))
+    try:
+        np.save(staging / DATETIME_FILE, record['datetime'])
+        for name, values in record['series'].items():
+            np.save(staging / f'{name}.npy', np.ascontiguousarray(values))
+        try:
+            os.rename(staging, directory)
+        except OSError:
+            # Stored by a concurrent request; ids are content addresses, so it holds the same data
+            shutil.rmtree(staging)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    Analysis.objects.update_or_create(pk=analysis_id, defaults={
+        'date_format': record['date_format'],
+        'market_returns': market_returns,
+        'risk_free_rate': risk_free_rate,
+        'rows': len(record['datetime']),
+        'series': list(record['series']),
+        'summary': _encode(record['summary']),
+        'last_value': _encode(record['last_value']),
+        'tables': _encode({key: record[key] for key in TABLE_KEYS if key in record}),
+        'last_row': record['last_row'],
+        'last_used_at': timezone.now(),
+    })
+    evict()
+
+
+def load_analysis(analysis_id: str, touch: bool = True) -> Optional[Dict]:
+    """
+    Stored analysis record by id, or None
+
+    Scalars come from the Analysis row; 'datetime' and the 'series' values are
+    read-only memory maps. ``touch`` marks the analysis as recently used.
+    """
+    entry = Analysis.objects.filter(pk=analysis_id).first()
+    if entry is None:
+        return None
+    directory = store_dir() / entry.pk
+    if not directory.is_dir():
+        entry.delete()
+        return None
+    if touch:
+        Analysis.objects.filter(pk=entry.pk).update(last_used_at=timezone.now())
+
+    record = {
+        'date_format': entry.date_format,
+        'datetime': np.load(directory / DATETIME_FILE, mmap_mode='r'),
+        'series': SeriesColumns(directory, entry.series),
+        'summary': _decode(entry.summary),
+        'last_value': _decode(entry.last_value),
+        'last_row': entry.last_row,
+    }
+    record.update(_decode(entry.tables))
+    return record
+
+
+def analysis_exists(analysis_id: str) -> bool:
+    """Whether an analysis is stored, without loading it or marking it used"""
+    return Analysis.objects.filter(pk=analysis_id).exists() and (store_dir() / analysis_id).is_dir()
+
+
+def delete_analyses(analysis_ids: Iterable[str]) -> int:
+    """Drop analyses and their series files; returns the number of rows deleted"""
+    analysis_ids = list(analysis_ids)
+    deleted = Analysis.objects.filter(pk__in=analysis_ids).delete()[0]
+    root = store_dir()
+    for analysis_id in analysis_ids:
+        shutil.rmtree(root / analysis_id, ignore_errors=True)
+    return deleted
+
+
+def evict(max_entries: int = None) -> int:
+    """
+    Drop the least recently used analyses over the size bound
+
+    Returns:
+        Number of analyses deleted
+    """
+    if max_entries is None:
+        max_entries = getattr(settings, 'ANALYSIS_STORE_MAX_ENTRIES', 1000)
+    excess = Analysis.objects.count() - max_entries
+    if excess <= 0:
+        return 0
+    victims = Analysis.objects.order_by('last_used_at').values_list('pk', flat=True)[:excess]
+    return delete_analyses(list(victims))
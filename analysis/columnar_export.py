@@ -0,0 +1,80 @@
+import io
+import json
+from typing import Dict, Iterable, Iterator
+
+import numpy as np
+from django.conf import settings
+
+from .dashboard import CONTEXT_SERIES, json_safe
+
+# Record series key -> exported column name, as calculation() names the columns
+EXPORT_COLUMNS = {**CONTEXT_SERIES, 'excess_returns': 'excess_returns'}
+
+
+def analysis_table(record: Dict, columns: Iterable[str] = None):
+    """
+    pyarrow Table of an analysis record's per-row metric series
+
+    The columns wrap the record's NumPy arrays (memory maps for a stored
+    analysis) without copying them. The summary scalars and the date format
+    go into the schema metadata.
+
+    Args:
+        columns: Exported column names to include, default all of them
+
+    Raises:
+        KeyError for an unknown column name
+    """
+    import pyarrow as pa
+
+    names = {name: key for key, name in EXPORT_COLUMNS.items()}
+    selected = list(EXPORT_COLUMNS.values()) if columns is None else list(columns)
+    for name in selected:
+        if name not in names:
+            raise KeyError(name)
+
+    arrays = [pa.array(np.asarray(record['datetime']))]
+    arrays += [pa.array(np.asarray(record['series'][names[name]])) for name in selected]
+    metadata = {
+        'summary': json.dumps(json_safe(record['summary'])),
+        'date_format': record['date_format'],
+    }
+    return pa.Table.from_arrays(arrays, names=['datetime', *selected], metadata=metadata)
+
+
+def write_parquet(table, sink):
+    """Write a table as compressed Parquet with settings-sized row groups"""
+    import pyarrow.parquet as pq
+    pq.write_table(
+        table, sink,
+        compression=getattr(settings, 'EXPORT_PARQUET_COMPRESSION', 'zstd'),
+        row_group_size=getattr(settings, 'EXPORT_PARQUET_ROW_GROUP_ROWS', 1 << 20),
+    )
+
+
+def arrow_stream(table, batch_rows: int = None) -> Iterator[bytes]:
+    """
+    Arrow IPC stream of a table, yielded message by message
+
+    The schema comes first, then one record batch per ``batch_rows`` rows
+    (default settings.EXPORT_ARROW_BATCH_ROWS); batches are zero-copy slices
+    of the table, so a response can start sending before the last is encoded.
+    """
+    import pyarrow as pa
+
+    if batch_rows is None:
+        batch_rows = getattr(settings, 'EXPORT_ARROW_BATCH_ROWS', 1 << 16)
+    buffer = io.BytesIO()
+
+    def drain():
+        chunk = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return chunk
+
+    with pa.ipc.new_stream(buffer, table.schema) as writer:
+        yield drain()
+        for batch in table.to_batches(max_chunksize=batch_rows):
+            writer.write_batch(batch)
+            yield drain()
+    yield drain()
@@ -0,0 +1,318 @@
+import math
+import numpy as np
+import pandas as pd
+from functools import lru_cache
+from typing import Dict, Optional
+
+from django.conf import settings
+
+from sample_data_generator import build_sample_data
+
+from .downsample import DEFAULT_CHART_DOWNSAMPLING, chart_indices, downsample_indices
+from .final_analysis import compact_metrics, price_returns
+from .grouped_analysis import grouped_metrics
+from .result_cache import get_analysis
+from .round_trips import match_round_trips, round_trip_stats
+
+# Context key -> compact_metrics series name for the per-row chart lists
+CONTEXT_SERIES = {
+    'max_drawdown': 'max_drawdown',
+    'win_loss': 'win_loss_ratio',
+    'sortino_ratio': 'sortino_ratio',
+    'sharpe_ratio': 'sharpe_ratio',
+    'cumulative_returns': 'cumulative_returns',
+}
+
+# Scalars the dashboard repeats once per row
+CONSTANT_SERIES = ('standard_deviation', 'information_ratio', 'calmar_ratio')
+
+# Rows of the per-instrument table shown on the dashboard
+MAX_DASHBOARD_INSTRUMENTS = 50
+
+# Analysis id of the built-in demo blotter; uploads use their sha256 content address
+DEMO_ANALYSIS_ID = 'demo'
+
+
+class AnalysisNotFound(Exception):
+    """A request named an analysis id that is unknown or has been evicted"""
+
+
+def build_analysis(df: pd.DataFrame, date_format: str, market_returns: float = 0.05,
+                   risk_free_rate: float = 0.0) -> Dict:
+    """
+    Full-resolution analysis record of a parsed blotter
+
+    Returns:
+        Dict with
+            'datetime': datetime64 of the rows calculation() + dropna() kept
+            'series': per-row metric arrays for those rows, by context key
+                      (plus 'excess_returns')
+            'summary': compact_metrics scalars
+            'last_value', 'instrument_count', 'instruments', 'trade_stats':
+                      the dashboard tables
+            'portfolio': compact_metrics summary of the per-symbol returns,
+                      for blotters with a 'stock' column; the other metrics
+                      treat the price column as one series
+            'date_format', 'last_row': label format and the row the AI commentary is about
+
+    Raises:
+        ValueError when no row has every metric defined, as with fewer than
+        three priced rows
+    """
+    returns = price_returns(df['price'])
+    series, summary = compact_metrics(returns, market_returns, risk_free_rate)
+
+    # Same rows calculation() + dropna() kept: complete input rows with defined metrics
+    valid = df.notna().all(axis=1).to_numpy() & ~np.isnan(returns)
+    for values in series.values():
+        valid &= ~np.isnan(values)
+    if any(np.isnan(summary[name]) for name in CONSTANT_SERIES):
+        valid[:] = False
+    if not valid.any():
+        raise ValueError("need at least 3 priced rows")
+    last = np.flatnonzero(valid)[-1]
+
+    last_return = returns[last]
+    cumulative = series['cumulative_returns']
+    last_metrics = {
+        'returns': last_return,
+        'cumulative_returns': cumulative[last],
+        'daily_drawdown': cumulative[last] / np.nanmax(cumulative[:last + 1]) - 1,
+        'max_drawdown': series['max_drawdown'][last],
+        'gain': max(last_return, 0.0),
+        'loss': max(-last_return, 0.0),
+        'win_loss_ratio': series['win_loss_ratio'][last],
+        'sharpe_ratio': series['sharpe_ratio'][last],
+        'downside_returns': min(last_return, 0.0),
+        'sortino_ratio': series['sortino_ratio'][last],
+        'standard_deviation': summary['standard_deviation'],
+        'excess_returns': last_return - market_returns,
+        'information_ratio': summary['information_ratio'],
+        'calmar_ratio': summary['calmar_ratio'],
+    }
+    last_row = df.iloc[last].to_dict()
+    last_value = {key: value for key, value in last_row.items() if key != 'datetime' and type(value) != str}
+    last_value.update(last_metrics)
+    last_value = {key: round(value, 2) for key, value in last_value.items()}
+
+    record = {
+        'date_format': date_format,
+        'datetime': df['datetime'].to_numpy(dtype='datetime64[ns]')[valid],
+        'series': {key: series[name][valid] for key, name in CONTEXT_SERIES.items()},
+        'summary': summary,
+        'last_value': last_value,
+        'last_row': df.tail(1).to_string(index=False),
+    }
+    record['series']['excess_returns'] = returns[valid] - market_returns
+
+    if 'stock' in df:
+        grouped = grouped_metrics(df, market_returns, risk_free_rate, include_rows=False)
+        instruments = grouped['instruments']
+        record['portfolio'] = grouped['portfolio']
+        record['instrument_count'] = len(instruments)
+        top = instruments.sort_values('trades', ascending=False).head(MAX_DASHBOARD_INSTRUMENTS)
+        record['instruments'] = top.reset_index().to_dict('records')
+
+    if {'stock', 'ordertype', 'quantity'} <= set(df.columns):
+        record['trade_stats'] = round_trip_stats(match_round_trips(df))
+    return record
+
+
+def _labels(datetimes, date_format):
+    return pd.DatetimeIndex(datetimes).strftime(date_format).tolist()
+
+
+def chart_downsampling() -> Dict:
+    """Chart downsampling config: settings.CHART_DOWNSAMPLING, else the module default"""
+    return getattr(settings, 'CHART_DOWNSAMPLING', DEFAULT_CHART_DOWNSAMPLING)
+
+
+def chart_points() -> Dict:
+    """
+    Point budget of each dashboard chart, for pages that fetch the series
+
+    Series without an entry of their own get the largest budget; None means
+    nothing is configured and the charts are not thinned.
+    """
+    budgets = {key: entry['points'] for key, entry in chart_downsampling().items()}
+    widest = max(budgets.values(), default=None)
+    return {key: budgets.get(key, widest) for key in (*CONTEXT_SERIES, *CONSTANT_SERIES)}
+
+
+def dashboard_context(record: Dict, include_series: bool = True) -> Dict:
+    """
+    Template context of an analysis record
+
+    The per-row chart lists are downsampled; with ``include_series`` False only
+    the tables and each chart's point budget are returned, for pages that fetch
+    the series from the API.
+    """
+    tables = {'last_value': record['last_value']}
+    for key in ('instrument_count', 'instruments', 'trade_stats', 'portfolio'):
+        if key in record:
+            tables[key] = record[key]
+    if not include_series:
+        return dict(tables, chart_points=chart_points())
+
+    # Thin the chart rows server-side; every series keeps the same rows so they
+    # stay aligned with the datetime labels
+    chart_series = {key: record['series'][key] for key in CONTEXT_SERIES}
+    keep = chart_indices(chart_series, chart_downsampling())
+    n_points = len(keep)
+
+    context = {'datetime': _labels(record['datetime'][keep], record['date_format'])}
+    for key, values in chart_series.items():
+        context[key] = values[keep].tolist()
+    summary = record['summary']
+    context['standard_deviation'] = [summary['standard_deviation']] * n_points
+    context['excess_returns'] = record['series']['excess_returns'][keep].tolist()
+    context['information_ratio'] = [summary['information_ratio']] * n_points
+    context['calmar_ratio'] = [summary['calmar_ratio']] * n_points
+    context.update(tables)
+    return context
+
+
+def analysis_context(df, date_format, market_returns=0.05, risk_free_rate=0.0):
+    """Chart lists and last-row summary for a parsed blotter, via the compact metrics engine"""
+    return dashboard_context(build_analysis(df, date_format, market_returns, risk_free_rate))
+
+
+def export_payload(record: Dict, response1=None, response2=None) -> Dict:
+    """
+    The analysis_data dict the PDF/Excel/email reports take, built from a stored record
+
+    Every stored row is exported; only the report charts are thinned, where
+    they are drawn. The PDF report reads its charts, score and commentary
+    from ``charts``, ``score`` and ``ai_analysis``, which share the lists and
+    responses of the other keys.
+    """
+    payload = {'datetime': _labels(record['datetime'], record['date_format'])}
+    for key in CONTEXT_SERIES:
+        payload[key] = record['series'][key].tolist()
+    payload['calmar_ratio'] = [record['summary']['calmar_ratio']] * len(record['datetime'])
+    payload['last_value'] = record['last_value']
+    payload['response1'] = response1
+    payload['response2'] = response2
+    payload['charts'] = {key: payload[key] for key in CONTEXT_SERIES}
+    if response1 is not None:
+        payload['ai_analysis'] = response1
+    if response2 is not None:
+        payload['score'] = response2
+    return payload
+
+
+@lru_cache(maxsize=1)
+def demo_analysis():
+    """
+    The demo blotter's analysis record, built in memory once per process
+
+    The generator is seeded, so every worker computes the same result without
+    writing or reading sample_data.csv. Callers must not mutate what is returned.
+    """
+    return build_analysis(build_sample_data(), '%m-%d ')
+
+
+def load_analysis(analysis_id: str) -> Optional[Dict]:
+    """Analysis record by id (the demo or a stored upload), or None"""
+    if analysis_id == DEMO_ANALYSIS_ID:
+        return demo_analysis()
+    return get_analysis(analysis_id, count=False)
+
+
+def resolve_analysis_data(analysis_data: Dict) -> Dict:
+    """
+    Report input from a request body: either the full analysis_data dict or
+    {'analysis_id', 'response1', 'response2'} naming a stored analysis
+
+    Raises:
+        AnalysisNotFound when the analysis id is unknown or expired
+    """
+    if 'analysis_id' not in analysis_data:
+        return analysis_data
+    record = load_analysis(analysis_data['analysis_id'])
+    if record is None:
+        raise AnalysisNotFound(analysis_data['analysis_id'])
+    return export_payload(record, analysis_data.get('response1'), analysis_data.get('response2'))
+
+
+def json_safe(value):
+    """Plain Python scalars/lists for JSON; NaN and infinities become None"""
+    if isinstance(value, np.ndarray):
+        if value.dtype.kind == 'f' and np.isfinite(value).all():
+            return value.tolist()
+        value = value.tolist()
+    if isinstance(value, dict):
+        return {key: json_safe(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [json_safe(item) for item in value]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+def series_names(record: Dict):
+    return list(record['series']) + list(CONSTANT_SERIES)
+
+
+def series_values(record: Dict, name: str) -> np.ndarray:
+    if name in record['series']:
+        return record['series'][name]
+    if name in CONSTANT_SERIES:
+        return np.full(len(record['datetime']), record['summary'][name])
+    raise KeyError(name)
+
+
+def series_page(record: Dict, name: str, offset: int = 0, limit: int = None,
+                start=None, end=None, points: int = None) -> Dict:
+    """
+    One window of a metric series
+
+    Args:
+        start, end: Optional inclusive datetime bounds, applied first
+        offset, limit: Row window within those bounds
+        points: Optional downsampling of the window, using the chart's configured method
+
+    Raises:
+        KeyError for an unknown series name
+        ValueError for a negative offset or limit, or an unparseable bound
+    """
+    if offset < 0 or (limit is not None and limit < 0):
+        raise ValueError("offset and limit must not be negative")
+    values = series_values(record, name)
+    times = record['datetime']
+
+    # Uploads keep their row order, which need not be chronological, so the
+    # bounds select rows by mask rather than by binary search
+    rows = None
+    if start is not None or end is not None:
+        selected = np.ones(len(times), dtype=bool)
+        if start is not None:
+            selected &= times >= np.datetime64(start, 'ns')
+        if end is not None:
+            selected &= times <= np.datetime64(end, 'ns')
+        rows = np.flatnonzero(selected)
+    total = len(times) if rows is None else len(rows)
+
+    first = min(offset, total)
+    last = total if limit is None else min(total, first + limit)
+    if rows is None:
+        window_times, window_values = times[first:last], values[first:last]
+    else:
+        window_times, window_values = times[rows[first:last]], values[rows[first:last]]
+    if points:
+        config = chart_downsampling().get(name, {})
+        keep = downsample_indices(window_values, points, config.get('method', 'lttb'))
+        window_times, window_values = window_times[keep], window_values[keep]
+
+    next_offset = last if last < total else None
+    return {
+        'name': name,
+        'total': total,
+        'offset': first,
+        'count': last - first,
+        'next_offset': next_offset,
+        'datetime': _labels(window_times, record['date_format']),
+        'values': json_safe(window_values),
+    }
@@ -0,0 +1,119 @@
+import numpy as np
+from typing import Dict
+
+# Context series key -> how its chart is thinned; overridable with settings.CHART_DOWNSAMPLING.
+# min/max keeps every bucket's extremes, so drawdown troughs survive exactly.
+DEFAULT_CHART_DOWNSAMPLING = {
+    'max_drawdown': {'method': 'minmax', 'points': 1000},
+    'win_loss': {'method': 'lttb', 'points': 1000},
+    'sortino_ratio': {'method': 'lttb', 'points': 1000},
+    'sharpe_ratio': {'method': 'lttb', 'points': 1000},
+    'cumulative_returns': {'method': 'lttb', 'points': 1000},
+}
+
+
+def _finite(y):
+    """Copy of y with NaN/inf clamped to the finite range, for scoring only"""
+    finite = np.isfinite(y)
+    if finite.all():
+        return y
+    low, high = (y[finite].min(), y[finite].max()) if finite.any() else (0.0, 0.0)
+    return np.nan_to_num(y, nan=0.0, posinf=high, neginf=low)
+
+
+def lttb(y, threshold: int, x=None) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets selection of ``threshold`` points
+
+    The first and last points are always kept; each interior bucket keeps the
+    point forming the largest triangle with the previously kept point and the
+    average of the next bucket. Bucket bounds and averages are computed for
+    all buckets at once; only the choice within each bucket, which depends on
+    the previous choice, steps through the buckets.
+
+    Returns:
+        Sorted indices into ``y``
+    """
+    y = _finite(np.asarray(y, dtype=np.float64))
+    n = len(y)
+    if threshold >= n or n <= 2:
+        return np.arange(n)
+    if threshold < 3:
+        raise ValueError("LTTB needs a threshold of at least 3 points")
+    x = np.arange(n, dtype=np.float64) if x is None else np.asarray(x, dtype=np.float64)
+
+    # Interior points 1..n-2 split into threshold-2 non-empty buckets
+    edges = 1 + (np.arange(threshold - 1) * (n - 2)) // (threshold - 2)
+    sizes = np.diff(edges)
+    avg_x = np.add.reduceat(x[1:-1], edges[:-1] - 1) / sizes
+    avg_y = np.add.reduceat(y[1:-1], edges[:-1] - 1) / sizes
+    next_x = np.append(avg_x[1:], x[-1])
+    next_y = np.append(avg_y[1:], y[-1])
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for bucket in range(threshold - 2):
+        lo, hi = edges[bucket], edges[bucket + 1]
+        area = np.abs((x[a] - next_x[bucket]) * (y[lo:hi] - y[a])
+                      - (x[a] - x[lo:hi]) * (next_y[bucket] - y[a]))
+        a = lo + int(area.argmax())
+        selected[bucket + 1] = a
+    return selected
+
+
+def minmax(y, threshold: int) -> np.ndarray:
+    """
+    Min/max decimation: the lowest and highest point of each of ``threshold // 2`` buckets
+
+    Fully vectorized over a padded (buckets, bucket size) view; NaN never wins.
+
+    Returns:
+        Sorted unique indices into ``y``, including the first and last point
+    """
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if threshold >= n or n <= 2:
+        return np.arange(n)
+    size = -(-n // max(1, threshold // 2))
+    buckets = -(-n // size)
+
+    padded = np.full(buckets * size, np.nan)
+    padded[:n] = y
+    padded = padded.reshape(buckets, size)
+    missing = np.isnan(padded)
+    offsets = np.arange(buckets) * size
+    lows = np.where(missing, np.inf, padded).argmin(axis=1) + offsets
+    highs = np.where(missing, -np.inf, padded).argmax(axis=1) + offsets
+    return np.unique(np.concatenate(([0, n - 1], lows[lows < n], highs[highs < n])))
+
+
+METHODS = {
+    'lttb': lttb,
+    'minmax': minmax,
+}
+
+
+def downsample_indices(y, threshold: int, method: str = 'lttb') -> np.ndarray:
+    if method not in METHODS:
+        raise ValueError(f"Unsupported downsampling method: {method}")
+    return METHODS[method](y, threshold)
+
+
+def chart_indices(series: Dict[str, np.ndarray], config: Dict = None) -> np.ndarray:
+    """
+    Rows to keep so every configured chart is thinned by its own method
+
+    All charts share the datetime axis, so the result is the union of each
+    series' selection; series without a config entry do not add points.
+
+    Returns:
+        Sorted indices into the (equal-length) series
+    """
+    config = DEFAULT_CHART_DOWNSAMPLING if config is None else config
+    n = len(next(iter(series.values()))) if series else 0
+    picks = [downsample_indices(values, config[key]['points'], config[key].get('method', 'lttb'))
+             for key, values in series.items() if key in config]
+    if not picks:
+        return np.arange(n)
+    return np.unique(np.concatenate(picks))
@@ -1,10 +1,10 @@
-from django.core.mail import EmailMessage, EmailMultiAlternatives
+from django.core.mail import EmailMessage, EmailMultiAlternatives, get_connection
 from django.template.loader import render_to_string
 from django.conf import settings
-import os
 import tempfile
 from typing import Dict, List, Optional
 import logging
+from concurrent.futures import ThreadPoolExecutor
 
 logger = logging.getLogger(__name__)
 
@@ -32,49 +32,7 @@ class EmailReportService:
             bool: True if email sent successfully, False otherwise
         """
         try:
-            # Generate report file
-            if report_type.lower() == 'pdf':
-                from .pdf_generator import create_pdf_report
-                report_path = create_pdf_report(analysis_data)
-                attachment_name = 'portfolio_analysis_report.pdf'
-            elif report_type.lower() == 'excel':
-                from .excel_export import create_excel_report
-                report_path = create_excel_report(analysis_data)
-                attachment_name = 'portfolio_analysis.xlsx'
-            else:
-                raise ValueError(f"Unsupported report type: {report_type}")
-            
-            # Create email subject
-            if not subject:
-                subject = f"Portfolio Analysis Report - {analysis_data.get('response2', 'N/A')} Score"
-            
-            # Create email body
-            html_content = self.create_email_html(analysis_data)
-            text_content = self.create_email_text(analysis_data)
-            
-            # Create email message
-            email = EmailMultiAlternatives(
-                subject=subject,
-                body=text_content,
-                from_email=self.from_email,
-                to=[recipient_email]
-            )
-            
-            # Attach HTML version
-            email.attach_alternative(html_content, "text/html")
-            
-            # Attach report file
-            with open(report_path, 'rb') as f:
-                email.attach(attachment_name, f.read(), 
-                           'application/pdf' if report_type == 'pdf' else 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-            
-            # Send email
-            email.send()
-            
-            # Clean up temporary file
-            if os.path.exists(report_path):
-                os.remove(report_path)
-            
+            self.deliver_report(recipient_email, analysis_data, report_type, subject)
             logger.info(f"Analysis report sent successfully to {recipient_email}")
             return True
             
@@ -82,6 +40,63 @@ class EmailReportService:
             logger.error(f"Failed to send analysis report to {recipient_email}: {str(e)}")
             return False
     
+    def deliver_report(self, 
+                       recipient_email: str, 
+                       analysis_data: Dict, 
+                       report_type: str = 'pdf',
+                       subject: str = None):
+        """
+        Send analysis report via email, raising on failure
+        
+        Same as send_analysis_report, for callers that retry (see analysis.jobs)
+        
+        Raises:
+            ValueError for an unsupported report type, or whatever the mail backend raises
+        """
+        prepared = self.prepare_report(analysis_data, report_type, subject)
+        self.build_message(recipient_email, prepared).send()
+    
+    def prepare_report(self, analysis_data: Dict, report_type: str = 'pdf', subject: str = None) -> Dict:
+        """
+        Render the report attachment and the email bodies once, for any number of recipients
+        
+        Returns:
+            Dict with 'subject', 'text', 'html' and 'attachment' (name, bytes, content type)
+        """
+        # Generate report into its own buffer
+        from .reports import REPORT_FORMATS, render_report
+        with render_report(analysis_data, report_type) as report:
+            report_bytes = report.read()
+        content_type, attachment_name = REPORT_FORMATS[report_type.lower()]
+        
+        # Create email subject
+        if not subject:
+            subject = f"Portfolio Analysis Report - {analysis_data.get('response2', 'N/A')} Score"
+        
+        return {
+            'subject': subject,
+            'text': self.create_email_text(analysis_data),
+            'html': self.create_email_html(analysis_data),
+            'attachment': (attachment_name, report_bytes, content_type),
+        }
+    
+    def build_message(self, recipient_email: str, prepared: Dict, connection=None) -> EmailMultiAlternatives:
+        """One recipient's message over prepared content; every message shares the same strings and bytes"""
+        email = EmailMultiAlternatives(
+            subject=prepared['subject'],
+            body=prepared['text'],
+            from_email=self.from_email,
+            to=[recipient_email],
+            connection=connection
+        )
+        
+        # Attach HTML version
+        email.attach_alternative(prepared['html'], "text/html")
+        
+        # Attach report
+        email.attach(*prepared['attachment'])
+        return email
+    
     def create_email_html(self, analysis_data: Dict) -> str:
         """Create HTML email content"""
         score = analysis_data.get('response2', 'N/A')
@@ -245,6 +260,11 @@ Generated by TradeAnalyzer Pro
         """
         Send reports to multiple recipients
         
+        The report and bodies are rendered once. Recipients are split across
+        settings.EMAIL_BULK_PARALLELISM workers; each sends its share over one
+        SMTP connection, reopened every settings.EMAIL_BULK_BATCH_SIZE messages.
+        An address listed more than once is sent one message.
+        
         Args:
             recipient_emails: List of email addresses
             analysis_data: Analysis data dictionary
@@ -253,18 +273,53 @@ Generated by TradeAnalyzer Pro
         Returns:
             Dict mapping email addresses to success status
         """
-        results = {}
+        results = {email: False for email in recipient_emails}
+        if not results:
+            return results
+        try:
+            prepared = self.prepare_report(analysis_data, report_type)
+        except Exception as e:
+            logger.error(f"Failed to prepare bulk report for {len(results)} recipients: {str(e)}")
+            return results
         
-        for email in recipient_emails:
-            try:
-                success = self.send_analysis_report(email, analysis_data, report_type)
-                results[email] = success
-            except Exception as e:
-                logger.error(f"Failed to send report to {email}: {str(e)}")
-                results[email] = False
+        recipients = list(results)
+        parallelism = max(1, min(getattr(settings, 'EMAIL_BULK_PARALLELISM', 4), len(recipients)))
+        shares = [recipients[worker::parallelism] for worker in range(parallelism)]
+        if parallelism == 1:
+            self._send_share(shares[0], prepared, results)
+        else:
+            with ThreadPoolExecutor(max_workers=parallelism, thread_name_prefix='bulk-email') as pool:
+                list(pool.map(lambda share: self._send_share(share, prepared, results), shares))
         
+        logger.info(f"Bulk report sent to {sum(results.values())} of {len(results)} recipients")
         return results
     
+    def _send_share(self, recipients: List[str], prepared: Dict, results: Dict[str, bool]):
+        """
+        Send to recipients over one SMTP connection per batch, recording each outcome in results
+        
+        Messages go out one send_messages call at a time on the open connection,
+        so a failure is attributed to its own recipient; after one the
+        connection is reopened for the rest of the batch.
+        """
+        batch_size = max(1, getattr(settings, 'EMAIL_BULK_BATCH_SIZE', 100))
+        for start in range(0, len(recipients), batch_size):
+            connection = get_connection()
+            try:
+                connection.open()
+                for email in recipients[start:start + batch_size]:
+                    try:
+                        sent = connection.send_messages([self.build_message(email, prepared, connection)])
+                        results[email] = sent == 1
+                    except Exception as e:
+                        logger.error(f"Failed to send report to {email}: {str(e)}")
+                        connection.close()
+                        connection.open()
+            except Exception as e:
+                logger.error(f"SMTP connection failed for bulk report batch: {str(e)}")
+            finally:
+                connection.close()
+    
     def send_scheduled_report(self, 
                             recipient_email: str, 
                             analysis_data: Dict,
@@ -1,21 +1,52 @@
 import pandas as pd
 import xlsxwriter
-from datetime import datetime
 import os
+from itertools import chain, repeat
 from typing import Dict, List, Any
 
+# Excel's hard limit on rows per worksheet
+EXCEL_MAX_ROWS = 1_048_576
+
+# analysis_data series on the 'Chart Data' sheet, after the Date column
+CHART_DATA_COLUMNS = [
+    ('max_drawdown', 'Max Drawdown'),
+    ('win_loss', 'Win/Loss Ratio'),
+    ('sortino_ratio', 'Sortino Ratio'),
+    ('cumulative_returns', 'Cumulative Returns'),
+    ('sharpe_ratio', 'Sharpe Ratio'),
+    ('calmar_ratio', 'Calmar Ratio'),
+]
+
+# Series drawn as native line charts on the 'Charts' sheet, in order
+NATIVE_CHARTS = ['max_drawdown', 'cumulative_returns', 'sharpe_ratio', 'sortino_ratio', 'calmar_ratio']
+
 class ExcelReportGenerator:
     """Generate comprehensive Excel reports with multiple sheets and formatting"""
     
-    def __init__(self):
+    # Rows per worksheet; the chart data continues on a new sheet beyond this
+    max_rows = EXCEL_MAX_ROWS
+    
+    def __init__(self, constant_memory: bool = True):
+        """
+        Args:
+            constant_memory: Open the workbook in xlsxwriter's constant_memory
+                             mode, which flushes each row to disk once the next
+                             one starts, so memory stays flat however long the
+                             history. Every sheet is written in row order for this.
+        """
         self.workbook = None
         self.worksheet = None
+        self.constant_memory = constant_memory
+        self.chart_data_ranges = []
         
     def create_excel_report(self, analysis_data: Dict, output_path: str = 'portfolio_analysis.xlsx') -> str:
         """Create a comprehensive Excel report with multiple sheets"""
         
-        # Create workbook with xlsxwriter for advanced formatting
-        self.workbook = xlsxwriter.Workbook(output_path)
+        # Create workbook with xlsxwriter for advanced formatting. Ratios are
+        # infinite until their denominator moves (win/loss before the first
+        # losing trade); those cells are written as Excel errors.
+        self.workbook = xlsxwriter.Workbook(output_path, {'constant_memory': self.constant_memory,
+                                                          'nan_inf_to_errors': True})
         
         # Define formats
         self.setup_formats()
@@ -24,6 +55,7 @@ class ExcelReportGenerator:
         self.create_summary_sheet(analysis_data)
         self.create_metrics_sheet(analysis_data)
         self.create_charts_data_sheet(analysis_data)
+        self.create_charts_sheet(analysis_data)
         self.create_detailed_analysis_sheet(analysis_data)
         self.create_recommendations_sheet(analysis_data)
         
@@ -86,8 +118,8 @@ class ExcelReportGenerator:
         worksheet = self.workbook.add_worksheet('Executive Summary')
         
         # Title
+        # No generation date: the report cache serves the same bytes on later days
         worksheet.merge_range('A1:F1', 'Portfolio Analysis Report', self.formats['title'])
-        worksheet.write('A2', f'Generated on: {datetime.now().strftime("%B %d, %Y at %H:%M")}', self.formats['neutral'])
         
         # Performance Score
         worksheet.write('A4', 'Performance Score:', self.formats['metric_label'])
@@ -178,42 +210,72 @@ class ExcelReportGenerator:
         worksheet.set_column('E:E', 20)
     
     def create_charts_data_sheet(self, analysis_data: Dict):
-        """Create sheet with chart data for further analysis"""
-        worksheet = self.workbook.add_worksheet('Chart Data')
-        
-        # Title
-        worksheet.merge_range('A1:H1', 'Time Series Data for Charts', self.formats['title'])
-        
-        # Headers
-        headers = ['Date', 'Max Drawdown', 'Win/Loss Ratio', 'Sortino Ratio', 
-                  'Cumulative Returns', 'Sharpe Ratio', 'Calmar Ratio']
-        
-        for col, header in enumerate(headers):
-            worksheet.write(2, col, header, self.formats['header'])
-        
-        # Data
+        """
+        Create sheet with chart data for further analysis
+
+        One write_row call per row; series shorter than the dates are padded
+        with blanks. Histories longer than a sheet holds continue on
+        'Chart Data 2', 'Chart Data 3', ... with the same headers.
+        """
+        headers = ['Date'] + [header for _, header in CHART_DATA_COLUMNS]
         datetime_list = analysis_data.get('datetime', [])
-        max_drawdown = analysis_data.get('max_drawdown', [])
-        win_loss = analysis_data.get('win_loss', [])
-        sortino_ratio = analysis_data.get('sortino_ratio', [])
-        cumulative_returns = analysis_data.get('cumulative_returns', [])
-        sharpe_ratio = analysis_data.get('sharpe_ratio', [])
-        calmar_ratio = analysis_data.get('calmar_ratio', [])
-        
-        row = 3
-        for i in range(len(datetime_list)):
-            worksheet.write(row, 0, datetime_list[i], self.formats['data_cell'])
-            worksheet.write(row, 1, max_drawdown[i] if i < len(max_drawdown) else '', self.formats['data_cell'])
-            worksheet.write(row, 2, win_loss[i] if i < len(win_loss) else '', self.formats['data_cell'])
-            worksheet.write(row, 3, sortino_ratio[i] if i < len(sortino_ratio) else '', self.formats['data_cell'])
-            worksheet.write(row, 4, cumulative_returns[i] if i < len(cumulative_returns) else '', self.formats['data_cell'])
-            worksheet.write(row, 5, sharpe_ratio[i] if i < len(sharpe_ratio) else '', self.formats['data_cell'])
-            worksheet.write(row, 6, calmar_ratio[i] if i < len(calmar_ratio) else '', self.formats['data_cell'])
-            row += 1
-        
-        # Set column widths
-        for col in range(7):
-            worksheet.set_column(col, col, 15)
+        columns = [chain(analysis_data.get(key, []), repeat('')) for key, _ in CHART_DATA_COLUMNS]
+        rows = zip(datetime_list, *columns)
+        
+        first_row = 3
+        per_sheet = self.max_rows - first_row
+        sheets = max(1, -(-len(datetime_list) // per_sheet))
+        self.chart_data_ranges = []
+        for sheet in range(sheets):
+            sheet_name = 'Chart Data' if sheet == 0 else f'Chart Data {sheet + 1}'
+            worksheet = self.workbook.add_worksheet(sheet_name)
+            
+            # Set column widths
+            worksheet.set_column(0, len(headers) - 1, 15)
+            
+            # Title
+            worksheet.merge_range('A1:H1', 'Time Series Data for Charts', self.formats['title'])
+            
+            # Headers
+            worksheet.write_row(2, 0, headers, self.formats['header'])
+            
+            # Data
+            last_row = first_row + min(per_sheet, len(datetime_list) - sheet * per_sheet) - 1
+            for row in range(first_row, last_row + 1):
+                worksheet.write_row(row, 0, next(rows), self.formats['data_cell'])
+            if last_row >= first_row:
+                self.chart_data_ranges.append((sheet_name, first_row, last_row))
+    
+    def create_charts_sheet(self, analysis_data: Dict):
+        """
+        Create native Excel line charts over the 'Chart Data' cells
+
+        The charts only reference the written ranges, so nothing is rendered
+        here; the spreadsheet client draws them. A history split over several
+        data sheets is charted as one series per sheet.
+        """
+        columns = {key: (col, header) for col, (key, header) in enumerate(CHART_DATA_COLUMNS, start=1)}
+        charts = [key for key in NATIVE_CHARTS if len(analysis_data.get(key, []))]
+        if not self.chart_data_ranges or not charts:
+            return
+        
+        worksheet = self.workbook.add_worksheet('Charts')
+        worksheet.merge_range('A1:L1', 'Performance Charts', self.formats['title'])
+        
+        for index, key in enumerate(charts):
+            col, title = columns[key]
+            chart = self.workbook.add_chart({'type': 'line'})
+            for sheet_name, first_row, last_row in self.chart_data_ranges:
+                chart.add_series({
+                    'name': title,
+                    'categories': [sheet_name, first_row, 0, last_row, 0],
+                    'values': [sheet_name, first_row, col, last_row, col],
+                    'line': {'color': '#667eea', 'width': 1.5},
+                })
+            chart.set_title({'name': title})
+            chart.set_legend({'none': True})
+            chart.set_size({'width': 720, 'height': 300})
+            worksheet.insert_chart(2 + index * 16, 0, chart)
     
     def create_detailed_analysis_sheet(self, analysis_data: Dict):
         """Create detailed analysis sheet"""
@@ -330,7 +392,8 @@ class ExcelReportGenerator:
         return recommendations
 
 # Convenience function
-def create_excel_report(analysis_data: Dict, output_path: str = 'portfolio_analysis.xlsx') -> str:
+def create_excel_report(analysis_data: Dict, output_path: str = 'portfolio_analysis.xlsx',
+                        constant_memory: bool = True) -> str:
     """Create Excel report from analysis data"""
-    generator = ExcelReportGenerator()
+    generator = ExcelReportGenerator(constant_memory)
     return generator.create_excel_report(analysis_data, output_path)
@@ -57,69 +57,195 @@ import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 
+
+# Array kernels. They follow pandas' skipna semantics (NaN in, NaN out at the
+# same position, ignored by the running aggregate) so the DataFrame columns
+# below come out the same as the Series methods they replace.
+
+def _pct_change(price):
+    returns = np.empty_like(price)
+    returns[:1] = np.nan
+    np.divide(price[1:], price[:-1], out=returns[1:])
+    returns[1:] -= 1
+    return returns
+
+def _cumprod_skipna(values):
+    out = np.nancumprod(values)
+    out[np.isnan(values)] = np.nan
+    return out
+
+def _cummax_skipna(values):
+    out = np.fmax.accumulate(values)
+    out[np.isnan(values)] = np.nan
+    return out
+
+def _cummin_skipna(values):
+    out = np.fmin.accumulate(values)
+    out[np.isnan(values)] = np.nan
+    return out
+
+def _ffill(values):
+    idx = np.where(np.isnan(values), 0, np.arange(len(values)))
+    np.maximum.accumulate(idx, out=idx)
+    return values[idx]
+
+def _mean_std(values):
+    valid = values[~np.isnan(values)]
+    mean = valid.mean() if valid.size else np.nan
+    std = valid.std(ddof=1) if valid.size > 1 else np.nan
+    return mean, std
+
+def _drawdowns(cumulative_returns):
+    daily_drawdown = cumulative_returns / _cummax_skipna(cumulative_returns) - 1
+    return daily_drawdown, _cummin_skipna(daily_drawdown)
+
+def _gain_loss(returns):
+    gain = np.where(returns > 0, returns, 0.0)
+    loss = np.where(returns < 0, -returns, 0.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        win_loss_ratio = np.cumsum(gain) / np.abs(np.cumsum(loss))
+    return gain, loss, win_loss_ratio
+
+
+def _risk_metrics(returns, max_drawdown, market_returns, risk_free_rate):
+    n = len(returns)
+    returns_mean, returns_std = _mean_std(returns)
+    downside_returns = np.where(returns < 0, returns, 0.0)
+    _, downside_volatility = _mean_std(downside_returns)
+    excess_returns = returns - market_returns
+    excess_mean, excess_std = _mean_std(excess_returns)
+    worst_drawdown = np.nanmin(max_drawdown) if (~np.isnan(max_drawdown)).any() else np.nan
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return {
+            'sharpe_ratio': (returns - risk_free_rate) / returns_std,
+            'downside_returns': downside_returns,
+            'sortino_ratio': (returns - risk_free_rate) / downside_volatility,
+            'standard_deviation': np.full(n, returns_std),
+            'excess_returns': excess_returns,
+            'information_ratio': np.full(n, excess_mean / excess_std),
+            'calmar_ratio': np.full(n, returns_mean / abs(worst_drawdown)),
+        }
+
+
+def compute_metrics(price, market_returns=0.05, risk_free_rate=0.0):
+    """Every column calculation() adds, computed from the price array with NumPy"""
+    price = np.asarray(price, dtype=np.float64)
+
+    returns = _pct_change(price)
+    cumulative_returns = _ffill(_cumprod_skipna(1 + returns))
+    daily_drawdown, max_drawdown = _drawdowns(cumulative_returns)
+    gain, loss, win_loss_ratio = _gain_loss(returns)
+
+    metrics = {
+        'returns': returns,
+        'cumulative_returns': cumulative_returns,
+        'daily_drawdown': daily_drawdown,
+        'max_drawdown': max_drawdown,
+        'gain': gain,
+        'loss': loss,
+        'win_loss_ratio': win_loss_ratio,
+    }
+    metrics.update(_risk_metrics(returns, max_drawdown, market_returns, risk_free_rate))
+    return metrics
+
+
+# Series the dashboard charts; everything else calculation() produces is
+# either a constant column or only needed for the last-row summary.
+CHART_SERIES = ('cumulative_returns', 'max_drawdown', 'win_loss_ratio', 'sharpe_ratio', 'sortino_ratio')
+
+
+def price_returns(price):
+    """Simple returns of a price array, NaN in the first slot like pct_change()"""
+    return _pct_change(np.asarray(price, dtype=np.float64))
+
+
+def compact_metrics(returns, market_returns=0.05, risk_free_rate=0.0):
+    """
+    Chart series plus a scalar summary from a float64 returns array
+
+    Only CHART_SERIES are materialised. Values calculation() repeats on every
+    row (standard deviation, information and calmar ratios) come back as
+    scalars, and the drawdown passes run once, reusing their buffers.
+
+    Returns:
+        (series, summary) where series maps CHART_SERIES names to arrays
+        aligned with ``returns`` and summary maps metric names to floats
+    """
+    returns = np.ascontiguousarray(returns, dtype=np.float64)
+
+    cumulative_returns = _ffill(_cumprod_skipna(1 + returns))
+    drawdown = cumulative_returns / _cummax_skipna(cumulative_returns) - 1
+    max_drawdown = _cummin_skipna(drawdown)
+    del drawdown
+
+    gain, loss, win_loss_ratio = _gain_loss(returns)
+    del gain, loss
+
+    returns_mean, returns_std = _mean_std(returns)
+    _, downside_volatility = _mean_std(np.where(returns < 0, returns, 0.0))
+    # Excess returns are a constant shift of returns, so they share its spread
+    excess_mean = returns_mean - market_returns
+    worst_drawdown = np.nanmin(max_drawdown) if (~np.isnan(max_drawdown)).any() else np.nan
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sharpe_ratio = (returns - risk_free_rate) / returns_std
+        sortino_ratio = (returns - risk_free_rate) / downside_volatility
+        summary = {
+            'observations': int((~np.isnan(returns)).sum()),
+            'mean_return': float(returns_mean),
+            'standard_deviation': float(returns_std),
+            'downside_volatility': float(downside_volatility),
+            'excess_return': float(excess_mean),
+            'information_ratio': float(excess_mean / returns_std),
+            'calmar_ratio': float(returns_mean / abs(worst_drawdown)),
+            'cumulative_returns': float(cumulative_returns[-1]) if len(returns) else np.nan,
+            'max_drawdown': float(worst_drawdown),
+            'win_loss_ratio': float(win_loss_ratio[-1]) if len(returns) else np.nan,
+        }
+
+    series = {
+        'cumulative_returns': cumulative_returns,
+        'max_drawdown': max_drawdown,
+        'win_loss_ratio': win_loss_ratio,
+        'sharpe_ratio': sharpe_ratio,
+        'sortino_ratio': sortino_ratio,
+    }
+    return series, summary
+
+
 def calculate_cumulative_returns(df):
-    df['returns'] = df['price'].pct_change()
-    df['cumulative_returns'] = (1 + df['returns']).cumprod()
+    df['returns'] = _pct_change(df['price'].to_numpy(dtype=np.float64))
+    df['cumulative_returns'] = _cumprod_skipna(1 + df['returns'].to_numpy())
     return df
 
 def calculate_max_drawdown(df):
-    df['cumulative_returns'] = df['cumulative_returns'].ffill()
-    df['daily_drawdown'] = df['cumulative_returns'] / df['cumulative_returns'].cummax() - 1
-    df['max_drawdown'] = df['daily_drawdown'].cummin()
+    df['cumulative_returns'] = _ffill(df['cumulative_returns'].to_numpy(dtype=np.float64))
+    df['daily_drawdown'], df['max_drawdown'] = _drawdowns(df['cumulative_returns'].to_numpy())
     return df
 
 def calculate_win_loss_ratio(df):
-    df['gain'] = df['returns'].apply(lambda x: x if x > 0 else 0)
-    df['loss'] = df['returns'].apply(lambda x: -x if x < 0 else 0)
-    df['win_loss_ratio'] = df['gain'].cumsum() / abs(df['loss'].cumsum())
+    df['gain'], df['loss'], df['win_loss_ratio'] = _gain_loss(df['returns'].to_numpy(dtype=np.float64))
     return df
 
 
 
 def calculate_additional_metrics(df, market_returns, risk_free_rate=0.0):
-    # Calculate Sharpe Ratio
-    df['sharpe_ratio'] = (df['returns'] - risk_free_rate) / df['returns'].std()
-
-    # Calculate Sortino Ratio
-    df['downside_returns'] = df['returns'].apply(lambda x: x if x < 0 else 0)
-    downside_volatility = df['downside_returns'].std()
-    df['sortino_ratio'] = (df['returns'] - risk_free_rate) / downside_volatility
-
-    # Calculate Standard Deviation
-    df['standard_deviation'] = df['returns'].std()
-
-    # Calculate Information Ratio
-    df['excess_returns'] = df['returns'] - market_returns
-    df['information_ratio'] = df['excess_returns'].mean() / df['excess_returns'].std()
-
-
-
-
-    # Calculate Calmar Ratio
-    df['daily_drawdown'] = df['cumulative_returns'] / df['cumulative_returns'].cummax() - 1
-    df['max_drawdown'] = df['daily_drawdown'].cummin()
-    df['calmar_ratio'] = df['returns'].mean() / abs(df['max_drawdown'].min())
-
+    df['daily_drawdown'], df['max_drawdown'] = _drawdowns(df['cumulative_returns'].to_numpy(dtype=np.float64))
+    metrics = _risk_metrics(df['returns'].to_numpy(dtype=np.float64), df['max_drawdown'].to_numpy(),
+                            market_returns, risk_free_rate)
+    for name, values in metrics.items():
+        df[name] = values
     return df
 
 def calculation(df, market_returns=0.05, risk_free_rate=0.0):
     # Convert the 'datetime' column to datetime type for further calculations
     df['datetime'] = pd.to_datetime(df['datetime'])
 
-    # Calculate cumulative returns
-    df = calculate_cumulative_returns(df)
-
-    # Calculate max drawdown
-    df = calculate_max_drawdown(df)
-
-    # Calculate win/loss ratio
-    df = calculate_win_loss_ratio(df)
-
-    # Calculate alpha and beta
-    # df = calculate_alpha_beta(df, market_returns)
-
-    # Calculate additional metrics
-    df = calculate_additional_metrics(df, market_returns, risk_free_rate)
+    # All metric columns come out of one vectorized pass over the price array
+    metrics = compute_metrics(df['price'], market_returns, risk_free_rate)
+    for name, values in metrics.items():
+        df[name] = values
 
     return df
 
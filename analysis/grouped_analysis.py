@@ -0,0 +1,133 @@
+import numpy as np
+import pandas as pd
+from typing import Dict
+
+from .final_analysis import compact_metrics
+
+
+def _segment_sum(values, starts):
+    """Per-segment sum of a sorted array, NaN treated as 0"""
+    return np.add.reduceat(np.where(np.isnan(values), 0.0, values), starts)
+
+
+def _segment_cumsum(values, starts, segment):
+    """Running sum that restarts at every segment boundary"""
+    total = np.cumsum(values)
+    return total - (total[starts] - values[starts])[segment]
+
+
+def _segment_mean_std(values, starts, segment):
+    """Per-segment mean and sample standard deviation, skipping NaN"""
+    count = np.add.reduceat((~np.isnan(values)).astype(np.int64), starts)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = _segment_sum(values, starts) / count
+        squares = _segment_sum((values - mean[segment]) ** 2, starts)
+        std = np.sqrt(squares / (count - 1))
+    std[count < 2] = np.nan
+    return mean, std
+
+
+def grouped_metrics(df: pd.DataFrame, market_returns: float = 0.05, risk_free_rate: float = 0.0,
+                    include_rows: bool = True) -> Dict:
+    """
+    Metrics per ``stock`` for a mixed-symbol blotter in one vectorized pass
+
+    The blotter is sorted once by (stock, datetime); every per-symbol running
+    metric and summary is then computed on the sorted arrays using the segment
+    boundaries, so the cost does not grow with the number of distinct symbols.
+
+    Returns:
+        Dict with
+            'rows': per-row metric columns, each symbol's returns taken against
+                    its own previous price, aligned with ``df.index``
+                    (None when ``include_rows`` is False)
+            'instruments': one summary row per stock
+            'portfolio': compact_metrics summary of the per-symbol returns
+                         taken in the blotter's chronological order
+    """
+    codes, symbols = pd.factorize(df['stock'], sort=True, use_na_sentinel=False)
+    times = pd.to_datetime(df['datetime']).to_numpy(dtype='datetime64[ns]').view(np.int64)
+    order = np.lexsort((times, codes))
+
+    price = df['price'].to_numpy(dtype=np.float64)[order]
+    code = codes[order]
+    n = len(price)
+
+    is_start = np.ones(n, dtype=bool)
+    is_start[1:] = code[1:] != code[:-1]
+    starts = np.flatnonzero(is_start)
+    segment = np.cumsum(is_start) - 1
+
+    # Returns and the cumulative product restart at every symbol; the product
+    # telescopes to price / first price of the symbol
+    returns = np.empty(n)
+    returns[1:] = price[1:] / price[:-1] - 1
+    returns[is_start] = np.nan
+    cumulative_returns = price / price[starts][segment]
+    cumulative_returns[is_start] = np.nan
+
+    keys = pd.Series(segment)
+    peak = pd.Series(cumulative_returns).groupby(keys, sort=False).cummax().to_numpy()
+    daily_drawdown = cumulative_returns / peak - 1
+    max_drawdown = pd.Series(daily_drawdown).groupby(keys, sort=False).cummin().to_numpy()
+
+    gain = np.where(returns > 0, returns, 0.0)
+    loss = np.where(returns < 0, -returns, 0.0)
+    downside_returns = -loss
+
+    mean, std = _segment_mean_std(returns, starts, segment)
+    _, downside_volatility = _segment_mean_std(downside_returns, starts, segment)
+    worst_drawdown = np.fmin.reduceat(max_drawdown, starts)
+    total_gain = np.add.reduceat(gain, starts)
+    total_loss = np.add.reduceat(loss, starts)
+    ends = np.append(starts[1:], n)
+    trades = ends - starts
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        information_ratio = (mean - market_returns) / std
+        calmar_ratio = mean / np.abs(worst_drawdown)
+        instruments = pd.DataFrame({
+            'trades': trades,
+            'cumulative_returns': np.where(trades > 1, price[ends - 1] / price[starts], np.nan),
+            'max_drawdown': worst_drawdown,
+            'win_loss_ratio': total_gain / total_loss,
+            'mean_return': mean,
+            'standard_deviation': std,
+            'sharpe_ratio': (mean - risk_free_rate) / std,
+            'sortino_ratio': (mean - risk_free_rate) / downside_volatility,
+            'information_ratio': information_ratio,
+            'calmar_ratio': calmar_ratio,
+        }, index=pd.Index(symbols[code[starts]], name='stock'))
+
+    # Scatter the sorted results back to the blotter's row order
+    chronological_returns = np.empty(n)
+    chronological_returns[order] = returns
+    _, portfolio = compact_metrics(chronological_returns, market_returns, risk_free_rate)
+
+    if not include_rows:
+        return {'rows': None, 'instruments': instruments, 'portfolio': portfolio}
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sorted_rows = {
+            'cumulative_returns': cumulative_returns,
+            'daily_drawdown': daily_drawdown,
+            'max_drawdown': max_drawdown,
+            'gain': gain,
+            'loss': loss,
+            'win_loss_ratio': _segment_cumsum(gain, starts, segment) / _segment_cumsum(loss, starts, segment),
+            'sharpe_ratio': (returns - risk_free_rate) / std[segment],
+            'downside_returns': downside_returns,
+            'sortino_ratio': (returns - risk_free_rate) / downside_volatility[segment],
+            'standard_deviation': std[segment],
+            'excess_returns': returns - market_returns,
+            'information_ratio': information_ratio[segment],
+            'calmar_ratio': calmar_ratio[segment],
+        }
+
+    rows = pd.DataFrame({'returns': chronological_returns}, index=df.index)
+    for name, values in sorted_rows.items():
+        restored = np.empty(n)
+        restored[order] = values
+        rows[name] = restored
+
+    return {'rows': rows, 'instruments': instruments, 'portfolio': portfolio}
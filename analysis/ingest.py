@@ -0,0 +1,72 @@
+import pandas as pd
+from pandas.api.types import union_categoricals
+from typing import Dict, List
+
+# Column types of a trade blotter (datetime,stock,ordertype,price,quantity,Exchange).
+# Symbol-like columns are stored as categoricals so a multi-million row upload
+# keeps one small integer code per row instead of one Python string per cell.
+TRADE_DTYPES = {
+    'stock': 'category',
+    'ordertype': 'category',
+    'price': 'float64',
+    'quantity': 'int64',
+    'Exchange': 'category',
+}
+
+# Columns every blotter needs; the symbol and order columns only add the
+# per-instrument and round-trip tables
+REQUIRED_COLUMNS = ('datetime', 'price')
+
+DEFAULT_CHUNKSIZE = 250_000
+
+
+def _concat_column(parts: List[pd.Series]) -> pd.Series:
+    """Join the per-chunk pieces of one column into a single typed column"""
+    if isinstance(parts[0].dtype, pd.CategoricalDtype):
+        # Sorted, as a single-chunk read would give, whatever the chunk size
+        return pd.Series(union_categoricals(parts, sort_categories=True), name=parts[0].name)
+    return pd.concat(parts, ignore_index=True)
+
+
+def read_trades(source, encoding: str = None, chunksize: int = DEFAULT_CHUNKSIZE) -> pd.DataFrame:
+    """
+    Parse a trade blotter straight into typed columns, chunk by chunk
+
+    Args:
+        source: Path or binary file object (e.g. a Django ``UploadedFile``)
+        encoding: Text encoding of the file, defaults to utf-8
+        chunksize: Number of rows parsed per chunk
+
+    Returns:
+        DataFrame with ``datetime`` parsed, ``price`` as float64,
+        ``quantity`` as int64 and symbol columns as categoricals
+
+    Raises:
+        ValueError if the file is empty, lacks a required column or has a
+        value that does not parse as its column type
+    """
+    try:
+        reader = pd.read_csv(source, encoding=encoding or 'utf-8', dtype=TRADE_DTYPES,
+                             chunksize=chunksize, engine='c')
+    except pd.errors.EmptyDataError:
+        raise ValueError("Uploaded file contains no trades") from None
+
+    columns: Dict[str, List[pd.Series]] = {}
+    for chunk in reader:
+        missing = [name for name in REQUIRED_COLUMNS if name not in chunk.columns]
+        if missing:
+            raise ValueError(f"Uploaded file is missing columns: {', '.join(missing)}")
+        if chunk.empty:
+            continue
+        chunk['datetime'] = pd.to_datetime(chunk['datetime'])
+        for name, column in chunk.items():
+            columns.setdefault(name, []).append(column)
+
+    if not columns:
+        raise ValueError("Uploaded file contains no trades")
+
+    if len(next(iter(columns.values()))) == 1:
+        df = pd.DataFrame({name: parts[0] for name, parts in columns.items()})
+    else:
+        df = pd.DataFrame({name: _concat_column(parts) for name, parts in columns.items()})
+    return df.reset_index(drop=True)
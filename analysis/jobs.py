@@ -0,0 +1,230 @@
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from functools import lru_cache
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.db.models import F
+from django.utils import timezone
+
+from .models import ReportJob
+
+logger = logging.getLogger(__name__)
+
+
+def _email_job(payload: Dict) -> Dict:
+    from .email_service import EmailReportService
+    from .dashboard import AnalysisNotFound, load_analysis
+    analysis_data = payload['analysis_data']
+    if 'analysis_id' in analysis_data:
+        # The message body only needs the last row; the report loads the series
+        # itself, and not at all when it is cached
+        record = load_analysis(analysis_data['analysis_id'])
+        if record is None:
+            raise AnalysisNotFound(analysis_data['analysis_id'])
+        analysis_data = dict(analysis_data, last_value=record['last_value'])
+    EmailReportService().deliver_report(payload['email'], analysis_data, payload['report_type'])
+    return {'recipients': [payload['email']]}
+
+
+# Job kind -> handler taking the job payload and returning a JSON-able result;
+# a handler raises to have the job retried
+JOB_HANDLERS = {
+    'email': _email_job,
+}
+
+
+@lru_cache(maxsize=1)
+def _executor(max_workers: int) -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='report-job')
+
+
+def _dispatch(job_id: str, delay: float = 0):
+    """
+    Hand a job to this process' worker pool, after ``delay`` seconds
+
+    With settings.REPORT_JOB_WORKERS at 0 nothing runs in-process; the jobs
+    wait in the table for `manage.py process_report_jobs`.
+    """
+    workers = getattr(settings, 'REPORT_JOB_WORKERS', 2)
+    if workers <= 0:
+        return
+    if delay > 0:
+        timer = threading.Timer(delay, _dispatch, (job_id,))
+        timer.daemon = True
+        timer.start()
+        return
+    _executor(workers).submit(run_job, job_id)
+
+
+def enqueue(kind: str, payload: Dict, max_attempts: int = None) -> str:
+    """
+    Queue a job and return its id straight away
+
+    Raises:
+        ValueError for an unknown job kind
+    """
+    if kind not in JOB_HANDLERS:
+        raise ValueError(f"Unknown job kind: {kind}")
+    if max_attempts is None:
+        max_attempts = getattr(settings, 'REPORT_JOB_MAX_ATTEMPTS', 3)
+    job = ReportJob.objects.create(id=uuid.uuid4().hex, kind=kind, payload=payload, max_attempts=max_attempts)
+    _dispatch(job.pk)
+    return job.pk
+
+
+def _due(now=None):
+    return ReportJob.objects.filter(status=ReportJob.QUEUED, available_at__lte=now or timezone.now())
+
+
+def claim(job_id: str = None) -> Optional[ReportJob]:
+    """
+    Mark a due queued job as running: the given one, or else the oldest
+
+    The status check and the update are a single UPDATE, so exactly one
+    worker (thread or process) wins a job.
+
+    Returns:
+        The claimed job, or None when there is nothing due or another worker won
+    """
+    now = timezone.now()
+    due = _due(now)
+    if job_id is None:
+        job_id = due.order_by('available_at').values_list('pk', flat=True).first()
+        if job_id is None:
+            return None
+    if not due.filter(pk=job_id).update(status=ReportJob.RUNNING, attempts=F('attempts') + 1, updated_at=now):
+        return None
+    return ReportJob.objects.get(pk=job_id)
+
+
+def _failed(job: ReportJob, error: Exception) -> str:
+    now = timezone.now()
+    if job.attempts < job.max_attempts:
+        # Exponential backoff: REPORT_JOB_RETRY_DELAY, then twice that, ...
+        delay = getattr(settings, 'REPORT_JOB_RETRY_DELAY', 30) * 2 ** (job.attempts - 1)
+        logger.warning("Report job %s attempt %s failed, retrying in %ss: %s", job.pk, job.attempts, delay, error)
+        ReportJob.objects.filter(pk=job.pk).update(
+            status=ReportJob.QUEUED, error=str(error), available_at=now + timedelta(seconds=delay))
+        _dispatch(job.pk, delay)
+        return ReportJob.QUEUED
+    logger.error("Report job %s failed after %s attempts: %s", job.pk, job.attempts, error)
+    ReportJob.objects.filter(pk=job.pk).update(status=ReportJob.FAILED, error=str(error), finished_at=now)
+    return ReportJob.FAILED
+
+
+def run_job(job_id: str = None) -> Optional[str]:
+    """
+    Claim and run one job (the given one, or the oldest due)
+
+    Returns:
+        The job's new status, or None if no job was claimed
+    """
+    close_old_connections()
+    try:
+        job = claim(job_id)
+        if job is None:
+            return None
+        try:
+            result = JOB_HANDLERS[job.kind](job.payload)
+        except Exception as e:
+            return _failed(job, e)
+        ReportJob.objects.filter(pk=job.pk).update(
+            status=ReportJob.DONE, result=result, error='', finished_at=timezone.now())
+        return ReportJob.DONE
+    finally:
+        # Worker threads must not hold connections between jobs
+        if threading.current_thread() is not threading.main_thread():
+            connection.close()
+
+
+def requeue_stale(older_than: float = None) -> int:
+    """
+    Put back jobs left running by a worker that died
+
+    Returns:
+        Number of jobs requeued
+    """
+    if older_than is None:
+        older_than = getattr(settings, 'REPORT_JOB_STALE_AFTER', 600)
+    cutoff = timezone.now() - timedelta(seconds=older_than)
+    return ReportJob.objects.filter(status=ReportJob.RUNNING, updated_at__lt=cutoff).update(
+        status=ReportJob.QUEUED, available_at=timezone.now())
+
+
+def poll_jobs() -> int:
+    """
+    Requeue stale jobs, then run every due queued job in this thread
+
+    A claim lost to another worker only means that job is taken; polling goes
+    on while any due job is left.
+
+    Returns:
+        Number of jobs run
+    """
+    requeue_stale()
+    processed = 0
+    while True:
+        if run_job() is not None:
+            processed += 1
+        elif not _due().exists():
+            return processed
+
+
+def _poll_forever(interval: float):
+    while True:
+        try:
+            poll_jobs()
+        except Exception:
+            logger.exception("Report job poll failed")
+        time.sleep(interval)
+
+
+@lru_cache(maxsize=1)
+def _poller(interval: float) -> threading.Thread:
+    thread = threading.Thread(target=_poll_forever, args=(interval,), name='report-job-poller', daemon=True)
+    thread.start()
+    return thread
+
+
+def start_poller() -> bool:
+    """
+    Start this process' job poller, once
+
+    Jobs only reach the worker pool when enqueued or retried, and a restart
+    loses both the pool's queue and the retry timers. Every
+    settings.REPORT_JOB_POLL_INTERVAL seconds the poller runs poll_jobs, so
+    those jobs, and jobs left running by a dead worker, still run. Called by
+    the WSGI entry points; nothing starts with REPORT_JOB_WORKERS at 0 (the
+    standalone worker polls instead) or a zero interval.
+
+    Returns:
+        Whether a poller is running
+    """
+    interval = getattr(settings, 'REPORT_JOB_POLL_INTERVAL', 15)
+    if getattr(settings, 'REPORT_JOB_WORKERS', 2) <= 0 or interval <= 0:
+        return False
+    _poller(interval)
+    return True
+
+
+def job_status(job_id: str) -> Optional[Dict]:
+    """Public view of a job, or None if the id is unknown"""
+    job = ReportJob.objects.filter(pk=job_id).first()
+    if job is None:
+        return None
+    return {
+        'job_id': job.pk,
+        'kind': job.kind,
+        'status': job.status,
+        'attempts': job.attempts,
+        'error': job.error or None,
+        'result': job.result,
+        'created_at': job.created_at.isoformat(),
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+    }
@@ -0,0 +1,205 @@
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+from django.utils.module_loading import import_string
+
+from .llm_cache import cached_complete
+
+logger = logging.getLogger(__name__)
+
+# Shown when the model is unavailable, too slow or fails
+FALLBACK_ANALYSIS = "The trader's purchase of INFY stock suggests that he or she believes the stock is undervalued at its current price relative to its earnings and should appreciate in price. Another financial ratio that is useful for analyzing the performance of the trader is the price-to-book (P/B) ratio, which is calculated by dividing the current stock price by its book value. The higher the P/B ratio, the more expensive the stock is relative to its book value. The trader's purchase of INFY suggests that he or she believes the stock is undervalued at its current price relative to its"
+FALLBACK_SCORE = 4
+
+# Cache alias holding the state of background commentary jobs; it must be shared
+# by all workers (the settings use the database) since any of them may serve a poll
+COMMENTARY_CACHE_ALIAS = 'commentary'
+COMMENTARY_TTL = 3600
+# Attempts at writing a finished job's state before giving up on it
+COMMENTARY_STORE_ATTEMPTS = 3
+
+
+def analysis_prompt(last_row: str) -> str:
+    return f"Can you provide an analysis of the trader's(not about how much quantity he bought but about what are different types of financial ratio) performance based on the following data?\n\n{last_row}"
+
+
+def score_prompt(last_row: str) -> str:
+    return f"Please rate the trader's performance between 0.0 and 10.0 on the basis of {last_row}:"
+
+
+class OpenAIClient:
+    """Text completions through the OpenAI API"""
+
+    def __init__(self):
+        from openai import OpenAI
+        self.model = getattr(settings, 'LLM_MODEL', 'gpt-3.5-turbo-instruct')
+        self.client = OpenAI(
+            api_key=os.environ.get("OPENAI_API_KEY"),
+            organization=os.environ.get("OPENAI_ORG_ID"),
+            timeout=getattr(settings, 'LLM_TIMEOUT', 8.0),
+            max_retries=0,
+        )
+
+    def complete(self, prompt: str, max_tokens: int, temperature: float = None) -> str:
+        options = {} if temperature is None else {'temperature': temperature}
+        completion = self.client.completions.create(
+            model=self.model, prompt=prompt, max_tokens=max_tokens, **options)
+        return completion.choices[0].text.strip()
+
+
+class StubClient:
+    """Offline client that answers instantly with the fallback texts"""
+
+    def complete(self, prompt: str, max_tokens: int, temperature: float = None) -> str:
+        return str(FALLBACK_SCORE) if max_tokens <= 5 else FALLBACK_ANALYSIS
+
+
+@lru_cache(maxsize=None)
+def _client(path: str):
+    return import_string(path)()
+
+
+def get_client():
+    """The client class named by settings.LLM_CLIENT, built once per process"""
+    return _client(getattr(settings, 'LLM_CLIENT', 'analysis.llm.OpenAIClient'))
+
+
+@lru_cache(maxsize=1)
+def _executor(max_workers: int) -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='llm')
+
+
+def _call(prompt: str, max_tokens: int, temperature: float = None) -> str:
+    return cached_complete(get_client(), prompt, max_tokens, temperature)
+
+
+def warm_cache(last_row: str) -> Tuple[str, object]:
+    """Run both commentary calls for a final row synchronously, filling the response cache"""
+    return _call(analysis_prompt(last_row), 200), _call(score_prompt(last_row), 5, 0.0)
+
+
+class Commentary:
+    """
+    The narrative and score calls for one blotter, running in the background
+
+    Both requests start as soon as the object is created so they overlap with
+    each other and with the metric calculation; ``result`` waits for what is
+    left of the latency budget and substitutes the fallbacks for anything
+    that failed or has not answered.
+    """
+
+    def __init__(self, last_row: str, budget: float = None):
+        self.budget = getattr(settings, 'LLM_TIMEOUT', 8.0) if budget is None else budget
+        self.started = time.monotonic()
+        executor = _executor(getattr(settings, 'LLM_MAX_WORKERS', 8))
+        self.analysis = executor.submit(_call, analysis_prompt(last_row), 200)
+        self.score = executor.submit(_call, score_prompt(last_row), 5, 0.0)
+
+    def _outcome(self, future, fallback):
+        if not future.done():
+            future.cancel()
+            logger.warning("LLM call exceeded the %.1fs budget, using the fallback", self.budget)
+            return fallback
+        try:
+            return future.result()
+        except Exception as e:
+            logger.warning("LLM call failed, using the fallback: %s", e)
+            return fallback
+
+    def done(self) -> bool:
+        return self.analysis.done() and self.score.done()
+
+    def outcome(self) -> Tuple[str, object]:
+        """(response1, response2) as they stand now, fallbacks for anything unfinished"""
+        return self._outcome(self.analysis, FALLBACK_ANALYSIS), self._outcome(self.score, FALLBACK_SCORE)
+
+    def result(self) -> Tuple[str, object]:
+        """(response1, response2) within the budget counted from construction"""
+        remaining = max(0.0, self.budget - (time.monotonic() - self.started))
+        wait([self.analysis, self.score], timeout=remaining)
+        return self.outcome()
+
+
+def _job_key(job_id: str) -> str:
+    return f'commentary:{job_id}'
+
+
+def _store_state(job_id: str, state: Dict):
+    """
+    Write a job's state to the commentary cache and read it back
+
+    DatabaseCache drops a write that hits a DatabaseError (e.g. SQLite's
+    "database is locked") without a word, which would leave the job pending
+    until its deadline; the write is retried with a short backoff instead.
+
+    Raises:
+        RuntimeError when the state still has not stuck after the last attempt
+    """
+    cache = caches[COMMENTARY_CACHE_ALIAS]
+    for attempt in range(COMMENTARY_STORE_ATTEMPTS):
+        cache.set(_job_key(job_id), state, COMMENTARY_TTL)
+        if cache.get(_job_key(job_id)) == state:
+            return
+        time.sleep(0.05 * 2 ** attempt)
+    raise RuntimeError(f"Commentary {job_id} could not be stored")
+
+
+def start_commentary(last_row: str) -> str:
+    """
+    Start the commentary for a blotter in the background and return its job id
+
+    The job state lives in the commentary cache so any worker can answer
+    commentary_status(); the page polls it after rendering the charts.
+    """
+    job_id = uuid.uuid4().hex
+    cache = caches[COMMENTARY_CACHE_ALIAS]
+    commentary = Commentary(last_row)
+    cache.set(_job_key(job_id), {'status': 'pending', 'deadline': time.time() + commentary.budget},
+              COMMENTARY_TTL)
+
+    caller = threading.current_thread()
+
+    def _store(_):
+        # Stores once both futures are done (possibly twice, harmlessly)
+        try:
+            if commentary.done():
+                response1, response2 = commentary.outcome()
+                _store_state(job_id, {'status': 'done', 'response1': response1, 'response2': response2})
+        except Exception:
+            logger.exception("LLM commentary %s was answered but not stored", job_id)
+        finally:
+            # LLM pool threads must not hold database connections between calls;
+            # the first call to finish has already used one for the response cache
+            if threading.current_thread() is not caller:
+                connection.close()
+
+    commentary.analysis.add_done_callback(_store)
+    commentary.score.add_done_callback(_store)
+    return job_id
+
+
+def commentary_status(job_id: str) -> Optional[Dict]:
+    """
+    State of a commentary job: {'status': 'pending'} or {'status': 'done', 'response1', 'response2'}
+
+    Jobs still running past their latency budget are reported done with the fallbacks.
+    Returns None for unknown or expired jobs.
+    """
+    state = caches[COMMENTARY_CACHE_ALIAS].get(_job_key(job_id))
+    if state is None:
+        return None
+    if state['status'] == 'pending':
+        if time.time() < state['deadline']:
+            return {'status': 'pending'}
+        logger.warning("LLM commentary %s exceeded its budget, using the fallback", job_id)
+        return {'status': 'done', 'response1': FALLBACK_ANALYSIS, 'response2': FALLBACK_SCORE}
+    return state
@@ -0,0 +1,125 @@
+import hashlib
+import json
+import logging
+import threading
+from concurrent.futures import Future
+from datetime import timedelta
+from typing import Optional
+
+from django.conf import settings
+from django.db import IntegrityError
+from django.db.models import F
+from django.utils import timezone
+
+from .models import LLMResponse
+
+logger = logging.getLogger(__name__)
+
+_inflight_lock = threading.Lock()
+_inflight = {}
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Whitespace-insensitive form of a prompt; DataFrame.to_string() padding varies with column widths"""
+    return ' '.join(prompt.split())
+
+
+def response_key(prompt: str, model: str, max_tokens: int, temperature: float = None) -> str:
+    payload = json.dumps([normalize_prompt(prompt), model, max_tokens, temperature])
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _lookup(key: str) -> Optional[str]:
+    """Cached response for a key, honouring the TTL for sampled (temperature != 0) calls"""
+    entry = LLMResponse.objects.filter(key=key).only('response', 'temperature', 'created_at').first()
+    if entry is None:
+        return None
+    ttl = getattr(settings, 'LLM_CACHE_TTL', 7 * 86400)
+    if not entry.deterministic and entry.created_at < timezone.now() - timedelta(seconds=ttl):
+        entry.delete()
+        return None
+    LLMResponse.objects.filter(pk=entry.pk).update(hits=F('hits') + 1, last_used_at=timezone.now())
+    return entry.response
+
+
+def _store(key: str, prompt: str, model: str, max_tokens: int, temperature: float, response: str):
+    # Single-statement writes: update_or_create reads, then writes in one
+    # transaction, and SQLite fails such a write at once when another
+    # connection (e.g. an upload being saved) holds the write lock, where a
+    # plain INSERT or UPDATE waits for it
+    fields = {'model': model, 'prompt': prompt, 'max_tokens': max_tokens,
+              'temperature': temperature, 'response': response}
+    try:
+        LLMResponse.objects.create(key=key, **fields)
+    except IntegrityError:
+        # Stored meanwhile by another worker
+        LLMResponse.objects.filter(key=key).update(**fields)
+    evict()
+
+
+def evict(max_entries: int = None) -> int:
+    """
+    Drop expired sampled responses, then least recently used entries over the size bound
+
+    Deterministic (temperature == 0) responses never expire and are only
+    evicted once no sampled responses are left to drop.
+
+    Returns:
+        Number of rows deleted
+    """
+    if max_entries is None:
+        max_entries = getattr(settings, 'LLM_CACHE_MAX_ENTRIES', 10_000)
+    ttl = getattr(settings, 'LLM_CACHE_TTL', 7 * 86400)
+    expired = LLMResponse.objects.exclude(temperature=0.0).filter(
+        created_at__lt=timezone.now() - timedelta(seconds=ttl))
+    deleted = expired.delete()[0]
+
+    excess = LLMResponse.objects.count() - max_entries
+    if excess > 0:
+        # NULL temperature (sampled) sorts before 0.0 rows: evict those first
+        victims = LLMResponse.objects.order_by(F('temperature').desc(nulls_first=True), 'last_used_at')
+        pks = list(victims.values_list('pk', flat=True)[:excess])
+        deleted += LLMResponse.objects.filter(pk__in=pks).delete()[0]
+    return deleted
+
+
+def cached_complete(client, prompt: str, max_tokens: int, temperature: float = None) -> str:
+    """
+    client.complete() through the persistent response cache
+
+    Concurrent identical calls in this process share one request. Cache read
+    or write failures (e.g. migrations not applied) only cost the cache hit.
+    """
+    model = getattr(client, 'model', type(client).__name__)
+    key = response_key(prompt, model, max_tokens, temperature)
+    try:
+        cached = _lookup(key)
+    except Exception as e:
+        logger.warning("LLM cache lookup failed: %s", e)
+        cached = None
+    if cached is not None:
+        return cached
+
+    with _inflight_lock:
+        future = _inflight.get(key)
+        owner = future is None
+        if owner:
+            future = _inflight[key] = Future()
+    if not owner:
+        return future.result()
+
+    try:
+        response = client.complete(prompt, max_tokens, temperature)
+        future.set_result(response)
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _inflight_lock:
+            del _inflight[key]
+
+    try:
+        _store(key, prompt, model, max_tokens, temperature, response)
+    except Exception as e:
+        logger.warning("LLM cache store failed: %s", e)
+    return response
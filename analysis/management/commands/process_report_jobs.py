@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from analysis.jobs import requeue_stale, run_job
+
+
+class Command(BaseCommand):
+    help = "Run queued report jobs; use as a standalone worker with REPORT_JOB_WORKERS=0 in the web process"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help="keep polling for new jobs instead of exiting")
+        parser.add_argument('--interval', type=float, default=2.0, help="seconds between polls with --loop")
+
+    def handle(self, *args, **options):
+        requeued = requeue_stale()
+        if requeued:
+            self.stdout.write(f"Requeued {requeued} stale job(s)")
+        processed = 0
+        while True:
+            status = run_job()
+            if status is not None:
+                processed += 1
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS(f"Processed {processed} job(s)"))
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from analysis.ingest import read_trades
+from analysis.llm import warm_cache
+from analysis.llm_cache import evict
+
+
+class Command(BaseCommand):
+    help = "Fill the LLM response cache with the commentary for past blotters"
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='*', help="CSV blotters that were analysed before")
+        parser.add_argument('--demo', action='store_true', help="also warm the /analysis demo blotter")
+
+    def handle(self, *args, **options):
+        last_rows = []
+        for path in options['paths']:
+            try:
+                with open(path, 'rb') as csv_file:
+                    df = read_trades(csv_file, encoding='utf-8')
+            except (OSError, ValueError) as e:
+                raise CommandError(f"{path}: {e}")
+            last_rows.append((path, df.tail(1).to_string(index=False)))
+        if options['demo']:
+            from sample_data_generator import build_sample_data
+            last_rows.append(('demo', build_sample_data().tail(1).to_string(index=False)))
+        if not last_rows:
+            raise CommandError("Give at least one CSV path or --demo")
+
+        for name, last_row in last_rows:
+            try:
+                _, score = warm_cache(last_row)
+            except Exception as e:
+                self.stderr.write(f"{name}: {e}")
+                continue
+            self.stdout.write(f"{name}: cached (score {score})")
+
+        evicted = evict()
+        if evicted:
+            self.stdout.write(f"Evicted {evicted} stale responses")
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.2 on 2026-10-16 23:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LLMResponse',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True)),
+                ('model', models.CharField(max_length=100)),
+                ('prompt', models.TextField()),
+                ('max_tokens', models.PositiveIntegerField()),
+                ('temperature', models.FloatField(null=True)),
+                ('response', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('last_used_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('hits', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+    ]
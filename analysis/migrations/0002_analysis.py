@@ -0,0 +1,33 @@
+# Generated by Django 4.2.2 on 2026-10-16 23:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analysis', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Analysis',
+            fields=[
+                ('id', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('date_format', models.CharField(max_length=32)),
+                ('market_returns', models.FloatField()),
+                ('risk_free_rate', models.FloatField()),
+                ('rows', models.PositiveIntegerField()),
+                ('series', models.JSONField(default=list)),
+                ('summary', models.JSONField()),
+                ('last_value', models.JSONField()),
+                ('tables', models.JSONField(default=dict)),
+                ('last_row', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_used_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                'verbose_name_plural': 'analyses',
+            },
+        ),
+    ]
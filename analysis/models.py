@@ -1,3 +1,82 @@
 from django.db import models
+from django.utils import timezone
 
-# Create your models here.
+
+class LLMResponse(models.Model):
+    """A completed LLM call, keyed by its normalized prompt, model and parameters"""
+
+    key = models.CharField(max_length=64, unique=True)
+    model = models.CharField(max_length=100)
+    prompt = models.TextField()
+    max_tokens = models.PositiveIntegerField()
+    temperature = models.FloatField(null=True)
+    response = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    last_used_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    hits = models.PositiveIntegerField(default=0)
+
+    @property
+    def deterministic(self):
+        return self.temperature == 0.0
+
+    def __str__(self):
+        return f"{self.model}: {self.prompt[:60]}"
+
+
+class Analysis(models.Model):
+    """
+    Scalar results of an analysed blotter, keyed by the upload's content address
+
+    The per-row metric series live next to the database as one .npy file per
+    series (see analysis.analysis_store); ``series`` lists their names.
+    """
+
+    id = models.CharField(max_length=64, primary_key=True)
+    date_format = models.CharField(max_length=32)
+    market_returns = models.FloatField()
+    risk_free_rate = models.FloatField()
+    rows = models.PositiveIntegerField()
+    series = models.JSONField(default=list)
+    summary = models.JSONField()
+    last_value = models.JSONField()
+    tables = models.JSONField(default=dict)
+    last_row = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        verbose_name_plural = 'analyses'
+
+    def __str__(self):
+        return f"{self.id[:12]} ({self.rows} rows)"
+
+
+class ReportJob(models.Model):
+    """
+    A report generation/delivery job; this table is the queue (see analysis.jobs)
+
+    ``payload`` holds the handler's JSON input; queued jobs run once
+    ``available_at`` has passed, which is how retries are delayed.
+    """
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(QUEUED, 'Queued'), (RUNNING, 'Running'), (DONE, 'Done'), (FAILED, 'Failed')]
+
+    id = models.CharField(max_length=32, primary_key=True)
+    kind = models.CharField(max_length=20)
+    payload = models.JSONField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED, db_index=True)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    available_at = models.DateTimeField(default=timezone.now, db_index=True)
+    error = models.TextField(blank=True)
+    result = models.JSONField(null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True)
+
+    def __str__(self):
+        return f"{self.kind} {self.id} ({self.status})"
@@ -0,0 +1,156 @@
+import math
+import numpy as np
+from typing import Dict
+
+# Running state carried between updates; everything is a plain float/int so
+# the state can be stored as JSON (in the session, the cache or the database).
+STATE_FIELDS = (
+    'market_returns', 'risk_free_rate', 'rows', 'last_price', 'started', 'cumulative',
+    'peak', 'worst_drawdown', 'gain_sum', 'loss_sum',
+    'count', 'mean', 'm2', 'downside_count', 'downside_mean', 'downside_m2',
+)
+
+
+def _merge_moments(count, mean, m2, values):
+    """Fold a batch into running (count, mean, M2) with Chan's parallel update of Welford's method"""
+    n = len(values)
+    if not n:
+        return count, mean, m2
+    batch_mean = values.mean()
+    batch_m2 = ((values - batch_mean) ** 2).sum()
+    total = count + n
+    delta = batch_mean - mean
+    return total, mean + delta * n / total, m2 + batch_m2 + delta * delta * count * n / total
+
+
+def _std(count, m2):
+    return math.sqrt(m2 / (count - 1)) if count > 1 else math.nan
+
+
+class OnlineMetrics:
+    """
+    Running compact metrics for a price series that only ever grows
+
+    ``update`` folds newly appended prices into the state in O(N) for N new
+    rows. The running product, peak, drawdown and gain/loss sums are carried
+    exactly, so the per-row series it returns are the same values a full
+    recompute gives for those rows; mean and variances use Welford updates.
+    """
+
+    def __init__(self, market_returns: float = 0.05, risk_free_rate: float = 0.0):
+        self.market_returns = market_returns
+        self.risk_free_rate = risk_free_rate
+        self.rows = 0
+        self.last_price = math.nan
+        self.started = False
+        self.cumulative = 1.0
+        self.peak = math.nan
+        self.worst_drawdown = math.nan
+        self.gain_sum = 0.0
+        self.loss_sum = 0.0
+        self.count, self.mean, self.m2 = 0, 0.0, 0.0
+        self.downside_count, self.downside_mean, self.downside_m2 = 0, 0.0, 0.0
+
+    def update(self, price) -> Dict[str, np.ndarray]:
+        """
+        Append new prices
+
+        Returns:
+            Per-row series for the appended rows: returns, cumulative_returns,
+            daily_drawdown, max_drawdown, win_loss_ratio, and sharpe_ratio /
+            sortino_ratio scaled by the volatility of the whole history so far
+        """
+        price = np.asarray(price, dtype=np.float64)
+        if not len(price):
+            return {}
+
+        previous = np.concatenate(([self.last_price], price))
+        returns = previous[1:] / previous[:-1] - 1
+        valid = ~np.isnan(returns)
+
+        # Seeding each accumulate with the carried value keeps the same
+        # left-to-right operation order as a full recompute
+        product = np.nancumprod(np.concatenate(([self.cumulative], 1 + returns)))[1:]
+        cumulative_returns = product.copy()
+        if not self.started:
+            first = np.argmax(valid) if valid.any() else len(returns)
+            cumulative_returns[:first] = np.nan
+            self.started = bool(valid.any())
+
+        peak = np.fmax.accumulate(np.concatenate(([self.peak], cumulative_returns)))[1:]
+        daily_drawdown = cumulative_returns / peak - 1
+        max_drawdown = np.fmin.accumulate(np.concatenate(([self.worst_drawdown], daily_drawdown)))[1:]
+        max_drawdown[np.isnan(daily_drawdown)] = np.nan
+
+        gain = np.where(returns > 0, returns, 0.0)
+        loss = np.where(returns < 0, -returns, 0.0)
+        gain_sums = np.cumsum(np.concatenate(([self.gain_sum], gain)))[1:]
+        loss_sums = np.cumsum(np.concatenate(([self.loss_sum], loss)))[1:]
+
+        self.count, self.mean, self.m2 = _merge_moments(self.count, self.mean, self.m2, returns[valid])
+        self.downside_count, self.downside_mean, self.downside_m2 = _merge_moments(
+            self.downside_count, self.downside_mean, self.downside_m2, -loss)
+
+        self.rows += len(price)
+        self.last_price = float(price[-1])
+        self.cumulative = float(product[-1])
+        self.peak = float(peak[-1])
+        self.worst_drawdown = float(np.fmin(self.worst_drawdown, np.fmin.reduce(max_drawdown)))
+        self.gain_sum = float(gain_sums[-1])
+        self.loss_sum = float(loss_sums[-1])
+
+        std = _std(self.count, self.m2)
+        downside_volatility = _std(self.downside_count, self.downside_m2)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return {
+                'returns': returns,
+                'cumulative_returns': cumulative_returns,
+                'daily_drawdown': daily_drawdown,
+                'max_drawdown': max_drawdown,
+                'win_loss_ratio': gain_sums / loss_sums,
+                'sharpe_ratio': (returns - self.risk_free_rate) / std,
+                'sortino_ratio': (returns - self.risk_free_rate) / downside_volatility,
+            }
+
+    def summary(self) -> Dict:
+        """Scalar summary with the same keys as compact_metrics()"""
+        std = _std(self.count, self.m2)
+        mean = self.mean if self.count else math.nan
+        excess_mean = mean - self.market_returns
+
+        def _ratio(numerator, denominator):
+            if math.isnan(numerator) or math.isnan(denominator):
+                return math.nan
+            if denominator == 0:
+                return math.copysign(math.inf, numerator) if numerator else math.nan
+            return numerator / denominator
+
+        return {
+            'observations': self.count,
+            'mean_return': mean,
+            'standard_deviation': std,
+            'downside_volatility': _std(self.downside_count, self.downside_m2),
+            'excess_return': excess_mean,
+            'information_ratio': _ratio(excess_mean, std),
+            'calmar_ratio': _ratio(mean, abs(self.worst_drawdown)),
+            'cumulative_returns': self.cumulative if self.started else math.nan,
+            'max_drawdown': self.worst_drawdown,
+            'win_loss_ratio': _ratio(self.gain_sum, self.loss_sum),
+        }
+
+    def to_dict(self) -> Dict:
+        """JSON-safe snapshot of the running state (NaN stored as None)"""
+        state = {}
+        for field in STATE_FIELDS:
+            value = getattr(self, field)
+            state[field] = None if isinstance(value, float) and math.isnan(value) else value
+        return state
+
+    @classmethod
+    def from_dict(cls, state: Dict) -> 'OnlineMetrics':
+        """Rebuild the running state saved by to_dict()"""
+        metrics = cls(state['market_returns'], state['risk_free_rate'])
+        for field in STATE_FIELDS:
+            value = state[field]
+            setattr(metrics, field, math.nan if value is None else value)
+        return metrics
@@ -7,10 +7,167 @@ from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 from reportlab.lib import colors
 from reportlab.lib.enums import TA_CENTER, TA_LEFT
+from reportlab.graphics.shapes import Drawing, String
+from reportlab.graphics.charts.lineplots import LinePlot
+from reportlab.graphics.charts.barcharts import VerticalBarChart
+import numpy as np
 import io
-import base64
-from datetime import datetime
 import os
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from django.conf import settings
+
+from .downsample import downsample_indices
+
+
+# Raster charts are 10 inches wide at 300 dpi; more points than pixel columns
+# only slow matplotlib down
+RASTER_CHART_POINTS = 3000
+
+
+def _score_value(score) -> float:
+    """The report score as a number for wording the summary; 0 when it is not one"""
+    try:
+        return float(score)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def render_chart(data, title, chart_type='line', color='#667eea'):
+    """
+    Render one chart with matplotlib and return it as PNG bytes
+
+    Module level so the chart pool's worker processes can run it; pyplot keeps
+    global figure state, so charts are never rendered on parallel threads.
+    """
+    plt.style.use('seaborn-v0_8')
+    fig, ax = plt.subplots(figsize=(10, 6))
+    
+    if chart_type == 'line':
+        ax.plot(data, color=color, linewidth=2)
+        ax.fill_between(range(len(data)), data, alpha=0.3, color=color)
+    elif chart_type == 'bar':
+        ax.bar(range(len(data)), data, color=color, alpha=0.7)
+    
+    ax.set_title(title, fontsize=14, fontweight='bold', pad=20)
+    ax.grid(True, alpha=0.3)
+    ax.set_facecolor('#f8f9fa')
+    
+    buffer = io.BytesIO()
+    plt.savefig(buffer, format='png', dpi=300, bbox_inches='tight', 
+               facecolor='white', edgecolor='none')
+    plt.close(fig)
+    
+    return buffer.getvalue()
+
+
+@lru_cache(maxsize=1)
+def _chart_pool(workers: int) -> ProcessPoolExecutor:
+    # Spawned rather than forked: the web process runs threads (e.g. the LLM
+    # calls) whose locks a fork would copy in whatever state they are in
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+
+
+def render_charts(charts, workers=None, concurrency=None):
+    """
+    Render charts across the shared process pool, keeping their order
+
+    Args:
+        charts: List of render_chart argument tuples, e.g. (data, title)
+        workers: Size of the process pool (default settings.PDF_CHART_WORKERS)
+        concurrency: Most charts of this report in flight at once, so one large
+                     report cannot hold every worker (default settings.PDF_CHART_CONCURRENCY)
+
+    Returns:
+        List of PNG bytes; rendered in this process when there is nothing to
+        gain from the pool (fewer than two charts, workers or slots)
+    """
+    if workers is None:
+        workers = getattr(settings, 'PDF_CHART_WORKERS', os.cpu_count() or 1)
+    if concurrency is None:
+        concurrency = getattr(settings, 'PDF_CHART_CONCURRENCY', 4)
+    if len(charts) < 2 or workers < 2 or concurrency < 2:
+        return [render_chart(*chart) for chart in charts]
+
+    pool = _chart_pool(workers)
+    images, pending = [], deque()
+    try:
+        for chart in charts:
+            if len(pending) >= concurrency:
+                images.append(pending.popleft().result())
+            pending.append(pool.submit(render_chart, *chart))
+        while pending:
+            images.append(pending.popleft().result())
+    except BrokenProcessPool:
+        # A worker died (e.g. killed for memory): the next report gets a fresh pool
+        _chart_pool.cache_clear()
+        raise
+    finally:
+        for future in pending:
+            future.cancel()
+    return images
+
+
+def _thin(data, points):
+    """A line series cut to ``points`` values by LTTB, as a list for pickling"""
+    values = np.asarray(data, dtype=np.float64)
+    return values[downsample_indices(values, points, 'lttb')].tolist()
+
+
+def vector_chart(data, title, chart_type='line', color='#667eea', points=None,
+                 width=6*inch, height=3.6*inch):
+    """
+    Draw one chart as reportlab vector graphics, the counterpart of render_chart
+
+    The series is thinned to ``points`` values first (LTTB for lines, min/max
+    decimation for bars; default settings.PDF_VECTOR_CHART_POINTS), so the
+    drawing stays small however long the series is. Non-finite values are skipped.
+
+    Returns:
+        A Drawing flowable of the given size
+    """
+    if points is None:
+        points = getattr(settings, 'PDF_VECTOR_CHART_POINTS', 500)
+    values = np.asarray(data, dtype=np.float64)
+    keep = downsample_indices(values, points, 'minmax' if chart_type == 'bar' else 'lttb')
+    keep = keep[np.isfinite(values[keep])]
+
+    drawing = Drawing(width, height)
+    drawing.add(String(width / 2, height - 14, title, fontName='Helvetica-Bold',
+                       fontSize=12, textAnchor='middle'))
+    if len(keep) == 0:
+        return drawing
+
+    stroke = colors.HexColor(color)
+    if chart_type == 'bar':
+        chart = VerticalBarChart()
+        chart.data = [values[keep].tolist()]
+        chart.bars[0].fillColor = colors.Color(stroke.red, stroke.green, stroke.blue, alpha=0.7)
+        chart.bars[0].strokeColor = None
+        chart.categoryAxis.visibleLabels = False
+        chart.categoryAxis.visibleTicks = False
+    else:
+        chart = LinePlot()
+        chart.data = [list(zip(keep.tolist(), values[keep].tolist()))]
+        chart.lines[0].strokeColor = stroke
+        chart.lines[0].strokeWidth = 1.5
+        chart.lines[0].inFill = True
+        chart.lines[0].fillColor = colors.Color(stroke.red, stroke.green, stroke.blue, alpha=0.3)
+        chart.xValueAxis.valueMin = 0
+        chart.xValueAxis.valueMax = max(len(values) - 1, 1)
+        chart.xValueAxis.labels.fontSize = 7
+    chart.x, chart.y = 45, 20
+    chart.width, chart.height = width - 55, height - 45
+    chart.fillColor = colors.HexColor('#f8f9fa')
+    chart.yValueAxis.visibleGrid = True
+    chart.yValueAxis.gridStrokeColor = colors.HexColor('#dddddd')
+    chart.yValueAxis.labels.fontSize = 7
+    drawing.add(chart)
+    return drawing
+
 
 class PDFReportGenerator:
     def __init__(self):
@@ -46,29 +203,8 @@ class PDFReportGenerator:
         ))
 
     def create_chart_image(self, data, title, chart_type='line', color='#667eea'):
-        """Create a chart and return as base64 image"""
-        plt.style.use('seaborn-v0_8')
-        fig, ax = plt.subplots(figsize=(10, 6))
-        
-        if chart_type == 'line':
-            ax.plot(data, color=color, linewidth=2)
-            ax.fill_between(range(len(data)), data, alpha=0.3, color=color)
-        elif chart_type == 'bar':
-            ax.bar(range(len(data)), data, color=color, alpha=0.7)
-        
-        ax.set_title(title, fontsize=14, fontweight='bold', pad=20)
-        ax.grid(True, alpha=0.3)
-        ax.set_facecolor('#f8f9fa')
-        
-        # Convert to base64
-        buffer = io.BytesIO()
-        plt.savefig(buffer, format='png', dpi=300, bbox_inches='tight', 
-                   facecolor='white', edgecolor='none')
-        buffer.seek(0)
-        image_base64 = base64.b64encode(buffer.getvalue()).decode()
-        plt.close()
-        
-        return image_base64
+        """Create a chart and return it as PNG bytes"""
+        return render_chart(data, title, chart_type, color)
 
     def create_metrics_table(self, metrics):
         """Create a table of key metrics"""
@@ -99,8 +235,17 @@ class PDFReportGenerator:
         
         return table
 
-    def generate_report(self, analysis_data, output_path='portfolio_analysis_report.pdf'):
-        """Generate a comprehensive PDF report"""
+    def generate_report(self, analysis_data, output_path='portfolio_analysis_report.pdf', chart_mode=None):
+        """
+        Generate a comprehensive PDF report
+
+        ``chart_mode`` is 'raster' (300-dpi matplotlib PNGs) or 'vector'
+        (downsampled reportlab drawings); default settings.PDF_CHART_MODE.
+        """
+        if chart_mode is None:
+            chart_mode = getattr(settings, 'PDF_CHART_MODE', 'raster')
+        if chart_mode not in ('raster', 'vector'):
+            raise ValueError(f"Unsupported chart mode: {chart_mode}")
         doc = SimpleDocTemplate(output_path, pagesize=A4,
                               rightMargin=72, leftMargin=72,
                               topMargin=72, bottomMargin=18)
@@ -108,20 +253,17 @@ class PDFReportGenerator:
         story = []
         
         # Title
+        # No generation date: the report cache serves the same bytes on later days
         story.append(Paragraph("Portfolio Analysis Report", self.styles['CustomTitle']))
-        story.append(Spacer(1, 12))
-        
-        # Date
-        current_date = datetime.now().strftime("%B %d, %Y")
-        story.append(Paragraph(f"Generated on: {current_date}", self.styles['Normal']))
         story.append(Spacer(1, 20))
         
         # Executive Summary
         story.append(Paragraph("Executive Summary", self.styles['SectionHeader']))
+        score = _score_value(analysis_data.get('score'))
         story.append(Paragraph(
             f"This report provides a comprehensive analysis of your trading portfolio performance. "
             f"Your AI-powered performance score is {analysis_data.get('score', 'N/A')}, indicating "
-            f"{'excellent' if float(analysis_data.get('score', 0)) > 7 else 'good' if float(analysis_data.get('score', 0)) > 5 else 'moderate'} trading performance.",
+            f"{'excellent' if score > 7 else 'good' if score > 5 else 'moderate'} trading performance.",
             self.styles['Normal']
         ))
         story.append(Spacer(1, 20))
@@ -137,23 +279,18 @@ class PDFReportGenerator:
         
         # Create charts
         charts_data = analysis_data.get('charts', {})
-        for chart_name, chart_data in charts_data.items():
-            if chart_data and len(chart_data) > 0:
-                chart_title = chart_name.replace('_', ' ').title()
-                image_base64 = self.create_chart_image(chart_data, chart_title)
-                
-                # Save temporary image
-                temp_image_path = f"temp_{chart_name}.png"
-                with open(temp_image_path, 'wb') as f:
-                    f.write(base64.b64decode(image_base64))
-                
-                # Add to PDF
-                img = Image(temp_image_path, width=6*inch, height=3.6*inch)
-                story.append(img)
-                story.append(Spacer(1, 12))
-                
-                # Clean up temp file
-                os.remove(temp_image_path)
+        chart_names = [chart_name for chart_name, chart_data in charts_data.items()
+                       if chart_data and len(chart_data) > 0]
+        charts = [(charts_data[chart_name], chart_name.replace('_', ' ').title()) for chart_name in chart_names]
+        if chart_mode == 'vector':
+            flowables = [vector_chart(*chart) for chart in charts]
+        else:
+            charts = [(_thin(data, RASTER_CHART_POINTS), title) for data, title in charts]
+            # Add to PDF straight from memory; BytesIO shares the bytes until written to
+            flowables = [Image(io.BytesIO(png), width=6*inch, height=3.6*inch) for png in render_charts(charts)]
+        for flowable in flowables:
+            story.append(flowable)
+            story.append(Spacer(1, 12))
         
         # AI Analysis
         if analysis_data.get('ai_analysis'):
@@ -201,7 +338,7 @@ class PDFReportGenerator:
         return recommendations
 
 # Usage example
-def create_pdf_report(analysis_data, output_path='portfolio_report.pdf'):
+def create_pdf_report(analysis_data, output_path='portfolio_report.pdf', chart_mode=None):
     """Convenience function to create PDF report"""
     generator = PDFReportGenerator()
-    return generator.generate_report(analysis_data, output_path)
+    return generator.generate_report(analysis_data, output_path, chart_mode)
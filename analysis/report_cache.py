@@ -0,0 +1,115 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from pathlib import Path
+from typing import Dict, Optional
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+def cache_dir() -> Path:
+    return Path(getattr(settings, 'REPORT_CACHE_DIR', Path(settings.BASE_DIR) / 'report_cache'))
+
+
+def report_key(analysis_data: Dict, report_type: str) -> str:
+    """
+    sha256 of the report input: the analysis_data payload, the report type and
+    the settings that change how a report of that type is drawn
+
+    A payload naming a stored analysis is keyed on its id and the two
+    responses alone; the id is already a content hash of the upload, so the
+    series need not be built, let alone serialized, to look a report up.
+    """
+    options = [getattr(settings, 'PDF_CHART_MODE', 'raster'),
+               getattr(settings, 'PDF_VECTOR_CHART_POINTS', 500)] if report_type == 'pdf' else []
+    if 'analysis_id' in analysis_data:
+        analysis_data = {key: analysis_data.get(key) for key in ('analysis_id', 'response1', 'response2')}
+    payload = json.dumps([analysis_data, report_type, options], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def get_report(key: str):
+    """
+    Cached report file opened for reading, or None
+
+    A hit refreshes the file's mtime, which is what eviction orders by. The
+    open file stays readable even if the entry is evicted meanwhile.
+    """
+    path = cache_dir() / key
+    try:
+        report = open(path, 'rb')
+    except FileNotFoundError:
+        return None
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    return report
+
+
+def store_report(key: str, report) -> Optional[Path]:
+    """
+    Copy a rewound report buffer into the cache and rewind it again
+
+    The copy is written under a temporary name and renamed into place, so a
+    reader never sees a partial file. Failures are logged and only cost the
+    cache entry.
+    """
+    max_bytes = getattr(settings, 'REPORT_CACHE_MAX_BYTES', 256 * 2**20)
+    if max_bytes <= 0:
+        return None
+    root = cache_dir()
+    staging = None
+    try:
+        root.mkdir(parents=True, exist_ok=True)
+        fd, staging = tempfile.mkstemp(prefix=f'.{key}-', dir=root)
+        with os.fdopen(fd, 'wb') as cached:
+            while chunk := report.read(1 << 20):
+                cached.write(chunk)
+        os.replace(staging, root / key)
+    except OSError as e:
+        logger.warning("Report cache store failed: %s", e)
+        if staging is not None and os.path.exists(staging):
+            os.remove(staging)
+        return None
+    finally:
+        report.seek(0)
+    evict(max_bytes)
+    return root / key
+
+
+def evict(max_bytes: int = None) -> int:
+    """
+    Delete the least recently used reports until the cache fits in ``max_bytes``
+
+    Returns:
+        Number of reports deleted
+    """
+    if max_bytes is None:
+        max_bytes = getattr(settings, 'REPORT_CACHE_MAX_BYTES', 256 * 2**20)
+    entries = []
+    try:
+        with os.scandir(cache_dir()) as scan:
+            for entry in scan:
+                if entry.is_file() and not entry.name.startswith('.'):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+    except FileNotFoundError:
+        return 0
+
+    total = sum(size for _, size, _ in entries)
+    deleted = 0
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        deleted += 1
+    return deleted
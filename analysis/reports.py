@@ -0,0 +1,58 @@
+from tempfile import SpooledTemporaryFile
+from typing import Dict
+
+from django.conf import settings
+
+from .dashboard import resolve_analysis_data
+from .excel_export import create_excel_report
+from .pdf_generator import create_pdf_report
+from .report_cache import get_report, report_key, store_report
+
+# Report type -> (content type, attachment file name)
+REPORT_FORMATS = {
+    'pdf': ('application/pdf', 'portfolio_analysis_report.pdf'),
+    'excel': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'portfolio_analysis.xlsx'),
+}
+
+
+def render_report(analysis_data: Dict, report_type: str = 'pdf'):
+    """
+    A report as a readable file, from the report cache or freshly built
+
+    An identical payload and report type is served from the on-disk report
+    cache without regenerating. Otherwise the report is built into a buffer of
+    its own and copied into the cache. ``analysis_data`` may instead name a
+    stored analysis ({'analysis_id', 'response1', 'response2'}); its series
+    are only loaded on a cache miss. Reports up to
+    settings.REPORT_SPOOL_MAX_BYTES stay in memory; larger ones roll over to
+    an anonymous temporary file, so concurrent reports never share a path.
+
+    Returns:
+        A file positioned at the start; the caller closes it
+
+    Raises:
+        ValueError for an unsupported report type
+        AnalysisNotFound for an unknown analysis id that has no cached report
+    """
+    report_type = report_type.lower()
+    if report_type not in REPORT_FORMATS:
+        raise ValueError(f"Unsupported report type: {report_type}")
+
+    key = report_key(analysis_data, report_type)
+    cached = get_report(key)
+    if cached is not None:
+        return cached
+
+    analysis_data = resolve_analysis_data(analysis_data)
+    buffer = SpooledTemporaryFile(max_size=getattr(settings, 'REPORT_SPOOL_MAX_BYTES', 16 * 2**20))
+    try:
+        if report_type == 'pdf':
+            create_pdf_report(analysis_data, buffer)
+        else:
+            create_excel_report(analysis_data, buffer)
+    except BaseException:
+        buffer.close()
+        raise
+    buffer.seek(0)
+    store_report(key, buffer)
+    return buffer
@@ -0,0 +1,57 @@
+import hashlib
+import threading
+from typing import Dict, Optional
+
+from .analysis_store import load_analysis, save_analysis
+
+_stats_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0}
+
+
+def upload_key(uploaded_file, market_returns: float, risk_free_rate: float) -> str:
+    """
+    Content address of an upload: sha256 of its bytes plus the analysis parameters
+
+    The hex digest doubles as the analysis id. The file is hashed chunk by
+    chunk and rewound afterwards so it can still be parsed.
+    """
+    digest = hashlib.sha256()
+    for chunk in uploaded_file.chunks():
+        digest.update(chunk)
+    uploaded_file.seek(0)
+    digest.update(f'|{market_returns!r}|{risk_free_rate!r}'.encode())
+    return digest.hexdigest()
+
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def get_analysis(analysis_id: str, count: bool = True) -> Optional[Dict]:
+    """Stored analysis record for an id, or None; ``count`` updates the hit/miss counters"""
+    record = load_analysis(analysis_id)
+    if count:
+        _count('misses' if record is None else 'hits')
+    return record
+
+
+def store_analysis(analysis_id: str, record: Dict, market_returns: float, risk_free_rate: float):
+    save_analysis(analysis_id, record, market_returns, risk_free_rate)
+
+
+def cache_stats() -> Dict:
+    """Hit/miss counters of this process"""
+    with _stats_lock:
+        hits, misses = _stats['hits'], _stats['misses']
+    lookups = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': hits / lookups if lookups else 0.0,
+    }
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.update(hits=0, misses=0)
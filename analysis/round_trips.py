@@ -0,0 +1,313 @@
+import numpy as np
+import pandas as pd
+from typing import Dict
+
+TRADE_COLUMNS = ['stock', 'buy_index', 'sell_index', 'side', 'entry_time', 'exit_time',
+                 'quantity', 'entry_price', 'exit_price', 'pnl', 'return']
+
+# Predecessors _last_below checks directly before falling back to its segment tree
+NEAR_PREDECESSORS = 4
+
+
+def _factorize(column: pd.Series):
+    """Integer codes and labels of a symbol-like column, reusing categorical codes"""
+    if isinstance(column.dtype, pd.CategoricalDtype) and not column.isna().any():
+        return column.cat.codes.to_numpy(), column.cat.categories
+    return pd.factorize(column, sort=True, use_na_sentinel=False)
+
+
+def _sorted_fills(df: pd.DataFrame):
+    """Fill arrays sorted by (stock, datetime) with +1 for buys and -1 for sells"""
+    codes, symbols = _factorize(df['stock'])
+    times = pd.to_datetime(df['datetime']).to_numpy(dtype='datetime64[ns]')
+    order = np.lexsort((times.view(np.int64), codes))
+
+    # Normalise the handful of distinct order types rather than every row
+    type_codes, order_types = _factorize(df['ordertype'])
+    is_buy_type = np.array([str(value).strip().lower() == 'buy' for value in order_types], dtype=bool)
+    side = np.where(is_buy_type[type_codes], 1, -1)
+    return {
+        'order': order,
+        'code': codes[order],
+        'symbols': symbols,
+        'time': times[order],
+        'side': side[order],
+        'quantity': df['quantity'].to_numpy(dtype=np.int64)[order],
+        'price': df['price'].to_numpy(dtype=np.float64)[order],
+    }
+
+
+def _segment_starts(code):
+    is_start = np.ones(len(code), dtype=bool)
+    is_start[1:] = code[1:] != code[:-1]
+    return is_start
+
+
+def _match_fifo(fills):
+    """
+    FIFO lots as (buy position, sell position, quantity) in the sorted arrays
+
+    Under FIFO the k-th unit bought of a symbol always closes against the k-th
+    unit sold, whichever came first, so lots are the overlaps of the buys'
+    and sells' cumulative-quantity intervals. Each symbol gets a disjoint key
+    range so all symbols are matched with one sort and two searchsorted calls.
+    """
+    code, side, quantity = fills['code'], fills['side'], fills['quantity']
+    is_start = _segment_starts(code)
+    segment = np.cumsum(is_start) - 1
+
+    is_buy = side > 0
+    if is_buy.all() or not is_buy.any():
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty
+
+    bought = np.where(is_buy, quantity, 0)
+    sold = np.where(is_buy, 0, quantity)
+    total_bought = np.add.reduceat(bought, np.flatnonzero(is_start))
+    total_sold = np.add.reduceat(sold, np.flatnonzero(is_start))
+    span = np.maximum(total_bought, total_sold)
+    base = (np.cumsum(span) - span)[segment]
+
+    def _intervals(mask, amount):
+        running = np.cumsum(amount)
+        running -= (running - amount)[is_start][segment]
+        positions = np.flatnonzero(mask)
+        end = (base + running)[positions]
+        return positions, end - quantity[positions], end
+
+    buy_pos, buy_start, buy_end = _intervals(is_buy, bought)
+    sell_pos, sell_start, sell_end = _intervals(~is_buy, sold)
+
+    # Every interval starts where the previous one of its symbol ended, so the
+    # distinct edges are the symbol bases plus all interval ends
+    edges = np.sort(np.concatenate([base[is_start], buy_end, sell_end]))
+    edges = edges[np.append(True, edges[1:] != edges[:-1])]
+    lo, hi = edges[:-1], edges[1:]
+    b = np.minimum(np.searchsorted(buy_end, lo, side='right'), len(buy_end) - 1)
+    s = np.minimum(np.searchsorted(sell_end, lo, side='right'), len(sell_end) - 1)
+    matched = (buy_start[b] <= lo) & (lo < buy_end[b]) & (sell_start[s] <= lo) & (lo < sell_end[s])
+
+    return buy_pos[b[matched]], sell_pos[s[matched]], (hi - lo)[matched]
+
+
+def _last_below(values, position, bound):
+    """
+    For each query, the last index before ``position`` whose value is below ``bound``, -1 if none
+
+    Queries not settled by their nearest few predecessors are answered all at
+    once on a min segment tree: each climbs to the nearest block on its left
+    holding a smaller value, then descends into that block, so the work is
+    2*log2(n) array steps whatever the data.
+    """
+    result = np.full(len(position), -1, dtype=np.int64)
+
+    # Most answers are among the nearest few predecessors
+    query = np.flatnonzero(position > 0)
+    for step in range(1, NEAR_PREDECESSORS + 1):
+        earlier = position[query] - step
+        hit = values[earlier] < bound[query]
+        result[query[hit]] = earlier[hit]
+        query = query[~hit & (earlier > 0)]
+    if not len(query):
+        return result
+
+    n = len(values)
+    size = 1 << max(1, (n - 1).bit_length())
+    tree = np.full(2 * size, np.iinfo(np.int64).max, dtype=np.int64)
+    tree[size:size + n] = values
+    level = size
+    while level > 1:
+        level //= 2
+        tree[level:2 * level] = np.minimum(tree[2 * level:4 * level:2], tree[2 * level + 1:4 * level:2])
+
+    # Climb: a right child whose left sibling holds a smaller value has found its block
+    node, limit = position[query] + size, bound[query]
+    found = []
+    while len(query):
+        hit = (node & 1).astype(bool) & (tree[node - 1] < limit)
+        found.append((query[hit], node[hit] - 1, limit[hit]))
+        climb = ~hit & (node > 3)
+        query, node, limit = query[climb], node[climb] // 2, limit[climb]
+
+    # Descend to the rightmost smaller leaf of the block
+    query, node, limit = (np.concatenate(parts) for parts in zip(*found))
+    while len(query):
+        leaf = node >= size
+        result[query[leaf]] = node[leaf] - size
+        query, node, limit = query[~leaf], node[~leaf], limit[~leaf]
+        right = 2 * node + 1
+        node = np.where(tree[right] < limit, right, right - 1)
+    return result
+
+
+def _lifo_side(start, end, is_start, segment):
+    """
+    LIFO lots of one side of the book as (opening fill, closing fill, quantity)
+
+    ``start``/``end`` are each fill's open quantity on this side (long or
+    short, never negative) before and after it. The unit at level j is
+    closed by a fill moving below j and was opened by the last fill before
+    it that started at or below j. Those openers form a tree, each fill's
+    parent being the previous fill that started lower (a sentinel below zero
+    starts every symbol). The lots of a closing fill are its ancestors down
+    to the first one starting at or below where it ends, and the ancestor at
+    depth d is the last node before it of that depth.
+    """
+    n_fills = len(start)
+    closing = np.flatnonzero(end < start)
+    if not len(closing):
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty
+    nodes = n_fills + int(is_start.sum())
+    fill_node = np.arange(n_fills) + segment + 1
+    level = np.full(nodes, -1, dtype=np.int64)
+    level[fill_node] = start
+    node_fill = np.full(nodes, -1, dtype=np.int64)
+    node_fill[fill_node] = np.arange(n_fills)
+
+    # Depth in the tree is the size of the open-lot stack: the running count of
+    # nodes pushed less those popped, each by the first later node starting at
+    # or below it (found right to left)
+    every = np.arange(nodes)
+    popped_by = nodes - 1 - _last_below(level[::-1], nodes - 1 - every, level + 1)
+    depth = np.cumsum(1 - np.bincount(popped_by, minlength=nodes + 1)[:nodes]) - 1
+
+    # The deepest ancestor starting at or below the closing level is simply the
+    # last node before that does; the sentinel at depth 0 always qualifies
+    node, floor = fill_node[closing], end[closing]
+    deepest = _last_below(level, node, floor + 1)
+    counts = depth[node] - depth[deepest]
+
+    # Chain of each closing fill, top first: itself, its ancestors, then the deepest
+    length = counts + 1
+    offsets = np.cumsum(length) - length
+    chain = np.empty(int(length.sum()), dtype=np.int64)
+    chain[offsets] = node
+    chain[offsets + counts] = deepest
+    inner = np.maximum(counts - 1, 0)
+    if inner.any():
+        group = np.repeat(np.arange(len(closing)), inner)
+        rank = np.arange(len(group)) - np.repeat(np.cumsum(inner) - inner, inner)
+        d = depth[node][group] - 1 - rank
+        by_depth = np.sort(depth * nodes + every)
+        found = np.searchsorted(by_depth, d * nodes + node[group], side='right') - 1
+        chain[offsets[group] + 1 + rank] = by_depth[found] - d * nodes
+
+    # One lot per link of the chain, most recently opened first
+    link = np.ones(len(chain), dtype=bool)
+    link[offsets + counts] = False
+    link = np.flatnonzero(link)
+    upper, lower = chain[link], chain[link + 1]
+    lot = np.repeat(np.arange(len(closing)), counts)
+    quantity = level[upper] - np.maximum(level[lower], floor[lot])
+    return node_fill[lower], closing[lot], quantity
+
+
+def _match_lifo(fills):
+    """
+    LIFO lots as (buy position, sell position, quantity) in the sorted arrays
+
+    The symbol's net position before and after each fill, from a cumulative
+    sum, splits into a long and a short side; buys open and sells close the
+    long side, and the other way round on the short side. See _lifo_side.
+    """
+    code, side, quantity = fills['code'], fills['side'], fills['quantity']
+    if not len(code):
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty
+    is_start = _segment_starts(code)
+    segment = np.cumsum(is_start) - 1
+
+    flow = side * quantity
+    after = np.cumsum(flow)
+    after -= (after - flow)[is_start][segment]
+    before = after - flow
+
+    long_open, long_close, long_lots = _lifo_side(
+        np.maximum(before, 0), np.maximum(after, 0), is_start, segment)
+    short_open, short_close, short_lots = _lifo_side(
+        np.maximum(-before, 0), np.maximum(-after, 0), is_start, segment)
+
+    # Lots in the order the fills close them
+    closing = np.concatenate([long_close, short_close])
+    order = np.argsort(closing, kind='stable')
+    buys = np.concatenate([long_open, short_close])[order]
+    sells = np.concatenate([long_close, short_open])[order]
+    return buys, sells, np.concatenate([long_lots, short_lots])[order]
+
+
+MATCHERS = {
+    'fifo': _match_fifo,
+    'lifo': _match_lifo,
+}
+
+
+def match_round_trips(df: pd.DataFrame, method: str = 'fifo') -> pd.DataFrame:
+    """
+    Pair buys with sells per stock into closed round trips
+
+    Args:
+        df: Blotter with datetime, stock, ordertype (Buy/Sell), price and quantity
+        method: 'fifo' or 'lifo' lot matching; partial fills split into several lots
+
+    Returns:
+        One row per matched lot with entry/exit times and prices, realized P&L
+        and return, ordered by exit time. ``side`` is 'short' when the sell
+        opened the position.
+        Quantity left open at the end of the blotter is not reported.
+    """
+    if method not in MATCHERS:
+        raise ValueError(f"Unsupported matching method: {method}")
+
+    fills = _sorted_fills(df)
+    buy, sell, quantity = MATCHERS[method](fills)
+
+    time, price = fills['time'], fills['price']
+    is_long = time[buy] <= time[sell]
+    entry_price = np.where(is_long, price[buy], price[sell])
+    exit_price = np.where(is_long, price[sell], price[buy])
+    pnl = (price[sell] - price[buy]) * quantity
+
+    trades = pd.DataFrame({
+        'stock': pd.Categorical.from_codes(fills['code'][buy], fills['symbols']),
+        'buy_index': df.index.to_numpy()[fills['order'][buy]],
+        'sell_index': df.index.to_numpy()[fills['order'][sell]],
+        'side': pd.Categorical.from_codes(np.where(is_long, 0, 1), ['long', 'short']),
+        'entry_time': np.where(is_long, time[buy], time[sell]),
+        'exit_time': np.where(is_long, time[sell], time[buy]),
+        'quantity': quantity,
+        'entry_price': entry_price,
+        'exit_price': exit_price,
+        'pnl': pnl,
+        'return': pnl / (entry_price * quantity),
+    }, columns=TRADE_COLUMNS)
+    exit_order = np.argsort(trades['exit_time'].to_numpy().view(np.int64), kind='stable')
+    return trades.take(exit_order).reset_index(drop=True)
+
+
+def round_trip_stats(trades: pd.DataFrame) -> Dict:
+    """Win/loss statistics over closed round trips"""
+    pnl = trades['pnl'].to_numpy(dtype=np.float64)
+    wins = pnl[pnl > 0]
+    losses = pnl[pnl < 0]
+
+    gross_profit = float(wins.sum())
+    gross_loss = float(-losses.sum())
+    average_win = float(wins.mean()) if len(wins) else 0.0
+    average_loss = float(-losses.mean()) if len(losses) else 0.0
+
+    return {
+        'trades': int(len(pnl)),
+        'winning_trades': int(len(wins)),
+        'losing_trades': int(len(losses)),
+        'win_rate': len(wins) / len(pnl) if len(pnl) else np.nan,
+        'gross_profit': gross_profit,
+        'gross_loss': gross_loss,
+        'net_pnl': float(pnl.sum()),
+        'profit_factor': gross_profit / gross_loss if gross_loss else np.nan,
+        'average_win': average_win,
+        'average_loss': average_loss,
+        'win_loss_ratio': average_win / average_loss if average_loss else np.nan,
+        'largest_win': float(wins.max()) if len(wins) else 0.0,
+        'largest_loss': float(-losses.min()) if len(losses) else 0.0,
+    }
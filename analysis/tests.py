@@ -1,3 +1,1080 @@
-from django.test import TestCase
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+import zipfile
+from datetime import timedelta
+from io import BytesIO, StringIO
+from collections import deque
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import pandas as pd
+from django.core import mail
+from django.core.cache.backends.db import DatabaseCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.mail.backends import locmem
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.template.loader import render_to_string
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from .analysis_store import evict as evict_analyses, load_analysis, save_analysis
+from .dashboard import analysis_context, build_analysis, resolve_analysis_data
+from .downsample import chart_indices, lttb, minmax
+from .email_service import EmailReportService
+from .excel_export import ExcelReportGenerator
+from .final_analysis import (
+    CHART_SERIES, calculate_additional_metrics, calculate_cumulative_returns, calculate_max_drawdown,
+    calculate_win_loss_ratio, calculation, compact_metrics, compute_metrics, price_returns,
+)
+from .grouped_analysis import grouped_metrics
+from .ingest import read_trades
+from .llm import FALLBACK_ANALYSIS, FALLBACK_SCORE, Commentary, commentary_status, start_commentary
+from .llm_cache import cached_complete, evict
+from .jobs import claim, enqueue, poll_jobs, start_poller
+from .models import Analysis, LLMResponse, ReportJob
+from .online_metrics import OnlineMetrics
+from .pdf_generator import create_pdf_report, render_chart, render_charts, vector_chart
+from .report_cache import evict as evict_reports, get_report, store_report
+from .reports import render_report
+from .result_cache import reset_stats
+from .round_trips import match_round_trips, round_trip_stats
+
+SAMPLE_DATA = Path(__file__).resolve().parent / 'sample_data.csv'
+
+# Every cache in process memory, for tests without a database
+LOCAL_CACHES = {alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': alias}
+                for alias in ('default', 'commentary')}
+
+
+def reference_calculation(df, market_returns=0.05, risk_free_rate=0.0):
+    """The per-row pandas implementation calculation() used to run, kept as the oracle"""
+    df['datetime'] = pd.to_datetime(df['datetime'])
+    df['returns'] = df['price'].pct_change()
+    df['cumulative_returns'] = (1 + df['returns']).cumprod()
+    df['cumulative_returns'] = df['cumulative_returns'].ffill()
+    df['daily_drawdown'] = df['cumulative_returns'] / df['cumulative_returns'].cummax() - 1
+    df['max_drawdown'] = df['daily_drawdown'].cummin()
+    df['gain'] = df['returns'].apply(lambda x: x if x > 0 else 0)
+    df['loss'] = df['returns'].apply(lambda x: -x if x < 0 else 0)
+    df['win_loss_ratio'] = df['gain'].cumsum() / abs(df['loss'].cumsum())
+    df['sharpe_ratio'] = (df['returns'] - risk_free_rate) / df['returns'].std()
+    df['downside_returns'] = df['returns'].apply(lambda x: x if x < 0 else 0)
+    downside_volatility = df['downside_returns'].std()
+    df['sortino_ratio'] = (df['returns'] - risk_free_rate) / downside_volatility
+    df['standard_deviation'] = df['returns'].std()
+    df['excess_returns'] = df['returns'] - market_returns
+    df['information_ratio'] = df['excess_returns'].mean() / df['excess_returns'].std()
+    df['daily_drawdown'] = df['cumulative_returns'] / df['cumulative_returns'].cummax() - 1
+    df['max_drawdown'] = df['daily_drawdown'].cummin()
+    df['calmar_ratio'] = df['returns'].mean() / abs(df['max_drawdown'].min())
+    return df
+
+
+def random_walk(n, seed=7):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'datetime': pd.date_range('2023-06-01', periods=n, freq='min'),
+        'price': 1000 * np.cumprod(1 + rng.normal(0, 0.01, n)),
+    })
+
+
+class VectorizedMetricsTests(SimpleTestCase):
+    def assert_matches_reference(self, df, **params):
+        expected = reference_calculation(df.copy(), **params)
+        actual = calculation(df.copy(), **params)
+        pd.testing.assert_frame_equal(actual, expected, check_exact=False, rtol=1e-9, atol=1e-12)
+
+    def test_sample_blotter(self):
+        self.assert_matches_reference(pd.read_csv(SAMPLE_DATA))
+
+    def test_random_walk_with_custom_rates(self):
+        self.assert_matches_reference(random_walk(5000), market_returns=0.01, risk_free_rate=0.0002)
+
+    def test_rising_prices_give_infinite_win_loss(self):
+        df = pd.DataFrame({'datetime': pd.date_range('2023-06-01', periods=6, freq='D'),
+                           'price': [10.0, 10.0, 11.0, 12.0, 11.5, 13.0]})
+        self.assert_matches_reference(df)
+
+    def test_step_functions_match_calculation(self):
+        df = random_walk(500)
+        stepped = df.copy()
+        stepped['datetime'] = pd.to_datetime(stepped['datetime'])
+        stepped = calculate_cumulative_returns(stepped)
+        stepped = calculate_max_drawdown(stepped)
+        stepped = calculate_win_loss_ratio(stepped)
+        stepped = calculate_additional_metrics(stepped, 0.05, 0.0)
+        pd.testing.assert_frame_equal(stepped, reference_calculation(df.copy()),
+                                      check_exact=False, rtol=1e-9, atol=1e-12)
+
+
+class CompactMetricsTests(SimpleTestCase):
+    def test_series_and_summary_match_calculation(self):
+        df = calculation(pd.read_csv(SAMPLE_DATA))
+        series, summary = compact_metrics(price_returns(df['price']))
+
+        for name in CHART_SERIES:
+            np.testing.assert_allclose(series[name], df[name], rtol=1e-9)
+        for name in ('standard_deviation', 'information_ratio', 'calmar_ratio'):
+            self.assertAlmostEqual(summary[name], df[name].iloc[0], places=12)
+        self.assertAlmostEqual(summary['max_drawdown'], df['max_drawdown'].min(), places=12)
+        self.assertEqual(summary['observations'], len(df) - 1)
+
+    def test_analysis_context_matches_dropna_frame(self):
+        raw = pd.read_csv(SAMPLE_DATA, parse_dates=['datetime'])
+        context = analysis_context(raw.copy(), '%m-%d ')
+        df = calculation(raw.copy()).dropna()
+
+        self.assertEqual(context['datetime'], df['datetime'].dt.strftime('%m-%d ').tolist())
+        np.testing.assert_allclose(context['win_loss'], df['win_loss_ratio'], rtol=1e-9)
+        np.testing.assert_allclose(context['calmar_ratio'], df['calmar_ratio'], rtol=1e-9)
+        expected_last = {key: round(value, 2) for key, value in df.iloc[-1].to_dict().items()
+                         if key != 'datetime' and type(value) != str}
+        self.assertEqual(context['last_value'], expected_last)
+
+
+class GroupedMetricsTests(SimpleTestCase):
+    def test_matches_calculation_per_stock(self):
+        raw = pd.read_csv(SAMPLE_DATA, parse_dates=['datetime'])
+        result = grouped_metrics(raw)
+
+        for stock, group in raw.groupby('stock'):
+            expected = calculation(group.copy())
+            actual = result['rows'].loc[group.index]
+            pd.testing.assert_frame_equal(actual, expected[actual.columns], check_exact=False, rtol=1e-9)
+
+            summary = result['instruments'].loc[stock]
+            self.assertEqual(summary['trades'], len(group))
+            self.assertAlmostEqual(summary['cumulative_returns'], expected['cumulative_returns'].iloc[-1])
+            self.assertAlmostEqual(summary['max_drawdown'], expected['max_drawdown'].min())
+            self.assertAlmostEqual(summary['calmar_ratio'], expected['calmar_ratio'].iloc[0])
+
+    def test_portfolio_summary_uses_per_stock_returns(self):
+        raw = pd.read_csv(SAMPLE_DATA, parse_dates=['datetime'])
+        result = grouped_metrics(raw)
+
+        _, expected = compact_metrics(raw.groupby('stock')['price'].pct_change().to_numpy())
+        self.assertEqual(result['portfolio'].keys(), expected.keys())
+        for name, value in expected.items():
+            self.assertAlmostEqual(result['portfolio'][name], value, places=12)
+
+
+def reference_lots(df, lifo=False):
+    """Straightforward per-position queue matcher used to check the array-backed one"""
+    lots = []
+    for _, group in df.groupby('stock'):
+        open_lots, open_side = deque(), 0
+        for index, row in group.sort_values('datetime', kind='stable').iterrows():
+            side = 1 if row['ordertype'] == 'Buy' else -1
+            remaining = row['quantity']
+            while remaining and open_lots and open_side != side:
+                lot = open_lots[-1] if lifo else open_lots[0]
+                take = min(remaining, lot[1])
+                lots.append((index, lot[0], take) if side > 0 else (lot[0], index, take))
+                remaining -= take
+                lot[1] -= take
+                if not lot[1]:
+                    open_lots.pop() if lifo else open_lots.popleft()
+            if remaining:
+                if not open_lots:
+                    open_side = side
+                open_lots.append([index, remaining])
+    return sorted(lots)
+
+
+class RoundTripTests(SimpleTestCase):
+    def random_blotter(self, n=2000, seed=3):
+        rng = np.random.default_rng(seed)
+        return pd.DataFrame({
+            'datetime': pd.date_range('2023-06-01', periods=n, freq='min'),
+            'stock': rng.choice(['INFY', 'RELIANCE', 'TCS'], n),
+            'ordertype': rng.choice(['Buy', 'Sell'], n),
+            'price': rng.uniform(1000, 2000, n).round(2),
+            'quantity': rng.integers(0, 50, n),
+        })
+
+    def assert_matches_reference(self, method):
+        df = self.random_blotter()
+        trades = match_round_trips(df, method)
+        actual = sorted(zip(trades['buy_index'].tolist(), trades['sell_index'].tolist(),
+                            trades['quantity'].tolist()))
+        self.assertEqual(actual, reference_lots(df, lifo=method == 'lifo'))
+
+    def test_fifo_matches_reference(self):
+        self.assert_matches_reference('fifo')
+
+    def test_lifo_matches_reference(self):
+        self.assert_matches_reference('lifo')
+
+    def test_lifo_deep_stacks_match_reference(self):
+        # Scale in one share at a time, close most of it at once, flip short and back
+        quantity = [1] * 300 + [250, 40, 400, 30, 200]
+        ordertype = ['Buy'] * 300 + ['Sell', 'Buy', 'Sell', 'Sell', 'Buy']
+        df = pd.DataFrame({
+            'datetime': pd.date_range('2023-06-01', periods=len(quantity), freq='min'),
+            'stock': 'TCS',
+            'ordertype': ordertype,
+            'price': np.linspace(100, 130, len(quantity)),
+            'quantity': quantity,
+        })
+        trades = match_round_trips(df, 'lifo')
+        actual = sorted(zip(trades['buy_index'].tolist(), trades['sell_index'].tolist(),
+                            trades['quantity'].tolist()))
+        self.assertEqual(actual, reference_lots(df, lifo=True))
+        self.assertEqual(trades['quantity'].sum(), 250 + 90 + 200)
+
+    def test_partial_fills_and_stats(self):
+        df = pd.DataFrame({
+            'datetime': pd.date_range('2023-06-01', periods=4, freq='h'),
+            'stock': ['TCS'] * 4,
+            'ordertype': ['Buy', 'Buy', 'Sell', 'Sell'],
+            'price': [100.0, 110.0, 120.0, 90.0],
+            'quantity': [10, 10, 15, 5],
+        })
+        fifo = match_round_trips(df, 'fifo')
+        self.assertEqual(fifo[['buy_index', 'sell_index', 'quantity']].values.tolist(),
+                         [[0, 2, 10], [1, 2, 5], [1, 3, 5]])
+        self.assertEqual(fifo['pnl'].tolist(), [200.0, 50.0, -100.0])
+
+        lifo = match_round_trips(df, 'lifo')
+        self.assertEqual(lifo[['buy_index', 'sell_index', 'quantity']].values.tolist(),
+                         [[1, 2, 10], [0, 2, 5], [0, 3, 5]])
+
+        stats = round_trip_stats(fifo)
+        self.assertEqual((stats['trades'], stats['winning_trades'], stats['losing_trades']), (3, 2, 1))
+        self.assertEqual(stats['net_pnl'], 150.0)
+        self.assertEqual(stats['profit_factor'], 2.5)
+
+
+class OnlineMetricsTests(SimpleTestCase):
+    def test_appending_batches_matches_full_recompute(self):
+        price = pd.read_csv(SAMPLE_DATA)['price'].to_numpy()
+        full = compute_metrics(price)
+        _, full_summary = compact_metrics(full['returns'])
+
+        metrics = OnlineMetrics()
+        batches = []
+        for chunk in np.array_split(price, [1, 2, 40, 300]):
+            # Round-trip the state through JSON between appends, as a request would
+            metrics = OnlineMetrics.from_dict(json.loads(json.dumps(metrics.to_dict())))
+            batches.append(metrics.update(chunk))
+
+        for name in ('returns', 'cumulative_returns', 'daily_drawdown', 'max_drawdown', 'win_loss_ratio'):
+            np.testing.assert_array_equal(np.concatenate([batch[name] for batch in batches]), full[name])
+        np.testing.assert_allclose(batches[-1]['sharpe_ratio'], full['sharpe_ratio'][300:], rtol=1e-9)
+        np.testing.assert_allclose(batches[-1]['sortino_ratio'], full['sortino_ratio'][300:], rtol=1e-9)
+
+        summary = metrics.summary()
+        self.assertEqual(summary.keys(), full_summary.keys())
+        for name, value in full_summary.items():
+            self.assertAlmostEqual(summary[name], value, places=10, msg=name)
+
+
+def wait_for_job(client, job_id, timeout=10):
+    """Poll the job status endpoint until the job is done or failed"""
+    deadline = time.monotonic() + timeout
+    while True:
+        state = client.get(f'/jobs/{job_id}').json()
+        if state['status'] in ('done', 'failed') or time.monotonic() > deadline:
+            return state
+        time.sleep(0.02)
+
+
+class StoreTestCase(TransactionTestCase):
+    """Analyses stored in a scratch directory; commentary threads kept off the database"""
+
+    def setUp(self):
+        store = tempfile.TemporaryDirectory()
+        self.addCleanup(store.cleanup)
+        self.store_dir = Path(store.name)
+        store_settings = override_settings(ANALYSIS_STORE_DIR=self.store_dir / 'analyses',
+                                           REPORT_CACHE_DIR=self.store_dir / 'reports')
+        store_settings.enable()
+        self.addCleanup(store_settings.disable)
+        patcher = mock.patch('analysis.llm.cached_complete', uncached_complete)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+class ResultCacheTests(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        reset_stats()
+
+    def upload(self, **params):
+        csv_file = SimpleUploadedFile('trades.csv', SAMPLE_DATA.read_bytes(), content_type='text/csv')
+        return self.client.post('/', {'csv_file': csv_file, **params})
+
+    def test_repeat_upload_is_served_from_cache(self):
+        first = self.upload()
+        second = self.upload()
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.context['analysis_id'], first.context['analysis_id'])
+        self.assertEqual(second.context['last_value'], first.context['last_value'])
+
+        # Different parameters are a different analysis
+        third = self.upload(risk_free_rate='0.001')
+        self.assertNotEqual(third.context['analysis_id'], first.context['analysis_id'])
+
+        stats = self.client.get('/cache/stats').json()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 2))
+
+    def test_malformed_upload_is_rejected(self):
+        csv_file = SimpleUploadedFile('trades.csv', b'datetime,stock,quantity\n2023-01-02,AAA,10\n', content_type='text/csv')
+        response = self.client.post('/', {'csv_file': csv_file})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(b'missing columns', response.content)
+        self.assertEqual(Analysis.objects.count(), 0)
+
+    def test_too_short_upload_is_rejected(self):
+        for rows in (1, 2):
+            trades = random_walk(rows).to_csv(index=False).encode()
+            csv_file = SimpleUploadedFile('short.csv', trades, content_type='text/csv')
+            response = self.client.post('/', {'csv_file': csv_file})
+            self.assertEqual(response.status_code, 400)
+            self.assertIn(b'need at least 3 priced rows', response.content)
+        self.assertEqual(Analysis.objects.count(), 0)
+
+    def test_commentary_state_is_kept_in_the_database(self):
+        patch, stored = signal_stored(DatabaseCache)
+        with patch:
+            job_id = self.upload().context['commentary_id']
+            self.assertTrue(stored.wait(timeout=5))
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT COUNT(*) FROM commentary_cache WHERE cache_key LIKE %s', [f'%{job_id}'])
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+
+class AnalysisApiTests(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        csv_file = SimpleUploadedFile('trades.csv', SAMPLE_DATA.read_bytes(), content_type='text/csv')
+        self.analysis_id = self.client.post('/', {'csv_file': csv_file}).context['analysis_id']
+        self.expected = calculation(pd.read_csv(SAMPLE_DATA)).dropna()
+
+    def test_summary_and_etag(self):
+        url = f'/api/analysis/{self.analysis_id}'
+        response = self.client.get(url)
+        summary = response.json()
+        self.assertEqual(summary['rows'], len(self.expected))
+        self.assertIn('sharpe_ratio', summary['series'])
+        self.assertAlmostEqual(summary['summary']['calmar_ratio'], self.expected['calmar_ratio'].iloc[0])
+
+        # The portfolio aggregate takes returns within each symbol, not across the price column
+        portfolio = grouped_metrics(pd.read_csv(SAMPLE_DATA, parse_dates=['datetime']), include_rows=False)['portfolio']
+        self.assertAlmostEqual(summary['portfolio']['cumulative_returns'], portfolio['cumulative_returns'])
+        self.assertNotAlmostEqual(summary['portfolio']['cumulative_returns'], summary['summary']['cumulative_returns'])
+        self.assertIn(b'Portfolio (Returns Taken Per Instrument)', self.client.get('/analysis').content)
+
+        cached = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(self.client.get('/api/analysis/missing').status_code, 404)
+
+        # An evicted analysis is a 404 even to a client holding its ETag
+        evict_analyses(max_entries=0)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 404)
+
+    def test_series_pages_cover_the_full_series(self):
+        url = f'/api/analysis/{self.analysis_id}/series/sharpe_ratio'
+        values, offset = [], 0
+        while offset is not None:
+            page = self.client.get(url, {'offset': offset, 'limit': 100}).json()
+            values += page['values']
+            offset = page['next_offset']
+        np.testing.assert_allclose(values, self.expected['sharpe_ratio'], rtol=1e-9)
+
+        window = self.client.get(url, {'start': '2023-06-10', 'end': '2023-06-12 23:59', 'points': 10}).json()
+        self.assertLessEqual(len(window['values']), 10)
+        in_window = self.expected['datetime'].between('2023-06-10', '2023-06-12 23:59')
+        self.assertEqual(window['total'], int(in_window.sum()))
+        self.assertEqual(self.client.get(f'/api/analysis/{self.analysis_id}/series/nope').status_code, 404)
+
+    def test_series_windows_of_unsorted_blotters(self):
+        shuffled = pd.read_csv(SAMPLE_DATA).sample(frac=1, random_state=4)
+        csv_file = SimpleUploadedFile('shuffled.csv', shuffled.to_csv(index=False).encode(), content_type='text/csv')
+        analysis_id = self.client.post('/', {'csv_file': csv_file}).context['analysis_id']
+        url = f'/api/analysis/{analysis_id}/series/sharpe_ratio'
+
+        expected = calculation(shuffled.reset_index(drop=True)).dropna()
+        in_window = expected['datetime'].between('2023-06-10', '2023-06-12 23:59')
+        window = self.client.get(url, {'start': '2023-06-10', 'end': '2023-06-12 23:59'}).json()
+        self.assertEqual(window['total'], int(in_window.sum()))
+        np.testing.assert_allclose(window['values'], expected.loc[in_window, 'sharpe_ratio'], rtol=1e-9)
+
+        second = self.client.get(url, {'start': '2023-06-10', 'end': '2023-06-12 23:59', 'offset': 5, 'limit': 5})
+        self.assertEqual(second.json()['values'], window['values'][5:10])
+        self.assertEqual(self.client.get(url, {'limit': -1}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'offset': -1}).status_code, 400)
+
+    @override_settings(CHART_DOWNSAMPLING={'sharpe_ratio': {'method': 'lttb', 'points': 10}})
+    def test_export_by_analysis_id(self):
+        with mock.patch('analysis.reports.create_excel_report', side_effect=RuntimeError('stop')) as report:
+            self.client.post('/export/excel', json.dumps({'analysis_id': self.analysis_id, 'response1': 'text'}),
+                             content_type='application/json')
+        # Exports carry every row, whatever the dashboard charts are thinned to
+        payload = report.call_args.args[0]
+        self.assertEqual(len(payload['datetime']), len(self.expected))
+        np.testing.assert_allclose(payload['sharpe_ratio'], self.expected['sharpe_ratio'], rtol=1e-9)
+        self.assertEqual(payload['response1'], 'text')
+
+        missing = self.client.post('/export/excel', json.dumps({'analysis_id': 'missing'}),
+                                   content_type='application/json')
+        self.assertEqual(missing.status_code, 404)
+
+    def test_pdf_export_by_analysis_id_draws_the_charts(self):
+        body = json.dumps({'analysis_id': self.analysis_id, 'response1': 'Steady gains.', 'response2': '7.5'})
+        raster = self.client.post('/export/pdf', body, content_type='application/json')
+        self.assertEqual(raster.status_code, 200)
+        images = re.findall(rb'/FormXob\.(\w+)', b''.join(raster.streaming_content))
+        self.assertEqual(len(set(images)), 5)
+
+        with override_settings(PDF_CHART_MODE='vector'), \
+                mock.patch('analysis.pdf_generator.vector_chart', wraps=vector_chart) as draw:
+            vector = self.client.post('/export/pdf', body, content_type='application/json')
+            self.assertNotIn(b'/Subtype /Image', b''.join(vector.streaming_content))
+        self.assertEqual([call.args[1] for call in draw.call_args_list],
+                         ['Max Drawdown', 'Win Loss', 'Sortino Ratio', 'Sharpe Ratio', 'Cumulative Returns'])
+        self.assertEqual(len(draw.call_args_list[3].args[0]), len(self.expected))
+
+    def test_cached_exports_by_analysis_id_skip_the_payload(self):
+        body = json.dumps({'analysis_id': self.analysis_id, 'response1': 'text', 'response2': '6'})
+        with mock.patch('analysis.reports.resolve_analysis_data', wraps=resolve_analysis_data) as resolve:
+            first = b''.join(self.client.post('/export/excel', body, content_type='application/json').streaming_content)
+            second = b''.join(self.client.post('/export/excel', body, content_type='application/json').streaming_content)
+        self.assertEqual(resolve.call_count, 1)
+        self.assertEqual(first, second)
+        self.assertNotIn(b'Generated on', zipfile.ZipFile(BytesIO(first)).read('xl/worksheets/sheet1.xml'))
+
+    def test_excel_export_of_infinite_ratios(self):
+        # Price rises first: the win/loss ratio is infinite until the first loss
+        trades = random_walk(50)
+        trades.loc[0, 'price'] = trades['price'].iloc[1] * 0.99
+        csv_file = SimpleUploadedFile('rising.csv', trades.to_csv(index=False).encode(), content_type='text/csv')
+        analysis_id = self.client.post('/', {'csv_file': csv_file}).context['analysis_id']
+
+        response = self.client.post('/export/excel', json.dumps({'analysis_id': analysis_id}),
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        with zipfile.ZipFile(BytesIO(b''.join(response.streaming_content))) as workbook:
+            self.assertIn(b'#DIV/0!', workbook.read('xl/worksheets/sheet3.xml'))
+
+    def test_downloads_stream_from_memory(self):
+        for url, magic in (('/export/excel', b'PK'), ('/export/pdf', b'%PDF')):
+            response = self.client.post(url, json.dumps({'analysis_id': self.analysis_id}),
+                                        content_type='application/json')
+            self.assertTrue(response.streaming)
+            self.assertIn('attachment', response['Content-Disposition'])
+            self.assertTrue(b''.join(response.streaming_content).startswith(magic))
+        self.assertFalse(Path('portfolio_analysis.xlsx').exists())
+        self.assertFalse(Path('portfolio_report.pdf').exists())
+
+    @override_settings(EXPORT_PARQUET_ROW_GROUP_ROWS=100, EXPORT_ARROW_BATCH_ROWS=100)
+    def test_columnar_exports(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        base = f'/api/analysis/{self.analysis_id}'
+        parquet = self.client.get(f'{base}/export.parquet')
+        table = pq.read_table(BytesIO(b''.join(parquet.streaming_content)))
+        self.assertEqual(table.column_names[:3], ['datetime', 'max_drawdown', 'win_loss_ratio'])
+        np.testing.assert_allclose(table['sharpe_ratio'].to_numpy(), self.expected['sharpe_ratio'], rtol=1e-9)
+        self.assertGreater(pq.ParquetFile(BytesIO(b''.join(
+            self.client.get(f'{base}/export.parquet').streaming_content))).num_row_groups, 1)
+
+        arrow = self.client.get(f'{base}/export.arrows', {'columns': 'sharpe_ratio'})
+        stream = pa.ipc.open_stream(b''.join(arrow.streaming_content))
+        self.assertEqual(stream.schema.names, ['datetime', 'sharpe_ratio'])
+        self.assertEqual(stream.read_all().num_rows, len(self.expected))
+        self.assertIn(b'calmar_ratio', stream.schema.metadata[b'summary'])
+
+        self.assertEqual(self.client.get(f'{base}/export.arrows', {'columns': 'nope'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/analysis/missing/export.parquet').status_code, 404)
+
+    def test_email_attaches_the_report(self):
+        body = {'email': 'trader@example.com', 'report_type': 'excel',
+                'analysis_data': {'analysis_id': self.analysis_id}}
+        response = self.client.post('/send-email', json.dumps(body), content_type='application/json')
+        self.assertEqual(response.status_code, 202)
+        job_id = response.json()['job_id']
+        self.assertEqual(wait_for_job(self.client, job_id)['status'], 'done')
+        name, content, _ = mail.outbox[-1].attachments[0]
+        self.assertEqual(name, 'portfolio_analysis.xlsx')
+        self.assertTrue(content.startswith(b'PK'))
+
+        # The job carries the analysis id, not the series
+        self.assertEqual(ReportJob.objects.get(pk=job_id).payload['analysis_data'],
+                         {'analysis_id': self.analysis_id, 'response1': None, 'response2': None})
+        for report_type in (5, 'docx'):
+            body['report_type'] = report_type
+            response = self.client.post('/send-email', json.dumps(body), content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+
+
+class FlakyMail:
+    """deliver_report stand-in that fails a set number of times first"""
+
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = 0
+
+    def __call__(self, service, email, analysis_data, report_type='pdf', subject=None):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise ConnectionError('SMTP unavailable')
+
+
+@override_settings(REPORT_JOB_RETRY_DELAY=0.01)
+class ReportJobTests(StoreTestCase):
+    payload = {'email': 'trader@example.com', 'analysis_data': {'last_value': {}}, 'report_type': 'pdf'}
+
+    def test_failed_deliveries_are_retried(self):
+        flaky = FlakyMail(failures=1)
+        with mock.patch('analysis.email_service.EmailReportService.deliver_report', flaky):
+            state = wait_for_job(self.client, enqueue('email', self.payload))
+        self.assertEqual((state['status'], state['attempts'], state['error']), ('done', 2, None))
+
+        with mock.patch('analysis.email_service.EmailReportService.deliver_report', FlakyMail(failures=5)):
+            state = wait_for_job(self.client, enqueue('email', self.payload, max_attempts=2))
+        self.assertEqual((state['status'], state['attempts'], state['error']), ('failed', 2, 'SMTP unavailable'))
+        self.assertEqual(self.client.get('/jobs/unknown').status_code, 404)
+
+    @override_settings(REPORT_JOB_WORKERS=0)
+    def test_standalone_worker_drains_the_queue(self):
+        flaky = FlakyMail(failures=0)
+        job_ids = [enqueue('email', self.payload) for _ in range(3)]
+        self.assertEqual(ReportJob.objects.filter(status='queued').count(), 3)
+        with mock.patch('analysis.email_service.EmailReportService.deliver_report', flaky):
+            call_command('process_report_jobs', stdout=StringIO())
+        self.assertEqual(flaky.calls, 3)
+        self.assertEqual(set(ReportJob.objects.values_list('status', flat=True)), {'done'})
+        self.assertIsNone(claim(job_ids[0]))
+
+    @override_settings(REPORT_JOB_WORKERS=0)
+    def test_poll_runs_jobs_left_by_a_restart(self):
+        # Queued with no worker pool running, and one abandoned mid-run
+        queued, abandoned = enqueue('email', self.payload), enqueue('email', self.payload)
+        ReportJob.objects.filter(pk=abandoned).update(
+            status='running', attempts=1, updated_at=timezone.now() - timedelta(hours=1))
+        self.assertFalse(start_poller())
+
+        flaky = FlakyMail(failures=0)
+        with mock.patch('analysis.email_service.EmailReportService.deliver_report', flaky):
+            self.assertEqual(poll_jobs(), 2)
+        self.assertEqual(flaky.calls, 2)
+        self.assertEqual(ReportJob.objects.get(pk=queued).status, 'done')
+        self.assertEqual(ReportJob.objects.get(pk=abandoned).attempts, 2)
+
+    @override_settings(REPORT_JOB_WORKERS=0)
+    def test_poll_drains_past_a_lost_claim(self):
+        jobs = [enqueue('email', self.payload) for _ in range(2)]
+
+        # Another worker wins the first claim; the jobs still due are run anyway
+        attempts = []
+
+        def lose_first(job_id=None):
+            attempts.append(job_id)
+            return None if len(attempts) == 1 else claim(job_id)
+
+        with mock.patch('analysis.jobs.claim', side_effect=lose_first), \
+                mock.patch('analysis.email_service.EmailReportService.deliver_report', FlakyMail(failures=0)):
+            self.assertEqual(poll_jobs(), 2)
+        self.assertEqual(list(ReportJob.objects.filter(pk__in=jobs).values_list('status', flat=True)), ['done'] * 2)
+
+
+class CountingBackend(locmem.EmailBackend):
+    """locmem backend that counts opened connections and rejects one address"""
+    opened = 0
+    reject = 'bounce@example.com'
+
+    def open(self):
+        CountingBackend.opened += 1
+        return super().open()
+
+    def send_messages(self, messages):
+        if any(self.reject in message.to for message in messages):
+            raise ConnectionError('recipient refused')
+        return super().send_messages(messages)
+
+
+@override_settings(EMAIL_BACKEND='analysis.tests.CountingBackend',
+                   EMAIL_BULK_PARALLELISM=2, EMAIL_BULK_BATCH_SIZE=3)
+class BulkEmailTests(SimpleTestCase):
+    data = {'response2': '6', 'last_value': {'sharpe_ratio': 1.2}}
+
+    def setUp(self):
+        scratch = tempfile.TemporaryDirectory()
+        self.addCleanup(scratch.cleanup)
+        cache_settings = override_settings(REPORT_CACHE_DIR=Path(scratch.name))
+        cache_settings.enable()
+        self.addCleanup(cache_settings.disable)
+        CountingBackend.opened = 0
+
+    def test_report_is_rendered_once_and_connections_reused(self):
+        recipients = [f'trader{i}@example.com' for i in range(6)] + [CountingBackend.reject, 'trader0@example.com']
+        with mock.patch('analysis.reports.render_report', wraps=render_report) as render:
+            results = EmailReportService().send_bulk_reports(recipients, self.data, 'excel')
+
+        self.assertEqual(render.call_count, 1)
+        self.assertEqual(list(results), recipients[:7])
+        self.assertEqual([email for email, sent in results.items() if not sent], [CountingBackend.reject])
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), sorted(recipients[:6]))
+        # Two workers with 4 and 3 recipients in batches of 3, plus a reopen after the refusal
+        self.assertEqual(CountingBackend.opened, 4)
+        attachments = {id(message.attachments[0][1]) for message in mail.outbox}
+        self.assertEqual(len(attachments), 1)
+
+    def test_render_failure_fails_every_recipient(self):
+        with mock.patch('analysis.reports.render_report', side_effect=RuntimeError('no report')):
+            results = EmailReportService().send_bulk_reports(['a@example.com', 'b@example.com'], self.data)
+        self.assertEqual(results, {'a@example.com': False, 'b@example.com': False})
+        self.assertEqual(mail.outbox, [])
+
+
+class AnalysisStoreTests(StoreTestCase):
+    def test_round_trip_memory_maps_the_series(self):
+        df = random_walk(500)
+        df['price'] = np.linspace(100, 200, 500)  # never loses: infinite win/loss ratio
+        record = build_analysis(df, '%m-%d ')
+        save_analysis('rising', record, 0.05, 0.0)
+
+        stored = load_analysis('rising')
+        self.assertIsInstance(stored['datetime'], np.memmap)
+        self.assertIsInstance(stored['series']['sharpe_ratio'], np.memmap)
+        np.testing.assert_array_equal(stored['datetime'], record['datetime'])
+        for name, values in record['series'].items():
+            np.testing.assert_array_equal(stored['series'][name], values)
+        self.assertEqual(stored['last_value']['win_loss_ratio'], np.inf)
+        self.assertEqual(stored['summary'].keys(), record['summary'].keys())
+        self.assertIsNone(load_analysis('missing'))
+
+    def test_eviction_drops_least_recently_used(self):
+        record = build_analysis(random_walk(50), '%m-%d ')
+        for analysis_id in ('a', 'b', 'c'):
+            save_analysis(analysis_id, record, 0.05, 0.0)
+        load_analysis('a')
+
+        self.assertEqual(evict_analyses(max_entries=2), 1)
+        self.assertEqual(sorted(Analysis.objects.values_list('pk', flat=True)), ['a', 'c'])
+        self.assertFalse((self.store_dir / 'analyses' / 'b').exists())
+
+
+class ChartRenderingTests(SimpleTestCase):
+    def test_pool_renders_the_same_charts_in_order(self):
+        charts = [(list(np.sin(np.arange(50) / (i + 1))), f'Chart {i}') for i in range(3)]
+        images = render_charts(charts, workers=2, concurrency=2)
+        self.assertEqual(images, [render_chart(*chart) for chart in charts])
+
+    def test_report_embeds_charts_without_touching_disk(self):
+        data = {'score': '6', 'last_value': {}, 'charts': {'sharpe_ratio': [0.1, 0.4, 0.2]}}
+        output = BytesIO()
+        with mock.patch('builtins.open', side_effect=AssertionError('file opened')):
+            create_pdf_report(data, output)
+        self.assertTrue(output.getvalue().startswith(b'%PDF'))
+        self.assertIn(b'/Subtype /Image', output.getvalue())
+
+    def test_vector_mode_draws_downsampled_charts(self):
+        series = list(np.cumsum(np.random.default_rng(3).normal(0, 1, 20_000)))
+        plot = vector_chart(series, 'Sharpe Ratio', points=200).contents[-1]
+        self.assertEqual(len(plot.data[0]), 200)
+
+        output = BytesIO()
+        create_pdf_report({'score': '6', 'last_value': {}, 'charts': {'sharpe_ratio': series}}, output, 'vector')
+        self.assertTrue(output.getvalue().startswith(b'%PDF'))
+        self.assertNotIn(b'/Subtype /Image', output.getvalue())
+
+
+class ReportCacheTests(SimpleTestCase):
+    def setUp(self):
+        scratch = tempfile.TemporaryDirectory()
+        self.addCleanup(scratch.cleanup)
+        self.cache_dir = Path(scratch.name)
+        cache_settings = override_settings(REPORT_CACHE_DIR=self.cache_dir)
+        cache_settings.enable()
+        self.addCleanup(cache_settings.disable)
+
+    def test_repeat_reports_are_not_regenerated(self):
+        data = {'score': '6', 'last_value': {'sharpe_ratio': 1.2}}
+        with mock.patch('analysis.reports.create_pdf_report', wraps=create_pdf_report) as build:
+            with render_report(data, 'pdf') as first, render_report(dict(data), 'PDF') as second:
+                self.assertEqual(first.read(), second.read())
+            with render_report(dict(data, score='7'), 'pdf'):
+                pass
+        self.assertEqual(build.call_count, 2)
+
+    def test_eviction_drops_least_recently_used(self):
+        for i, name in enumerate(('a', 'b', 'c')):
+            store_report(name, BytesIO(b'x' * 100))
+            os.utime(self.cache_dir / name, (i, i))
+        get_report('a').close()
+
+        self.assertEqual(evict_reports(max_bytes=250), 1)
+        self.assertEqual(sorted(path.name for path in self.cache_dir.iterdir()), ['a', 'c'])
+
+
+class ExcelExportTests(SimpleTestCase):
+    def test_chart_data_is_split_across_sheets(self):
+        from openpyxl import load_workbook
+        data = {'datetime': [f'06-{day:02d}' for day in range(1, 13)],
+                'sharpe_ratio': [day / 10 for day in range(12)], 'calmar_ratio': [0.5] * 10,
+                'last_value': {'sharpe_ratio': 1.1}}
+        generator = ExcelReportGenerator()
+        generator.max_rows = 8  # title, blank and header rows + 5 data rows per sheet
+        output = BytesIO()
+        generator.create_excel_report(data, output)
+
+        workbook = load_workbook(output, read_only=True)
+        sheets = [name for name in workbook.sheetnames if name.startswith('Chart Data')]
+        self.assertEqual(sheets, ['Chart Data', 'Chart Data 2', 'Chart Data 3'])
+        rows = [row for name in sheets for row in workbook[name].iter_rows(min_row=4, values_only=True)]
+        self.assertEqual([row[0] for row in rows], data['datetime'])
+        self.assertEqual([row[5] for row in rows], data['sharpe_ratio'])
+        self.assertEqual([row[6] for row in rows], [0.5] * 10 + [None] * 2)
+        self.assertEqual(next(workbook['Chart Data 2'].iter_rows(min_row=3, max_row=3, values_only=True))[:2],
+                         ('Date', 'Max Drawdown'))
+
+        # Native charts for the series present, one line series per data sheet
+        charts = {name: zipfile.ZipFile(output).read(name).decode()
+                  for name in zipfile.ZipFile(output).namelist() if name.startswith('xl/charts/')}
+        self.assertEqual(len(charts), 2)
+        sharpe = next(xml for xml in charts.values() if 'Sharpe Ratio' in xml)
+        self.assertIn("'Chart Data 3'!$F$4:$F$5", sharpe)
+        self.assertEqual(sharpe.count('<c:ser>'), 3)
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class DemoDatasetTests(SimpleTestCase):
+    def test_demo_blotter_matches_generated_csv(self):
+        from sample_data_generator import build_sample_data
+
+        expected = pd.read_csv(SAMPLE_DATA, parse_dates=['datetime'])
+        pd.testing.assert_frame_equal(build_sample_data(), expected, check_dtype=False)
+
+    def test_demo_view_neither_writes_nor_reads_csv(self):
+        from .dashboard import demo_analysis
+
+        demo_analysis.cache_clear()
+        with mock.patch.object(pd, 'read_csv', side_effect=AssertionError('CSV read')), \
+                mock.patch.object(pd.DataFrame, 'to_csv', side_effect=AssertionError('CSV write')):
+            demo_analysis()
+            response = self.client.get('/analysis')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(demo_analysis.cache_info().misses, 1)
+
+
+class IngestTests(SimpleTestCase):
+    header = 'datetime,stock,ordertype,price,quantity,Exchange\n'
+
+    def blotter(self, rows):
+        return BytesIO((self.header + ''.join(row + '\n' for row in rows)).encode())
+
+    def test_categoricals_join_across_chunks(self):
+        # Each two-row chunk sees different symbols, so the chunk categories differ
+        rows = ['2023-01-02 09:30,AAA,Buy,10.5,3,NSE', '2023-01-02 09:31,BBB,Sell,11,2,NSE',
+                '2023-01-02 09:32,CCC,Buy,12,1,BSE', '2023-01-02 09:33,AAA,Sell,13.25,4,BSE',
+                '2023-01-02 09:34,DDD,Buy,14,5,NYSE']
+        df = read_trades(self.blotter(rows), chunksize=2)
+        expected = pd.read_csv(self.blotter(rows), parse_dates=['datetime'])
+
+        self.assertEqual(len(df), 5)
+        self.assertIsInstance(df['stock'].dtype, pd.CategoricalDtype)
+        self.assertEqual(sorted(df['stock'].cat.categories), ['AAA', 'BBB', 'CCC', 'DDD'])
+        self.assertEqual(df['stock'].tolist(), expected['stock'].tolist())
+        self.assertEqual(df['Exchange'].tolist(), expected['Exchange'].tolist())
+        self.assertEqual(df['quantity'].dtype, np.int64)
+        pd.testing.assert_series_equal(df['datetime'], expected['datetime'], check_dtype=False)
+        pd.testing.assert_frame_equal(df, read_trades(self.blotter(rows)))
+
+    def test_missing_and_bad_columns(self):
+        no_price = BytesIO(b'datetime,stock,ordertype,quantity\n2023-01-02,AAA,Buy,1\n')
+        with self.assertRaisesMessage(ValueError, 'missing columns: price'):
+            read_trades(no_price)
+        prices_only = read_trades(BytesIO(b'datetime,price\n2023-01-02,10\n2023-01-03,11\n'))
+        self.assertEqual(prices_only['price'].tolist(), [10.0, 11.0])
+        with self.assertRaises(ValueError):
+            read_trades(self.blotter(['2023-01-02,AAA,Buy,10,one,NSE']))
+        with self.assertRaises(ValueError):
+            read_trades(self.blotter(['not a date,AAA,Buy,10,1,NSE']))
+
+    def test_empty_files(self):
+        for source in (BytesIO(b''), self.blotter([])):
+            with self.assertRaisesMessage(ValueError, 'Uploaded file contains no trades'):
+                read_trades(source)
+
+
+class TradeGeneratorTests(SimpleTestCase):
+    def test_round_trips_keep_holdings_valid(self):
+        from sample_data_generator import generate_trades
+
+        chunks = list(generate_trades(10_001, symbols=40, seed=5, chunk_rows=3000, symbol_skew=1.2))
+        self.assertEqual([len(chunk) for chunk in chunks], [3000, 3000, 3000, 1000])
+        df = pd.concat(chunks, ignore_index=True)
+        self.assertTrue(df['datetime'].is_monotonic_increasing)
+
+        for _, group in df.groupby('stock', observed=True):
+            self.assertEqual(group['ordertype'].tolist(), ['Buy', 'Sell'] * (len(group) // 2))
+            quantity = group['quantity'].to_numpy()
+            np.testing.assert_array_equal(quantity[0::2], quantity[1::2])
+
+        trades = match_round_trips(df)
+        self.assertEqual(len(trades), len(df) // 2)
+        self.assertTrue((trades['side'] == 'long').all())
+
+    def test_seed_determines_output(self):
+        from sample_data_generator import generate_trades
+
+        first = pd.concat(generate_trades(2000, symbols=7, seed=9, chunk_rows=500))
+        second = pd.concat(generate_trades(2000, symbols=7, seed=9, chunk_rows=500))
+        pd.testing.assert_frame_equal(first, second)
+
+
+class PairedClient:
+    """LLM stand-in whose calls only answer once two of them are in flight together"""
+    barrier = threading.Barrier(2, timeout=5)
+
+    def complete(self, prompt, max_tokens, temperature=None):
+        self.barrier.wait()
+        return '7.5' if temperature == 0.0 else 'narrative'
+
+
+class GatedClient:
+    """LLM stand-in whose calls block until the test opens the gate"""
+    gate = threading.Event()
+
+    def complete(self, prompt, max_tokens, temperature=None):
+        self.gate.wait(timeout=5)
+        return '7.5' if temperature == 0.0 else 'narrative'
+
+
+def close_gate(test):
+    """Hold GatedClient calls for the rest of the test, releasing them at cleanup"""
+    GatedClient.gate.clear()
+    test.addCleanup(GatedClient.gate.set)
+
+
+def signal_stored(cache_class):
+    """Patch cache_class.set to also set an Event once a commentary job is stored as done"""
+    stored = threading.Event()
+    original = cache_class.set
+
+    def set_and_signal(cache, key, value, *args, **kwargs):
+        result = original(cache, key, value, *args, **kwargs)
+        if isinstance(value, dict) and value.get('status') == 'done':
+            stored.set()
+        return result
+
+    return mock.patch.object(cache_class, 'set', set_and_signal), stored
+
+
+class BrokenClient:
+    def complete(self, prompt, max_tokens, temperature=None):
+        raise ConnectionError('offline')
+
+
+def uncached_complete(client, prompt, max_tokens, temperature=None):
+    return client.complete(prompt, max_tokens, temperature)
+
+
+# Calls that outlive a test must not write to the database behind the next one
+@mock.patch('analysis.llm.cached_complete', uncached_complete)
+@override_settings(CACHES=LOCAL_CACHES)
+class CommentaryTests(SimpleTestCase):
+    @override_settings(LLM_CLIENT='analysis.tests.PairedClient')
+    def test_calls_run_concurrently(self):
+        self.assertEqual(Commentary('row', budget=10).result(), ('narrative', '7.5'))
+
+    @override_settings(LLM_CLIENT='analysis.tests.GatedClient')
+    def test_budget_falls_back(self):
+        close_gate(self)
+        self.assertEqual(Commentary('row', budget=0.05).result(), (FALLBACK_ANALYSIS, FALLBACK_SCORE))
+
+    @override_settings(LLM_CLIENT='analysis.tests.BrokenClient')
+    def test_errors_fall_back(self):
+        self.assertEqual(Commentary('row', budget=5).result(), (FALLBACK_ANALYSIS, FALLBACK_SCORE))
+
+    @override_settings(LLM_CLIENT='analysis.tests.GatedClient')
+    def test_page_renders_before_commentary_is_polled(self):
+        close_gate(self)
+        patch, stored = signal_stored(LocMemCache)
+        with patch:
+            response = self.client.get('/analysis')
+            self.assertNotIn('response1', response.context)
+
+            url = f"/commentary/{response.context['commentary_id']}"
+            self.assertEqual(self.client.get(url).json(), {'status': 'pending'})
+            GatedClient.gate.set()
+            self.assertTrue(stored.wait(timeout=5))
+        self.assertEqual(self.client.get(url).json(),
+                         {'status': 'done', 'response1': 'narrative', 'response2': '7.5'})
+
+    @override_settings(LLM_CLIENT='analysis.tests.GatedClient', LLM_TIMEOUT=0)
+    def test_polling_past_the_budget_falls_back(self):
+        close_gate(self)
+        job_id = self.client.get('/analysis').context['commentary_id']
+        state = self.client.get(f'/commentary/{job_id}').json()
+        self.assertEqual((state['response1'], state['response2']), (FALLBACK_ANALYSIS, FALLBACK_SCORE))
+        self.assertEqual(self.client.get('/commentary/unknown').status_code, 404)
+
+    @override_settings(LLM_CLIENT='analysis.tests.GatedClient')
+    def test_dropped_state_writes_are_retried(self):
+        close_gate(self)
+        original, dropped, stored = LocMemCache.set, [], threading.Event()
+
+        def drop_first(cache, key, value, *args, **kwargs):
+            # As DatabaseCache does when the write hits a DatabaseError
+            if isinstance(value, dict) and value.get('status') == 'done' and not dropped:
+                dropped.append(key)
+                return
+            original(cache, key, value, *args, **kwargs)
+            if isinstance(value, dict) and value.get('status') == 'done':
+                stored.set()
+
+        closed = threading.Semaphore(0)
+        with mock.patch.object(LocMemCache, 'set', drop_first), \
+                mock.patch('analysis.llm.connection') as connection_proxy:
+            connection_proxy.close.side_effect = closed.release
+            job_id = start_commentary('row')
+            GatedClient.gate.set()
+            self.assertTrue(stored.wait(timeout=5))
+            # Both pool threads give their connection back, not just the one that stored
+            self.assertTrue(closed.acquire(timeout=5) and closed.acquire(timeout=5))
+        self.assertEqual(len(dropped), 1)
+        self.assertEqual(commentary_status(job_id), {'status': 'done', 'response1': 'narrative', 'response2': '7.5'})
+
+
+class CountingClient:
+    model = 'counting'
+
+    def __init__(self):
+        self.calls = 0
+
+    def complete(self, prompt, max_tokens, temperature=None):
+        self.calls += 1
+        return f'answer {self.calls}'
+
+
+class LLMResponseCacheTests(TransactionTestCase):
+    def setUp(self):
+        LLMResponse.objects.all().delete()
+
+    def test_store_waits_out_a_concurrent_upload(self):
+        writing, release = threading.Event(), threading.Event()
+
+        def upload():
+            # Holds the write lock the way save_analysis' transaction does
+            try:
+                with transaction.atomic():
+                    Analysis.objects.create(pk='upload', date_format='%m', market_returns=0.05, risk_free_rate=0.0,
+                                            rows=0, series=[], summary={}, last_value={}, tables={}, last_row='')
+                    writing.set()
+                    release.wait(timeout=5)
+            finally:
+                connection.close()
+
+        def score():
+            try:
+                cached_complete(CountingClient(), 'score', 5, 0.0)
+            finally:
+                connection.close()
+
+        uploader, scorer = threading.Thread(target=upload), threading.Thread(target=score)
+        uploader.start()
+        self.assertTrue(writing.wait(timeout=5))
+        with self.assertNoLogs('analysis.llm_cache', level='WARNING'):
+            scorer.start()
+            # The store blocks on the lock until the upload commits, rather than failing
+            scorer.join(timeout=0.2)
+            release.set()
+            scorer.join()
+            uploader.join()
+        self.assertEqual(LLMResponse.objects.get().response, 'answer 1')
+        self.assertTrue(Analysis.objects.filter(pk='upload').exists())
+
+    def test_identical_prompts_are_answered_once(self):
+        client = CountingClient()
+        self.assertEqual(cached_complete(client, 'rate  INFY\n 1.0', 5, 0.0), 'answer 1')
+        self.assertEqual(cached_complete(client, 'rate INFY 1.0', 5, 0.0), 'answer 1')
+        self.assertEqual(cached_complete(client, 'rate INFY 1.0', 200), 'answer 2')
+        self.assertEqual(client.calls, 2)
+        self.assertEqual(LLMResponse.objects.get(temperature=0.0).hits, 1)
+
+    @override_settings(LLM_CACHE_TTL=60)
+    def test_only_sampled_responses_expire(self):
+        client = CountingClient()
+        cached_complete(client, 'score', 5, 0.0)
+        cached_complete(client, 'narrative', 200)
+        LLMResponse.objects.update(created_at=timezone.now() - timedelta(seconds=120))
+
+        cached_complete(client, 'score', 5, 0.0)
+        cached_complete(client, 'narrative', 200)
+        self.assertEqual(client.calls, 3)
+
+    def test_eviction_drops_sampled_then_least_recently_used(self):
+        client = CountingClient()
+        for i in range(3):
+            cached_complete(client, f'score {i}', 5, 0.0)
+            cached_complete(client, f'narrative {i}', 200)
+
+        self.assertEqual(evict(max_entries=4), 2)
+        self.assertEqual(LLMResponse.objects.filter(temperature=0.0).count(), 3)
+        self.assertEqual(evict(max_entries=2), 2)
+        self.assertEqual(sorted(LLMResponse.objects.values_list('prompt', flat=True)), ['score 1', 'score 2'])
+
+    @override_settings(LLM_CLIENT='analysis.llm.StubClient')
+    def test_warm_command_fills_the_demo_commentary(self):
+        call_command('warm_llm_cache', '--demo', stdout=StringIO())
+        self.assertEqual(LLMResponse.objects.count(), 2)
+
+
+class DownsampleTests(SimpleTestCase):
+    def test_minmax_keeps_every_bucket_extreme(self):
+        y = np.cumsum(np.random.default_rng(1).normal(size=10_007))
+        keep = minmax(y, 100)
+        self.assertLessEqual(len(keep), 102)
+        self.assertEqual((keep[0], keep[-1]), (0, len(y) - 1))
+        self.assertIn(y.argmin(), keep)
+        self.assertIn(y.argmax(), keep)
+
+    def test_lttb_keeps_a_spike(self):
+        y = np.zeros(5000)
+        y[1234] = 10.0
+        keep = lttb(y, 50)
+        self.assertEqual(len(keep), 50)
+        self.assertTrue(np.all(np.diff(keep) > 0))
+        self.assertIn(1234, keep)
+
+    def test_short_series_are_untouched(self):
+        np.testing.assert_array_equal(chart_indices({'win_loss': np.arange(10.0)}), np.arange(10))
+
+    @override_settings(CHART_DOWNSAMPLING={'max_drawdown': {'method': 'minmax', 'points': 40},
+                                           'sharpe_ratio': {'method': 'lttb', 'points': 40}})
+    def test_context_series_stay_aligned(self):
+        raw = pd.read_csv(SAMPLE_DATA, parse_dates=['datetime'])
+        full = calculation(raw.copy()).dropna()
+        context = analysis_context(raw, '%m-%d ')
+
+        n = len(context['datetime'])
+        self.assertLessEqual(n, 80)
+        for key in ('max_drawdown', 'win_loss', 'sharpe_ratio', 'calmar_ratio', 'excess_returns'):
+            self.assertEqual(len(context[key]), n)
+        self.assertEqual(min(context['max_drawdown']), full['max_drawdown'].min())
+        self.assertEqual(max(context['sharpe_ratio']), full['sharpe_ratio'].max())
+
+    @override_settings(CHART_DOWNSAMPLING={'max_drawdown': {'method': 'minmax', 'points': 40},
+                                           'sharpe_ratio': {'method': 'lttb', 'points': 60}})
+    def test_page_carries_the_configured_point_budgets(self):
+        from .dashboard import chart_points
+
+        points = chart_points()
+        self.assertEqual(points['max_drawdown'], 40)
+        self.assertEqual(points['sharpe_ratio'], 60)
+        self.assertEqual(points['win_loss'], 60)
+        self.assertEqual(points['calmar_ratio'], 60)
+
+        html = render_to_string('analysis_final.html', {'chart_points': points})
+        self.assertIn('"max_drawdown": 40', html)
+        self.assertNotIn('chartPoints = 1000', html)
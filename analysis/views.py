@@ -1,20 +1,23 @@
-from django.shortcuts import render,redirect
-from django.http import HttpResponse, JsonResponse
-from io import TextIOWrapper
-import csv
-import pandas as pd
-from .final_analysis import *
-from sample_data_generator import *
-import openai
-import os
-from .pdf_generator import create_pdf_report
-from .excel_export import create_excel_report
-from .email_service import EmailReportService
+from django.shortcuts import render
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import etag, require_GET
+from .ingest import read_trades
+from .result_cache import upload_key, get_analysis, store_analysis, cache_stats
+from .analysis_store import analysis_exists
+from .llm import start_commentary, commentary_status
+from .dashboard import (
+    DEMO_ANALYSIS_ID, AnalysisNotFound, build_analysis, dashboard_context,
+    demo_analysis, json_safe, load_analysis, series_names, series_page,
+)
+from .reports import REPORT_FORMATS, render_report
+from .columnar_export import analysis_table, arrow_stream, write_parquet
+from .jobs import enqueue, job_status
+import hashlib
 import json
-
-openai.organization = os.environ.get("OPENAI_ORG_ID")
-openai.api_key = os.environ.get("OPENAI_API_KEY")
-
+from tempfile import SpooledTemporaryFile
 
 def csv_upload(request):
     if request.method == 'POST':
@@ -25,195 +28,169 @@ def csv_upload(request):
         if csv_file is None:
             return HttpResponse("No file uploaded.")
 
-        with TextIOWrapper(csv_file, encoding=request.encoding) as text_file:
-            reader = csv.reader(text_file)
-            csv_contents = [row for row in reader]
-
-
-        df = pd.DataFrame(csv_contents[1:], columns=csv_contents[0])
-        df['datetime'] = pd.to_datetime(df['datetime'])
-
-
-        df['price'] = df['price'].astype(float)
-        df['quantity'] = df['quantity'].astype(int)
-        
-
-
-
-        response2=4
-        response1="The trader's purchase of INFY stock suggests that he or she believes the stock is undervalued at its current price relative to its earnings and should appreciate in price. Another financial ratio that is useful for analyzing the performance of the trader is the price-to-book (P/B) ratio, which is calculated by dividing the current stock price by its book value. The higher the P/B ratio, the more expensive the stock is relative to its book value. The trader's purchase of INFY suggests that he or she believes the stock is undervalued at its current price relative to its"
         try:
-            last_row = df.tail(1).to_string(index=False)
-            prompt1 = f"Can you provide an analysis of the trader's(not about how much quantity he bought but about what are different types of financial ratio) performance based on the following data?\n\n{last_row}"
-            prompt2 = f"Please rate the trader's performance between 0.0 and 10.0 on the basis of {last_row}:"
-
-            completion1 = openai.Completion.create(
-                engine="text-davinci-003",
-                prompt=prompt1,
-                max_tokens=200
-            )
-
-            response1 = completion1.choices[0].text.strip()
-
-            completion2 = openai.Completion.create(
-                engine="text-davinci-003",
-                prompt=prompt2,
-                max_tokens=5,  
-                temperature=0.0,  
-                stop=None
-            )
-
-            response2 = completion2.choices[0].text.strip()
-
-            print(response1,response2)
-        except Exception as e:
-            print(str(e))
-
-
-
-        df = calculation(df)
-
-        df.dropna(inplace=True)
-
-        diction = df.iloc[-1].to_dict()
-        diction = {key: round(value, 2) for key, value in diction.items() if key != 'datetime' and type(value)!=str}
-
-        print(df)
-        context = {
-            'datetime': df['datetime'].dt.strftime('%y %m-%d ').tolist(),
-            'max_drawdown': df['max_drawdown'].tolist(),
-            'win_loss': df['win_loss_ratio'].tolist(),
-            'sortino_ratio': df['sortino_ratio'].tolist(),
-            'sharpe_ratio': df['sharpe_ratio'].tolist(),
-            'cumulative_returns':df['cumulative_returns'].tolist(),
-            'standard_deviation':df['standard_deviation'].tolist(),
-            'excess_returns':df['excess_returns'].tolist(),
-            'information_ratio':df['information_ratio'].tolist(),
-            'calmar_ratio':df['calmar_ratio'].tolist(),
-            'response1': response1,
-            'response2': response2,
-            'last_value':diction
-        }
+            market_returns = float(request.POST.get('market_returns', 0.05))
+            risk_free_rate = float(request.POST.get('risk_free_rate', 0.0))
+        except ValueError:
+            return HttpResponse("Invalid market_returns or risk_free_rate.", status=400)
+
+        # Same bytes and parameters always give the same analysis: skip parsing
+        # and the calculation on a repeat upload
+        analysis_id = upload_key(csv_file, market_returns, risk_free_rate)
+        record = get_analysis(analysis_id)
+        if record is None:
+            # Parse the upload straight into typed columns, no list-of-lists copy
+            try:
+                df = read_trades(csv_file, encoding=request.encoding)
+                record = build_analysis(df, '%y %m-%d ', market_returns, risk_free_rate)
+            except ValueError as exc:
+                return HttpResponse(f"Invalid trade file: {exc}", status=400)
+            store_analysis(analysis_id, record, market_returns, risk_free_rate)
+
+        # The charts render now; the page polls for the AI commentary
+        context = dict(dashboard_context(record, include_series=False), analysis_id=analysis_id,
+                       commentary_id=start_commentary(record['last_row']))
         return render(request, 'analysis_final.html', context)
 
     return render(request, "file_upload.html")
 
-def analysis_data(request):
-    generate()
 
-    df=pd.read_csv('./sample_data.csv')
-    df['datetime'] = pd.to_datetime(df['datetime'])
 
+def analysis_data(request):
+    record = demo_analysis()
+    context = dict(dashboard_context(record, include_series=False), analysis_id=DEMO_ANALYSIS_ID,
+                   commentary_id=start_commentary(record['last_row']))
+    return render(request, 'analysis_final.html', context)
 
-    df['price'] = df['price'].astype(float)
-    df['quantity'] = df['quantity'].astype(int)
-    
-    response2=4
-    response1="The trader's purchase of INFY stock suggests that he or she believes the stock is undervalued at its current price relative to its earnings and should appreciate in price. Another financial ratio that is useful for analyzing the performance of the trader is the price-to-book (P/B) ratio, which is calculated by dividing the current stock price by its book value. The higher the P/B ratio, the more expensive the stock is relative to its book value. The trader's purchase of INFY suggests that he or she believes the stock is undervalued at its current price relative to its"
+def commentary(request, job_id):
+    """Poll the AI commentary started when an analysis page was rendered"""
+    state = commentary_status(job_id)
+    if state is None:
+        return JsonResponse({'error': 'Unknown commentary job'}, status=404)
+    return JsonResponse(state)
+
+def _analysis_etag(request, analysis_id, name=None):
+    # Records are content addressed, so id + query identify the response; an
+    # unknown or evicted id gets no ETag and so never a 304
+    if analysis_id != DEMO_ANALYSIS_ID and not analysis_exists(analysis_id):
+        return None
+    parts = [analysis_id, name or '', request.GET.urlencode()]
+    return hashlib.sha1('|'.join(parts).encode()).hexdigest()
+
+@require_GET
+@gzip_page
+@cache_control(private=True, max_age=3600)
+@etag(_analysis_etag)
+def analysis_summary_api(request, analysis_id):
+    """Scalar summary and dashboard tables of an analysis, plus the available series"""
+    record = load_analysis(analysis_id)
+    if record is None:
+        return JsonResponse({'error': 'Unknown analysis'}, status=404)
+    return JsonResponse(json_safe({
+        'analysis_id': analysis_id,
+        'rows': len(record['datetime']),
+        'summary': record['summary'],
+        'last_value': record['last_value'],
+        'instrument_count': record.get('instrument_count'),
+        'instruments': record.get('instruments'),
+        'trade_stats': record.get('trade_stats'),
+        'portfolio': record.get('portfolio'),
+        'series': series_names(record),
+    }))
+
+@require_GET
+@gzip_page
+@cache_control(private=True, max_age=3600)
+@etag(_analysis_etag)
+def analysis_series_api(request, analysis_id, name):
+    """
+    One metric series of an analysis, paginated
+
+    Query parameters: offset, limit, start/end (ISO datetimes), points (downsample the page)
+    """
+    record = load_analysis(analysis_id)
+    if record is None:
+        return JsonResponse({'error': 'Unknown analysis'}, status=404)
     try:
-        last_row = df.tail(1).to_string(index=False)
-        prompt1 = f"Can you provide an analysis of the trader's(not about how much quantity he bought but about what are different types of financial ratio) performance based on the following data?\n\n{last_row}"
-        prompt2 = f"Please rate the trader's performance between 0.0 and 10.0 on the basis of {last_row}:"
-
-        completion1 = openai.Completion.create(
-            engine="text-davinci-003",
-            prompt=prompt1,
-            max_tokens=200
-        )
-
-        response1 = completion1.choices[0].text.strip()
-
-        completion2 = openai.Completion.create(
-            engine="text-davinci-003",
-            prompt=prompt2,
-            max_tokens=5,  # Limit to a few tokens to force a floating number response
-            temperature=0.0,  # Set temperature to 0.0 for deterministic output
-            stop=None  # Disable the default stop sequence
-        )
-
-        response2 = completion2.choices[0].text.strip()
-
-        print(response1,response2)
+        offset = int(request.GET.get('offset', 0))
+        limit = int(request.GET['limit']) if 'limit' in request.GET else None
+        points = int(request.GET['points']) if 'points' in request.GET else None
+        page = series_page(record, name, offset=offset, limit=limit, points=points,
+                           start=request.GET.get('start'), end=request.GET.get('end'))
+    except KeyError:
+        return JsonResponse({'error': f'Unknown series: {name}'}, status=404)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse(page)
+
+def _export_table(request, analysis_id):
+    """
+    Arrow table of an analysis for the columnar exports, or an error response
+
+    Query parameters: columns (comma-separated, default all)
+    """
+    record = load_analysis(analysis_id)
+    if record is None:
+        return None, JsonResponse({'error': 'Unknown analysis'}, status=404)
+    columns = request.GET.get('columns')
+    try:
+        return analysis_table(record, columns.split(',') if columns else None), None
+    except KeyError as e:
+        return None, JsonResponse({'error': f'Unknown column: {e.args[0]}'}, status=400)
+
+@require_GET
+def analysis_parquet_export(request, analysis_id):
+    """Metric series of an analysis as a compressed Parquet file"""
+    table, error = _export_table(request, analysis_id)
+    if error is not None:
+        return error
+    buffer = SpooledTemporaryFile(max_size=getattr(settings, 'REPORT_SPOOL_MAX_BYTES', 16 * 2**20))
+    write_parquet(table, buffer)
+    buffer.seek(0)
+    return FileResponse(buffer, as_attachment=True, filename=f'analysis_{analysis_id[:12]}.parquet',
+                        content_type='application/vnd.apache.parquet')
+
+@require_GET
+def analysis_arrow_export(request, analysis_id):
+    """Metric series of an analysis as an Arrow IPC stream, sent batch by batch"""
+    table, error = _export_table(request, analysis_id)
+    if error is not None:
+        return error
+    response = StreamingHttpResponse(arrow_stream(table), content_type='application/vnd.apache.arrow.stream')
+    response['Content-Disposition'] = f'attachment; filename="analysis_{analysis_id[:12]}.arrows"'
+    return response
+
+def result_cache_stats(request):
+    """Hit/miss counters of the uploaded-analysis cache"""
+    return JsonResponse(cache_stats())
+
+def _report_response(request, report_type):
+    """Render a report for the analysis in the request body and stream it as a download"""
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Invalid request method'}, status=405)
+    try:
+        # The analysis data from the request, or an analysis id the report
+        # loads on a cache miss
+        report = render_report(json.loads(request.body), report_type)
+    except AnalysisNotFound:
+        return JsonResponse({'error': 'Unknown analysis'}, status=404)
     except Exception as e:
-        print(str(e))
-
-
-    df = calculation(df)
-
-    df.dropna(inplace=True)
-    diction = df.iloc[-1].to_dict()
-    diction = {key: round(value, 2) for key, value in diction.items() if key != 'datetime' and type(value)!=str}
-
-    print(df)
-    context = {
-        'datetime': df['datetime'].dt.strftime('%m-%d ').tolist(),
-        'max_drawdown': df['max_drawdown'].tolist(),
-        'win_loss': df['win_loss_ratio'].tolist(),
-        'sortino_ratio': df['sortino_ratio'].tolist(),
-        'sharpe_ratio': df['sharpe_ratio'].tolist(),
-        'cumulative_returns':df['cumulative_returns'].tolist(),
-        'standard_deviation':df['standard_deviation'].tolist(),
-        'excess_returns':df['excess_returns'].tolist(),
-        'information_ratio':df['information_ratio'].tolist(),
-        'calmar_ratio':df['calmar_ratio'].tolist(),
-        'response1': response1,
-        'response2': response2,
-        'last_value':diction
-    }
+        return JsonResponse({'error': str(e)}, status=500)
 
-    return render(request, 'analysis_final.html', context)
+    # FileResponse sends the buffer in chunks and closes it when done
+    content_type, filename = REPORT_FORMATS[report_type]
+    return FileResponse(report, as_attachment=True, filename=filename, content_type=content_type)
 
 def export_pdf(request):
     """Export analysis results as PDF"""
-    if request.method == 'POST':
-        try:
-            # Get analysis data from session or request
-            analysis_data = json.loads(request.body)
-            
-            # Generate PDF report
-            pdf_path = create_pdf_report(analysis_data)
-            
-            # Return PDF file
-            with open(pdf_path, 'rb') as pdf_file:
-                response = HttpResponse(pdf_file.read(), content_type='application/pdf')
-                response['Content-Disposition'] = 'attachment; filename="portfolio_analysis_report.pdf"'
-                
-                # Clean up temporary file
-                os.remove(pdf_path)
-                return response
-                
-        except Exception as e:
-            return JsonResponse({'error': str(e)}, status=500)
-    
-    return JsonResponse({'error': 'Invalid request method'}, status=405)
+    return _report_response(request, 'pdf')
 
 def export_excel(request):
     """Export analysis results as Excel"""
-    if request.method == 'POST':
-        try:
-            # Get analysis data from session or request
-            analysis_data = json.loads(request.body)
-            
-            # Generate Excel report
-            excel_path = create_excel_report(analysis_data)
-            
-            # Return Excel file
-            with open(excel_path, 'rb') as excel_file:
-                response = HttpResponse(excel_file.read(), 
-                                      content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-                response['Content-Disposition'] = 'attachment; filename="portfolio_analysis.xlsx"'
-                
-                # Clean up temporary file
-                os.remove(excel_path)
-                return response
-                
-        except Exception as e:
-            return JsonResponse({'error': str(e)}, status=500)
-    
-    return JsonResponse({'error': 'Invalid request method'}, status=405)
+    return _report_response(request, 'excel')
 
 def send_email_report(request):
-    """Send analysis report via email"""
+    """Queue an analysis report for email delivery; poll /jobs/<job_id> for the outcome"""
     if request.method == 'POST':
         try:
             data = json.loads(request.body)
@@ -221,20 +198,33 @@ def send_email_report(request):
             analysis_data = data.get('analysis_data')
             report_type = data.get('report_type', 'pdf')
             
-            if not email or not analysis_data:
+            if not email or not analysis_data or not isinstance(analysis_data, dict):
                 return JsonResponse({'error': 'Email and analysis data required'}, status=400)
+            if not isinstance(report_type, str) or report_type.lower() not in REPORT_FORMATS:
+                return JsonResponse({'error': f'Unsupported report type: {report_type}'}, status=400)
+            if 'analysis_id' in analysis_data:
+                # The job loads a stored analysis itself; queue the reference, not its series
+                if load_analysis(analysis_data['analysis_id']) is None:
+                    raise AnalysisNotFound(analysis_data['analysis_id'])
+                analysis_data = {key: analysis_data.get(key) for key in ('analysis_id', 'response1', 'response2')}
             
-            # Send email report
-            email_service = EmailReportService()
-            success = email_service.send_analysis_report(email, analysis_data, report_type)
-            
-            if success:
-                return JsonResponse({'message': 'Report sent successfully!'})
-            else:
-                return JsonResponse({'error': 'Failed to send email'}, status=500)
+            # Rendering and SMTP happen on the job workers, not in this request
+            job_id = enqueue('email', json_safe({
+                'email': email, 'analysis_data': analysis_data, 'report_type': report_type,
+            }))
+            return JsonResponse({'job_id': job_id, 'status': 'queued'}, status=202)
                 
+        except AnalysisNotFound:
+            return JsonResponse({'error': 'Unknown analysis'}, status=404)
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=500)
     
     return JsonResponse({'error': 'Invalid request method'}, status=405)
 
+@require_GET
+def report_job_status(request, job_id):
+    """Status of a queued report job"""
+    state = job_status(job_id)
+    if state is None:
+        return JsonResponse({'error': 'Unknown job'}, status=404)
+    return JsonResponse(state)
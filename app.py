@@ -16,3 +16,8 @@ application = get_wsgi_application()
 
 # This allows Render.com to find the app if it's looking for app:app
 app = application
+
+# Run report jobs queued before this process started
+from analysis.jobs import start_poller  # noqa: E402
+
+start_poller()
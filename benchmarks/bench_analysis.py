@@ -0,0 +1,90 @@
+"""
+Run time and peak RSS of the analysis kernels on generated blotters.
+
+Data comes from ``sample_data_generator.generate_trades``, so runs are
+reproducible for a given seed. Every measurement runs in a fresh process;
+generating the blotter is not part of the timed section.
+
+    python -m benchmarks.bench_analysis --rows 1000000 10000000 --symbols 3000
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.common import run_isolated
+
+
+def _blotter(n_rows, symbols, seed):
+    from sample_data_generator import generate_trades
+    return pd.concat(generate_trades(n_rows, symbols=symbols, seed=seed), ignore_index=True)
+
+
+def compact(df):
+    from analysis.final_analysis import compact_metrics, price_returns
+    compact_metrics(price_returns(df['price']))
+
+
+def online(df, batches=10):
+    from analysis.online_metrics import OnlineMetrics
+    metrics = OnlineMetrics()
+    for chunk in np.array_split(df['price'].to_numpy(), batches):
+        metrics.update(chunk)
+    metrics.summary()
+
+
+def grouped(df):
+    from analysis.grouped_analysis import grouped_metrics
+    grouped_metrics(df, include_rows=False)
+
+
+def fifo(df):
+    from analysis.round_trips import match_round_trips
+    match_round_trips(df, 'fifo')
+
+
+def lifo(df):
+    from analysis.round_trips import match_round_trips
+    match_round_trips(df, 'lifo')
+
+
+METHODS = {
+    'compact': compact,
+    'online': online,
+    'grouped': grouped,
+    'fifo': fifo,
+    'lifo': lifo,
+}
+
+
+def _measure(method, n_rows, symbols, seed):
+    df = _blotter(n_rows, symbols, seed)
+    started = time.perf_counter()
+    METHODS[method](df)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[1_000_000, 10_000_000])
+    parser.add_argument('--symbols', type=int, default=3000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--methods', nargs='+', default=list(METHODS), choices=list(METHODS))
+    parser.add_argument('--timeout', type=float, default=1800, help="seconds allowed per measurement")
+    args = parser.parse_args()
+
+    print(f"{'rows':>12} {'method':>10} {'seconds':>9} {'peak MB':>9}")
+    for n_rows in args.rows:
+        for method in args.methods:
+            try:
+                elapsed, peak, _ = run_isolated(_measure, method, n_rows, args.symbols, args.seed,
+                                                timeout=args.timeout)
+            except (RuntimeError, TimeoutError) as error:
+                print(f"{n_rows:>12,} {method:>10} {'failed':>9} ({error})")
+                continue
+            print(f"{n_rows:>12,} {method:>10} {elapsed:>9.2f} {peak:>9.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""
+Time and payload size of the dashboard chart downsampling.
+
+Builds the chart series from a generated blotter, then times each
+downsampling method and compares the JSON size of the chart lists that would
+be inlined into the page with and without thinning.
+
+    python -m benchmarks.bench_downsample --rows 1000000 10000000 --points 1000
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+from analysis.downsample import METHODS
+from analysis.final_analysis import compact_metrics, price_returns
+from sample_data_generator import generate_trades
+
+SERIES = ('max_drawdown', 'win_loss_ratio', 'sortino_ratio', 'sharpe_ratio', 'cumulative_returns')
+
+
+def chart_series(n_rows, seed):
+    df = pd.concat(generate_trades(n_rows, symbols=1, seed=seed), ignore_index=True)
+    series, _ = compact_metrics(price_returns(df['price']))
+    return {name: series[name][1:] for name in SERIES}
+
+
+def payload_mb(series, keep=None):
+    lists = {name: (values if keep is None else values[keep]).tolist() for name, values in series.items()}
+    return len(json.dumps(lists)) / 2**20
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[1_000_000, 10_000_000])
+    parser.add_argument('--points', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    print(f"{'rows':>12} {'method':>8} {'ms/series':>10} {'points':>8} {'payload MB':>11}")
+    for n_rows in args.rows:
+        series = chart_series(n_rows, args.seed)
+        print(f"{n_rows:>12,} {'none':>8} {'':>10} {n_rows:>8,} {payload_mb(series):>11.2f}")
+        for method, func in METHODS.items():
+            started = time.perf_counter()
+            picks = [func(values, args.points) for values in series.values()]
+            elapsed = (time.perf_counter() - started) / len(series) * 1000
+            keep = np.unique(np.concatenate(picks))
+            print(f"{n_rows:>12,} {method:>8} {elapsed:>10.1f} {len(keep):>8,} {payload_mb(series, keep):>11.2f}")
+
+
+if __name__ == '__main__':
+    main()
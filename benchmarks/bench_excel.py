@@ -0,0 +1,67 @@
+"""
+Rows per second and peak memory of the Excel export on long histories.
+
+Builds an analysis_data payload of ``rows`` chart rows (plain lists, as the
+views pass them), then times create_excel_report with and without
+xlsxwriter's constant_memory mode. Each measurement runs in a fresh process;
+"export MB" is the peak RSS above what the payload itself occupies.
+
+    python -m benchmarks.bench_excel --rows 100000 1000000 2000000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.common import current_rss_mb, peak_rss_mb, run_isolated
+
+SERIES = ('max_drawdown', 'win_loss', 'sortino_ratio', 'cumulative_returns', 'sharpe_ratio', 'calmar_ratio')
+
+
+def _payload(n_rows, seed):
+    rng = np.random.default_rng(seed)
+    data = {name: rng.normal(0, 1, n_rows).tolist() for name in SERIES}
+    dates = np.datetime64('2023-06-01') + np.arange(n_rows).astype('timedelta64[s]')
+    data['datetime'] = np.datetime_as_string(dates).tolist()
+    data['last_value'] = {'sharpe_ratio': 1.0}
+    return data
+
+
+def _measure(n_rows, constant_memory, seed):
+    from analysis.excel_export import create_excel_report
+    data = _payload(n_rows, seed)
+    baseline = current_rss_mb()
+    with tempfile.TemporaryDirectory() as scratch:
+        path = os.path.join(scratch, 'report.xlsx')
+        started = time.perf_counter()
+        create_excel_report(data, path, constant_memory)
+        elapsed = time.perf_counter() - started
+        size_mb = os.path.getsize(path) / 2**20
+    return elapsed, max(0.0, peak_rss_mb() - baseline), size_mb
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[100_000, 1_000_000, 2_000_000])
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--timeout', type=float, default=3600, help="seconds allowed per measurement")
+    args = parser.parse_args()
+
+    print(f"{'rows':>12} {'mode':>9} {'seconds':>9} {'rows/s':>10} {'export MB':>10} {'file MB':>8}")
+    for n_rows in args.rows:
+        for constant_memory in (False, True):
+            mode = 'constant' if constant_memory else 'in-memory'
+            try:
+                (elapsed, export_mb, size_mb), _, _ = run_isolated(
+                    _measure, n_rows, constant_memory, args.seed, timeout=args.timeout)
+            except (RuntimeError, TimeoutError) as error:
+                print(f"{n_rows:>12,} {mode:>9} {'failed':>9} ({error})")
+                continue
+            print(f"{n_rows:>12,} {mode:>9} {elapsed:>9.2f} {n_rows / elapsed:>10,.0f} "
+                  f"{export_mb:>10.0f} {size_mb:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Parse time and peak RSS of the upload ingest path.
+
+Compares the legacy ``csv.reader`` -> list-of-lists -> DataFrame path that
+``csv_upload`` used to run with ``analysis.ingest.read_trades``. Every
+measurement runs in a fresh process so peak RSS is not polluted by earlier runs.
+
+    python -m benchmarks.bench_ingest --rows 1000000 10000000
+"""
+import argparse
+import csv
+import os
+import tempfile
+import time
+from io import TextIOWrapper
+
+import pandas as pd
+
+from benchmarks.common import run_isolated
+from sample_data_generator import write_trades
+
+
+def write_blotter(path, n_rows, symbols=3, seed=42):
+    """Write a synthetic blotter with the upload column layout"""
+    write_trades(path, n_rows, symbols=symbols, seed=seed)
+
+
+def legacy_ingest(path):
+    with open(path, 'rb') as raw, TextIOWrapper(raw, encoding='utf-8') as text_file:
+        reader = csv.reader(text_file)
+        csv_contents = [row for row in reader]
+    df = pd.DataFrame(csv_contents[1:], columns=csv_contents[0])
+    df['datetime'] = pd.to_datetime(df['datetime'])
+    df['price'] = df['price'].astype(float)
+    df['quantity'] = df['quantity'].astype(int)
+    return df
+
+
+def streaming_ingest(path):
+    from analysis.ingest import read_trades
+    with open(path, 'rb') as raw:
+        return read_trades(raw, encoding='utf-8')
+
+
+METHODS = {
+    'legacy': legacy_ingest,
+    'streaming': streaming_ingest,
+}
+
+
+def _measure(method, path):
+    started = time.perf_counter()
+    df = METHODS[method](path)
+    return time.perf_counter() - started, len(df)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[1_000_000, 10_000_000])
+    parser.add_argument('--methods', nargs='+', default=list(METHODS), choices=list(METHODS))
+    parser.add_argument('--symbols', type=int, default=3)
+    parser.add_argument('--timeout', type=float, default=1800, help="seconds allowed per measurement")
+    args = parser.parse_args()
+
+    print(f"{'rows':>12} {'method':>10} {'seconds':>9} {'peak MB':>9} {'delta MB':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n_rows in args.rows:
+            path = os.path.join(tmp, f'blotter_{n_rows}.csv')
+            write_blotter(path, n_rows, symbols=args.symbols)
+            for method in args.methods:
+                try:
+                    (elapsed, parsed), peak, delta = run_isolated(_measure, method, path, timeout=args.timeout)
+                except (RuntimeError, TimeoutError) as error:
+                    print(f"{n_rows:>12,} {method:>10} {'failed':>9} ({error})")
+                    continue
+                assert parsed == n_rows
+                print(f"{n_rows:>12,} {method:>10} {elapsed:>9.2f} {peak:>9.0f} {delta:>9.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""
+PDF report latency and size as the number of charts grows.
+
+Each report gets ``charts`` line charts of ``--points`` values, built three
+ways: raster charts rendered serially, raster charts on the chart process
+pool, and vector charts. The pool is started and warmed before timing; its
+start-up cost is printed separately.
+
+    python -m benchmarks.bench_pdf --charts 1 2 4 8 16 --workers 4 --concurrency 4
+"""
+import argparse
+import io
+import os
+import time
+
+import numpy as np
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'finance_analyzer.settings')
+
+
+def analysis_data(n_charts, points, seed):
+    rng = np.random.default_rng(seed)
+    charts = {f'metric_{i}': np.cumsum(rng.normal(0, 1, points)).tolist() for i in range(n_charts)}
+    return {'score': '7', 'last_value': {}, 'charts': charts}
+
+
+def build_report(data, chart_mode, workers, concurrency, repeat):
+    """Best time in seconds and size in KB of the report"""
+    from django.conf import settings
+    from analysis.pdf_generator import create_pdf_report
+    settings.PDF_CHART_WORKERS, settings.PDF_CHART_CONCURRENCY = workers, concurrency
+    timings = []
+    for _ in range(repeat):
+        output = io.BytesIO()
+        started = time.perf_counter()
+        create_pdf_report(data, output, chart_mode)
+        timings.append(time.perf_counter() - started)
+    return min(timings), len(output.getvalue()) / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--charts', type=int, nargs='+', default=[1, 2, 4, 8, 16])
+    parser.add_argument('--points', type=int, default=1000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--repeat', type=int, default=2)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    import django
+    django.setup()
+    from analysis.pdf_generator import _chart_pool, render_chart
+
+    started = time.perf_counter()
+    pool = _chart_pool(args.workers)
+    list(pool.map(render_chart, [[0, 1]] * args.workers, ['warm-up'] * args.workers))
+    print(f"pool start-up ({args.workers} workers): {time.perf_counter() - started:.2f}s")
+
+    print(f"{'charts':>7} {'serial s':>9} {'pool s':>8} {'vector s':>9} {'raster KB':>10} {'vector KB':>10}")
+    for n_charts in args.charts:
+        data = analysis_data(n_charts, args.points, args.seed)
+        serial, raster_kb = build_report(data, 'raster', 1, 1, args.repeat)
+        pooled, _ = build_report(data, 'raster', args.workers, args.concurrency, args.repeat)
+        vector, vector_kb = build_report(data, 'vector', args.workers, args.concurrency, args.repeat)
+        print(f"{n_charts:>7} {serial:>9.2f} {pooled:>8.2f} {vector:>9.3f} {raster_kb:>10.0f} {vector_kb:>10.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+Shared helpers for the benchmark scripts: run a measurement in a fresh process
+and report its peak RSS, without hanging when the child dies.
+"""
+import multiprocessing
+import os
+import queue as queue_module
+import resource
+import time
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def current_rss_mb():
+    with open('/proc/self/statm') as statm:
+        return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+
+
+def _child(func, args, results):
+    baseline = current_rss_mb()
+    try:
+        value = func(*args)
+    except BaseException as error:
+        results.put(('error', repr(error)))
+        raise
+    results.put(('ok', (value, peak_rss_mb(), peak_rss_mb() - baseline)))
+
+
+def run_isolated(func, *args, timeout=None):
+    """
+    Call ``func(*args)`` in a spawned process
+
+    ``func`` must be importable at module level and return something small and
+    picklable (timings, row counts), never the data itself.
+
+    Returns:
+        (value, peak RSS MB, RSS growth MB during the call)
+
+    Raises:
+        RuntimeError when the child raises or dies (e.g. OOM-killed),
+        TimeoutError when it runs longer than ``timeout`` seconds
+    """
+    ctx = multiprocessing.get_context('spawn')
+    results = ctx.Queue()
+    process = ctx.Process(target=_child, args=(func, args, results))
+    process.start()
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while True:
+        try:
+            status, payload = results.get(timeout=0.5)
+            break
+        except queue_module.Empty:
+            pass
+        if not process.is_alive():
+            # The result may have landed between the last poll and the exit
+            try:
+                status, payload = results.get(timeout=0.5)
+                break
+            except queue_module.Empty:
+                raise RuntimeError(f"{func.__name__} died with exit code {process.exitcode}")
+        if deadline is not None and time.monotonic() > deadline:
+            process.kill()
+            process.join()
+            raise TimeoutError(f"{func.__name__} exceeded {timeout}s")
+    process.join()
+
+    if status == 'error':
+        raise RuntimeError(f"{func.__name__} failed: {payload}")
+    return payload
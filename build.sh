@@ -13,3 +13,6 @@ python manage.py collectstatic --noinput
 
 # Run migrations
 python manage.py migrate
+
+# Create the database cache tables
+python manage.py createcachetable
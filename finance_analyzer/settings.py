@@ -12,6 +12,8 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 
 from pathlib import Path
 import os
+import sys
+import tempfile
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -74,13 +76,104 @@ WSGI_APPLICATION = 'finance_analyzer.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# The test database is a file like the real one: an in-memory SQLite database
+# shares one cache between connections, which locks differently from a file
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'TEST': {'NAME': Path(tempfile.gettempdir()) / 'finance_analyzer_test.sqlite3'},
     }
 }
 
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # State of the background AI commentary jobs, polled through whichever worker
+    # serves the request; create the table with `manage.py createcachetable`
+    'commentary': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'commentary_cache',
+    },
+}
+
+# Analysed uploads are kept under their content hash: scalars in the
+# analysis.Analysis table, metric series as .npy files in ANALYSIS_STORE_DIR
+# (memory-mapped when read). The least recently used analyses beyond
+# ANALYSIS_STORE_MAX_ENTRIES are deleted.
+ANALYSIS_STORE_DIR = Path(os.environ.get('ANALYSIS_STORE_DIR', BASE_DIR / 'analysis_store'))
+ANALYSIS_STORE_MAX_ENTRIES = int(os.environ.get('ANALYSIS_STORE_MAX_ENTRIES', '1000'))
+
+# AI commentary
+# LLM_CLIENT is a dotted path to a class with complete(prompt, max_tokens, temperature);
+# use 'analysis.llm.StubClient' to run offline, as `manage.py test` always does.
+# LLM_TIMEOUT is the latency budget in seconds after which the canned commentary
+# is shown instead.
+
+TESTING = sys.argv[1:2] == ['test']
+LLM_CLIENT = 'analysis.llm.StubClient' if TESTING else os.environ.get('LLM_CLIENT', 'analysis.llm.OpenAIClient')
+LLM_MODEL = os.environ.get('LLM_MODEL', 'gpt-3.5-turbo-instruct')
+LLM_TIMEOUT = float(os.environ.get('LLM_TIMEOUT', '8'))
+LLM_MAX_WORKERS = int(os.environ.get('LLM_MAX_WORKERS', '8'))
+
+# Completed LLM responses are kept in the database (analysis.LLMResponse).
+# Sampled responses expire after LLM_CACHE_TTL seconds; temperature=0 ones never do.
+# Warm it with: python manage.py warm_llm_cache <blotter.csv ...> --demo
+LLM_CACHE_TTL = int(os.environ.get('LLM_CACHE_TTL', str(7 * 86400)))
+LLM_CACHE_MAX_ENTRIES = int(os.environ.get('LLM_CACHE_MAX_ENTRIES', '10000'))
+
+# Dashboard chart downsampling defaults to analysis.downsample.DEFAULT_CHART_DOWNSAMPLING;
+# set CHART_DOWNSAMPLING (context series key -> {'method': 'lttb' or 'minmax',
+# 'points': n}) to override it. Unlisted series are not thinned on their own account.
+
+# PDF report charts are rendered by a pool of PDF_CHART_WORKERS spawned processes;
+# one report keeps at most PDF_CHART_CONCURRENCY charts in flight. Below two of
+# either, charts render in the request process.
+PDF_CHART_WORKERS = int(os.environ.get('PDF_CHART_WORKERS', str(min(4, os.cpu_count() or 1))))
+PDF_CHART_CONCURRENCY = int(os.environ.get('PDF_CHART_CONCURRENCY', '4'))
+
+# PDF_CHART_MODE 'vector' draws report charts as reportlab vector graphics from
+# series thinned to PDF_VECTOR_CHART_POINTS, instead of 300-dpi matplotlib PNGs
+PDF_CHART_MODE = os.environ.get('PDF_CHART_MODE', 'raster')
+PDF_VECTOR_CHART_POINTS = int(os.environ.get('PDF_VECTOR_CHART_POINTS', '500'))
+
+# Reports are built in a per-request buffer that moves to an anonymous temporary
+# file once it grows past REPORT_SPOOL_MAX_BYTES
+REPORT_SPOOL_MAX_BYTES = int(os.environ.get('REPORT_SPOOL_MAX_BYTES', str(16 * 2**20)))
+
+# Finished reports are cached in REPORT_CACHE_DIR by a hash of their input; the
+# least recently used are deleted beyond REPORT_CACHE_MAX_BYTES (0 disables it)
+REPORT_CACHE_DIR = Path(os.environ.get('REPORT_CACHE_DIR', BASE_DIR / 'report_cache'))
+REPORT_CACHE_MAX_BYTES = int(os.environ.get('REPORT_CACHE_MAX_BYTES', str(256 * 2**20)))
+
+# Columnar exports of an analysis' metric series (/api/analysis/<id>/export.parquet
+# and export.arrows): Parquet codec and row group size, Arrow IPC batch size
+EXPORT_PARQUET_COMPRESSION = os.environ.get('EXPORT_PARQUET_COMPRESSION', 'zstd')
+EXPORT_PARQUET_ROW_GROUP_ROWS = int(os.environ.get('EXPORT_PARQUET_ROW_GROUP_ROWS', str(1 << 20)))
+EXPORT_ARROW_BATCH_ROWS = int(os.environ.get('EXPORT_ARROW_BATCH_ROWS', str(1 << 16)))
+
+# Report emails are queued in the analysis.ReportJob table and run by a pool of
+# REPORT_JOB_WORKERS threads per web process (0: only by `manage.py
+# process_report_jobs`). Failed jobs are retried up to REPORT_JOB_MAX_ATTEMPTS
+# times, REPORT_JOB_RETRY_DELAY seconds apart and doubling; jobs running longer
+# than REPORT_JOB_STALE_AFTER seconds are requeued. Each web process also
+# polls the table every REPORT_JOB_POLL_INTERVAL seconds (0: never), so jobs
+# queued or awaiting a retry when a process restarted still run.
+REPORT_JOB_WORKERS = int(os.environ.get('REPORT_JOB_WORKERS', '2'))
+REPORT_JOB_MAX_ATTEMPTS = int(os.environ.get('REPORT_JOB_MAX_ATTEMPTS', '3'))
+REPORT_JOB_RETRY_DELAY = float(os.environ.get('REPORT_JOB_RETRY_DELAY', '30'))
+REPORT_JOB_STALE_AFTER = float(os.environ.get('REPORT_JOB_STALE_AFTER', '600'))
+REPORT_JOB_POLL_INTERVAL = float(os.environ.get('REPORT_JOB_POLL_INTERVAL', '15'))
+
+# EmailReportService.send_bulk_reports: concurrent SMTP connections, and
+# messages sent per connection before it is reopened
+EMAIL_BULK_PARALLELISM = int(os.environ.get('EMAIL_BULK_PARALLELISM', '4'))
+EMAIL_BULK_BATCH_SIZE = int(os.environ.get('EMAIL_BULK_BATCH_SIZE', '100'))
+
 STATIC_URL = "static/"
 STATICFILES_DIRS = [
     BASE_DIR / "static",
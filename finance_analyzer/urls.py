@@ -26,9 +26,16 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path("", csv_upload, name="upload_csv"),
     path("analysis", analysis_data, name="data_analysis"),
+    path("commentary/<str:job_id>", commentary, name="commentary"),
+    path("api/analysis/<str:analysis_id>", analysis_summary_api, name="analysis_summary_api"),
+    path("api/analysis/<str:analysis_id>/series/<str:name>", analysis_series_api, name="analysis_series_api"),
+    path("api/analysis/<str:analysis_id>/export.parquet", analysis_parquet_export, name="analysis_parquet_export"),
+    path("api/analysis/<str:analysis_id>/export.arrows", analysis_arrow_export, name="analysis_arrow_export"),
     path("export/pdf", export_pdf, name="export_pdf"),
     path("export/excel", export_excel, name="export_excel"),
-    path("send-email", send_email_report, name="send_email_report")
+    path("send-email", send_email_report, name="send_email_report"),
+    path("jobs/<str:job_id>", report_job_status, name="report_job_status"),
+    path("cache/stats", result_cache_stats, name="result_cache_stats")
 ]
 
 
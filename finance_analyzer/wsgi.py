@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'finance_analyzer.settings')
 
 application = get_wsgi_application()
+
+# Run report jobs queued before this process started
+from analysis.jobs import start_poller  # noqa: E402
+
+start_poller()
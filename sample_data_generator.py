@@ -14,7 +14,8 @@ def random_datetime(start, end):
 
 
 
-def generate():
+def build_sample_data():
+    """The deterministic demo blotter (seed 42) as a DataFrame sorted by datetime"""
     np.random.seed(42)
     rows = []
     stocks_holding = {} 
@@ -60,7 +61,166 @@ def generate():
 
     df = pd.DataFrame(rows, columns=['datetime', 'stock', 'ordertype', 'price', 'quantity', 'Exchange'])
     df = df.sort_values(by='datetime').reset_index(drop=True)  # Sort by datetime in increasing order
-    df.to_csv('sample_data.csv', index=False)
+    return df
+
+
+def generate(path='sample_data.csv'):
+    build_sample_data().to_csv(path, index=False)
+
+TRADE_COLUMNS = ['datetime', 'stock', 'ordertype', 'price', 'quantity', 'Exchange']
+
+
+def symbol_names(n_symbols):
+    """Synthetic tickers SYM00000, SYM00001, ..."""
+    width = max(5, len(str(n_symbols - 1)))
+    return [f'SYM{i:0{width}d}' for i in range(n_symbols)]
+
+
+def generate_trades(n_rows, symbols=3000, seed=42, start='2023-06-01', days=29,
+                    chunk_rows=1_000_000, symbol_skew=0.0, price_range=(100.0, 5000.0),
+                    volatility=0.01, quantity_range=(10, 100), exchange='NSE'):
+    """
+    Vectorized synthetic blotter for load testing, yielded in chunks
+
+    Every chunk covers its own block of time and holds complete round trips:
+    each symbol alternates Buy then Sell of the same quantity, so holdings are
+    always valid (flat or one open lot) and every symbol is flat at the end of
+    the block, just like the demo generator.
+
+    Args:
+        n_rows: Total rows; rounded down to an even number of Buy/Sell rows
+        symbols: Number of synthetic tickers, or an explicit list of names
+        seed: Seed of the numpy Generator; the output is fully determined by it
+        start, days: Time span the blocks are spread over
+        chunk_rows: Rows per yielded chunk (one time block each)
+        symbol_skew: 0 for uniform symbol activity, >0 for a Zipf-like
+                     power law where symbol k trades proportional to 1 / (k + 1) ** skew
+        price_range: Range the per-symbol starting prices are drawn from
+        volatility: Standard deviation of the per-trade log price move
+        quantity_range: Inclusive range of the per-round-trip quantity
+        exchange: Value of the Exchange column
+
+    Returns:
+        Generator of DataFrames with the upload columns, sorted by datetime
+    """
+    names = symbol_names(symbols) if isinstance(symbols, int) else list(symbols)
+    n_symbols = len(names)
+    rng = np.random.default_rng(seed)
+
+    weights = 1.0 / np.arange(1, n_symbols + 1) ** symbol_skew
+    weights /= weights.sum()
+    log_price = np.log(rng.uniform(*price_range, n_symbols))
+    stock_type = pd.CategoricalDtype(names)
+    order_type = pd.CategoricalDtype(['Buy', 'Sell'])
+
+    n_rows -= n_rows % 2
+    chunk_rows = max(2, chunk_rows - chunk_rows % 2)
+    n_blocks = max(1, -(-n_rows // chunk_rows))
+    span_us = int(days * 86_400_000_000)
+    block_us = span_us // n_blocks
+    origin = np.datetime64(start, 'us')
+
+    for block in range(n_blocks):
+        n_pairs = min(chunk_rows, n_rows - block * chunk_rows) // 2
+        if not n_pairs:
+            return
+
+        # Two rows per round trip, both on the pair's symbol
+        code = np.repeat(rng.choice(n_symbols, n_pairs, p=weights), 2)
+        offset = rng.integers(0, block_us, 2 * n_pairs)
+        order = np.lexsort((offset, code))
+        code, offset = code[order], offset[order]
+
+        # Within each symbol, even ranks open and odd ranks close the same lot
+        is_start = np.ones(len(code), dtype=bool)
+        is_start[1:] = code[1:] != code[:-1]
+        starts = np.flatnonzero(is_start)
+        rank = np.arange(len(code)) - np.repeat(starts, np.diff(np.append(starts, len(code))))
+        is_sell = (rank % 2).astype(np.int8)
+        quantity = np.repeat(rng.integers(quantity_range[0], quantity_range[1] + 1, n_pairs), 2)
+
+        # Geometric random walk per symbol, carried over from the previous block
+        steps = rng.normal(0.0, volatility, len(code))
+        walk = np.cumsum(steps)
+        walk -= np.repeat(walk[starts] - steps[starts], np.diff(np.append(starts, len(code))))
+        log_trade = log_price[code] + walk
+        ends = np.append(starts[1:], len(code)) - 1
+        log_price[code[starts]] = log_trade[ends]
+
+        chronological = np.argsort(offset, kind='stable')
+        yield pd.DataFrame({
+            'datetime': origin + (block * block_us + offset[chronological]).astype('timedelta64[us]'),
+            'stock': pd.Categorical.from_codes(code[chronological], dtype=stock_type),
+            'ordertype': pd.Categorical.from_codes(is_sell[chronological], dtype=order_type),
+            'price': np.round(np.exp(log_trade[chronological]), 2),
+            'quantity': quantity[chronological],
+            'Exchange': exchange,
+        }, columns=TRADE_COLUMNS)
+
+
+def write_trades(path, n_rows, file_format='csv', **options):
+    """
+    Stream generate_trades() to a CSV or Parquet file chunk by chunk
+
+    Only one chunk is held in memory at a time. Parquet output needs pyarrow.
+
+    Returns:
+        Number of rows written
+    """
+    if file_format not in ('csv', 'parquet'):
+        raise ValueError(f"Unsupported output format: {file_format}")
+
+    written = 0
+    writer = None
+    try:
+        for chunk in generate_trades(n_rows, **options):
+            if file_format == 'csv':
+                chunk.to_csv(path, mode='a' if written else 'w', header=not written, index=False,
+                             date_format='%Y-%m-%d %H:%M:%S.%f')
+            else:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(path, table.schema)
+                writer.write_table(table)
+            written += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    return written
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Write the demo sample_data.csv, or a large synthetic blotter with --rows")
+    parser.add_argument('--rows', type=int, help="rows of synthetic trades to generate")
+    parser.add_argument('--output', help="output path (default sample_data.csv or trades.<format>)")
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv')
+    parser.add_argument('--symbols', type=int, default=3000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--days', type=float, default=29)
+    parser.add_argument('--chunk-rows', type=int, default=1_000_000)
+    parser.add_argument('--symbol-skew', type=float, default=0.0)
+    parser.add_argument('--price-range', type=float, nargs=2, default=(100.0, 5000.0))
+    parser.add_argument('--volatility', type=float, default=0.01)
+    parser.add_argument('--quantity-range', type=int, nargs=2, default=(10, 100))
+    args = parser.parse_args()
+
+    if args.rows is None:
+        generate(args.output or 'sample_data.csv')
+        return
+
+    written = write_trades(
+        args.output or f'trades.{args.format}', args.rows, file_format=args.format,
+        symbols=args.symbols, seed=args.seed, days=args.days, chunk_rows=args.chunk_rows,
+        symbol_skew=args.symbol_skew, price_range=tuple(args.price_range),
+        volatility=args.volatility, quantity_range=tuple(args.quantity_range),
+    )
+    print(f"Wrote {written:,} rows")
+
 
 if(__name__=="__main__"):
-    generate()
+    main()